@@ -16,6 +16,7 @@ IF_GOTO_COMMAND_TYPE = 'CJ'
 RETURN_COMMAND_TYPE = 'R'
 FUNCTION_COMMAND_TYPE = 'F'
 CALL_COMMAND_TYPE = 'C'
+TAIL_CALL_COMMAND_TYPE = 'TC'
 PUSH_COMMAND_MARK = 'push'
 POP_COMMAND_MARK = 'pop'
 LABEL_COMMAND_MARK = 'label'
@@ -24,6 +25,10 @@ IF_GOTO_COMMAND_MARK = 'if-goto'
 RETURN_COMMAND_MARK = 'return'
 FUNCTION_COMMAND_MARK = 'function'
 CALL_COMMAND_MARK = 'call'
+TAIL_CALL_COMMAND_MARK = 'tail-call'  # internal command: a call that reuses the frame of the current function
+UNCHECKED_COMPARE_PREFIX = 'unchecked-'  # internal arithmetic commands: comparisons that cannot overflow
+# internal function command suffix: the local variables that are not zeroed (function f n uninitialized i j...)
+UNINITIALIZED_LOCALS_MARK = 'uninitialized'
 COMMENT_MARK = '//'
 COMMANDS_SEPARATOR = "\s"
 ARITHMETIC_POS = 0
@@ -33,6 +38,19 @@ DEST_ADDRESS_POS = 2
 GOTO_ADDRESS_POS = 1
 FUNCTION_NAME_POS = 1
 FUNCTION_ARGS_VARS_POS = 2
+UNINITIALIZED_LOCALS_POS = 3
+
+
+def split_command(command):
+    """
+    splits a vm command into its parts, without comments and white spaces
+    :param command: the vm command
+    :return: the list of the command parts (an empty list for an empty command)
+    """
+    comment_pos = command.find(COMMENT_MARK)
+    if comment_pos >= 0:
+        command = command[:comment_pos]
+    return command.split()
 
 
 class Parser:
@@ -48,14 +66,33 @@ class Parser:
         self.__command = None
         self.__command_type = None
         self.__cleared_command = None
+        self.__command_parts = None  # the list of the command parts (after parsing)
         self.__segment_label = None  # the name of the segment or the label (depend on the command)
         self.__dest_address = None
         self.__arithmetic_operation = None
         self.__function_name = None
         self.__function_called_name = None  # the function name when calling a function
         self.__function_arg_var_num = None
+        self.__uninitialized_locals = []  # the local variables the function declaration does not zero
         self.__file_name = file_name
 
+    @staticmethod
+    def get_calls_numbers():
+        """
+        :return: a copy of the number of the last call of every called function (the call numbers are shared by all
+        the parsers)
+        """
+        return dict(Parser.__functions_calls)
+
+    @staticmethod
+    def set_calls_numbers(functions_calls):
+        """
+        sets the number of the last call of every function, so the call numbers continue an earlier translation
+        :param functions_calls: a dictionary from a function name to the number of its last call
+        """
+        Parser.__functions_calls.clear()
+        Parser.__functions_calls.update(functions_calls)
+
     def set_command(self, command):
         """
         Sets the command in the parser. Clears the command from comments and extra white spaces and
@@ -65,11 +102,32 @@ class Parser:
         self.__command = command
         self.__clear()
         self.__command_type = self.__set_type()
+        self.__reset_parts()
+
+    def set_parsed_command(self, command_type, command_parts):
+        """
+        Sets a command that is already split into its parts (like a command loaded from the binary intermediate
+        format), without tokenizing it. The command is parsed as well, so there is no need to call parse
+        :param command_type: the command type (one of the command type constants)
+        :param command_parts: the list of the command parts (the keyword and its arguments)
+        """
+        self.__command = " ".join(command_parts)
+        self.__cleared_command = self.__command
+        self.__command_type = command_type
+        self.__reset_parts()
+        self.__set_parts(command_parts)
+
+    def __reset_parts(self):
+        """
+        Clears the parts of the previous command
+        """
+        self.__command_parts = None
         self.__segment_label = None
         self.__dest_address = None
         self.__arithmetic_operation = None
         self.__function_called_name = None
         self.__function_arg_var_num = None
+        self.__uninitialized_locals = []
 
     def __clear(self):
         """
@@ -96,6 +154,8 @@ class Parser:
             return LABEL_COMMAND_TYPE
         if RETURN_COMMAND_MARK in self.__cleared_command:
             return RETURN_COMMAND_TYPE
+        if TAIL_CALL_COMMAND_MARK in self.__cleared_command:  # first search for tail-call and only then for call
+            return TAIL_CALL_COMMAND_TYPE
         if CALL_COMMAND_MARK in self.__cleared_command:
             return CALL_COMMAND_TYPE
         if FUNCTION_COMMAND_MARK in self.__cleared_command:
@@ -118,6 +178,14 @@ class Parser:
         """
         command_parts = re.split(COMMANDS_SEPARATOR, self.__cleared_command)  # split the command based on white spaces
         command_parts = list(filter(lambda x: x != "", command_parts))  # removes empty parts resulted by extra spaces
+        self.__set_parts(command_parts)
+
+    def __set_parts(self, command_parts):
+        """
+        Sets the segment / dest address / arithmetic command / function names of the command from its parts
+        :param command_parts: the list of the command parts
+        """
+        self.__command_parts = command_parts
         if self.__command_type == ARITHMETIC_COMMAND_TYPE:
             self.__arithmetic_operation = command_parts[ARITHMETIC_POS]
         elif self.__command_type == PUSH_COMMAND_TYPE or self.__command_type == POP_COMMAND_TYPE:
@@ -134,9 +202,19 @@ class Parser:
                 self.__functions_calls[self.__function_called_name] = 0
             else:
                 self.__functions_calls[self.__function_called_name] += 1
+        elif self.__command_type == TAIL_CALL_COMMAND_TYPE:  # a tail call never returns here: no call number
+            self.__function_called_name = command_parts[FUNCTION_NAME_POS]
+            self.__function_arg_var_num = command_parts[FUNCTION_ARGS_VARS_POS]
         elif self.__command_type == FUNCTION_COMMAND_TYPE:
             self.__function_name = command_parts[FUNCTION_NAME_POS]
             self.__function_arg_var_num = command_parts[FUNCTION_ARGS_VARS_POS]
+            self.__uninitialized_locals = [int(index) for index in command_parts[UNINITIALIZED_LOCALS_POS + 1:]]
+
+    def get_parts(self):
+        """
+        :return: the list of the command parts (the keyword and its arguments) after parsing
+        """
+        return self.__command_parts
 
     def get_operation(self):
         """
@@ -189,6 +267,13 @@ class Parser:
             return None
         return self.__functions_calls[self.__function_called_name]
 
+    def get_uninitialized_locals(self):
+        """
+        :return: the list of the local variables a function declaration does not zero (they are always written before
+        they are read)
+        """
+        return self.__uninitialized_locals
+
     def get_function_arg_var_num(self):
         """
         :return: the number of args when calling a function or the number of variables the function needs on declaration
@@ -0,0 +1,323 @@
+###########
+# imports #
+###########
+import argparse
+import io
+import json
+import os
+
+import Parser
+import hackInstructions
+import translatorConfig
+import vmTranslator
+
+#############
+# constants #
+#############
+BOOTSTRAP_BLOCK_NAME = "(bootstrap)"
+ROUTINES_BLOCK_NAME = "(shared routines)"
+FUNCTION_COMMAND = "function"
+CALL_COMMANDS = ("call", "tail-call")
+RETURN_COMMAND = "return"
+ROUTINE_COMMENT = "routine"  # the comment keyword of the translator shared routines
+ROUTINE_LABEL_POS = 1
+CHECKED_COMPARE_COMMANDS = ("eq", "gt", "lt")
+# the comparisons the range analysis proved not to overflow, translated to a shorter sequence
+UNCHECKED_COMPARE_COMMANDS = tuple(Parser.UNCHECKED_COMPARE_PREFIX + command for command in CHECKED_COMPARE_COMMANDS)
+COMPARE_COMMANDS = CHECKED_COMPARE_COMMANDS + UNCHECKED_COMPARE_COMMANDS
+FUNCTION_NAME_POS = 1
+MAX_EXPLORED_STEPS = 100000  # bounds the paths exploration of a single vm command
+JSON_INDENT = 2
+TEXT_HEADER = "{:<40} {:>9} {:>9} {:>6} {:>6} {:>6} {:>6} {:>6} {:>9} {:>9} {:>9} {:>9}".format(
+    "function", "rom", "cycles", "cmds", "calls", "rets", "cmps", "ucmps", "call_rom", "ret_rom", "cmp_rom",
+    "ucmp_rom")
+TEXT_ROW = "{:<40} {:>9} {:>9} {:>6} {:>6} {:>6} {:>6} {:>6} {:>9} {:>9} {:>9} {:>9}"
+LEVELS_HEADER = "{:<8} {:>9} {:>9} {:>9}".format("level", "rom", "cycles", "labels")
+LEVELS_ROW = "{:<8} {:>9} {:>9} {:>9}"
+LEVEL_PREFIX = "-O"
+ASM_SUFFIX = "." + vmTranslator.ASM_SUFFIX
+
+
+class CommandChunk:
+    """
+    The asm code the translator emitted for a single vm command, as a range of the program instructions
+    """
+
+    def __init__(self, command, start):
+        """
+        creates a new chunk
+        :param command: the vm command text (taken from the translator comment), or None for code without a command
+        :param start: the index of the first instruction of the chunk
+        """
+        self.command = command
+        self.start = start
+        self.end = start
+        self.labels = set()  # the labels declared inside the chunk
+
+    def get_keyword(self):
+        """
+        :return: the first word of the vm command, or None if the chunk has no command
+        """
+        if not self.command:
+            return None
+        return self.command.split()[0]
+
+    def get_words(self):
+        """
+        :return: the number of ROM words of the chunk
+        """
+        return self.end - self.start
+
+
+def split_to_chunks(asm_lines):
+    """
+    splits the translated asm code to the chunks of its vm commands, based on the comment the translator puts before
+    the code of every vm command
+    :param asm_lines: the translated asm lines
+    :return: a tuple of the program instructions, its labels table and the list of the chunks
+    """
+    instructions = []
+    labels = {}
+    chunks = [CommandChunk(None, 0)]
+    for line in asm_lines:
+        stripped_line = line.strip()
+        if stripped_line.startswith(hackInstructions.COMMENT_MARK):
+            command = stripped_line[len(hackInstructions.COMMENT_MARK):].split(hackInstructions.COMMENT_MARK)[0]
+            chunks.append(CommandChunk(command.strip(), len(instructions)))
+            continue
+        instruction = hackInstructions.clean_line(line)
+        if not instruction:
+            continue
+        if hackInstructions.is_label(instruction):
+            label_name = hackInstructions.get_label_name(instruction)
+            labels[label_name] = len(instructions)
+            chunks[-1].labels.add(label_name)
+        else:
+            instructions.append(instruction)
+            chunks[-1].end = len(instructions)
+    return instructions, labels, chunks
+
+
+def get_routines(chunks):
+    """
+    :param chunks: the program chunks
+    :return: a dictionary from the label of every shared routine to its chunk
+    """
+    return {chunk.command.split()[ROUTINE_LABEL_POS]: chunk for chunk in chunks
+            if chunk.get_keyword() == ROUTINE_COMMENT}
+
+
+def estimate_cycles(instructions, labels, chunk, routines):
+    """
+    statically estimates the number of cycles of the worst path through the given code range. The code is executed
+    abstractly: values that are known at compile time (constants, loop counters) are followed, and branches on unknown
+    values explore both directions. Jumps into shared routines are followed, and a path ends when it leaves the range
+    (falls through, jumps to another command or jumps to a computed address)
+    :param instructions: the program instructions
+    :param labels: the program labels table
+    :param chunk: the chunk of the explored range
+    :param routines: the shared routines chunks by their labels
+    :return: the number of cycles of the longest path through the range
+    """
+    worst = 0
+    explored = 0
+    # paths to explore: program counter, the chunk it runs in, A value, D value, cycles so far
+    pending = [(chunk.start, chunk, None, None, 0)]
+    while pending and explored < MAX_EXPLORED_STEPS:
+        pc, region, a_value, d_value, cycles = pending.pop()
+        while region.start <= pc < region.end and explored < MAX_EXPLORED_STEPS:
+            explored += 1
+            cycles += 1
+            instruction = instructions[pc]
+            pc += 1
+            if hackInstructions.is_a_instruction(instruction):
+                a_value = hackInstructions.get_a_value(instruction)
+                continue
+            dest, comp, jump = hackInstructions.split_c_instruction(instruction)
+            known_a = a_value if isinstance(a_value, int) else None
+            value = hackInstructions.compute(comp, known_a, d_value, None)
+            jump_target = a_value
+            if hackInstructions.A_REGISTER in dest:
+                a_value = value
+            if hackInstructions.D_REGISTER in dest:
+                d_value = value
+            if not jump:
+                continue
+            if value is None and jump != "JMP":  # unknown condition: explores the jump later
+                pending.append(_get_jump_destination(labels, region, routines, jump_target) +
+                               (a_value, d_value, cycles))
+            elif hackInstructions.should_jump(jump, value):
+                pc, region = _get_jump_destination(labels, region, routines, jump_target)
+        worst = max(worst, cycles)
+    return worst
+
+
+def _get_jump_destination(labels, region, routines, jump_target):
+    """
+    :param labels: the program labels table
+    :param region: the chunk the jump is in
+    :param routines: the shared routines chunks by their labels
+    :param jump_target: the value of the A register on the jump
+    :return: a tuple of the index of the jump destination and the chunk it is in. The index is the end of the
+    region if the jump cannot be followed
+    """
+    if isinstance(jump_target, str):
+        if jump_target in region.labels:
+            return labels[jump_target], region
+        if jump_target in routines:
+            return labels[jump_target], routines[jump_target]
+    return region.end, region
+
+
+def analyze(asm_lines):
+    """
+    computes the cost of every vm function in the given translated asm code
+    :param asm_lines: the translated asm lines
+    :return: a list of the functions' costs dictionaries, sorted by their ROM size (largest first)
+    """
+    instructions, labels, chunks = split_to_chunks(asm_lines)
+    routines = get_routines(chunks)
+    functions = []
+    current = _new_function_cost(BOOTSTRAP_BLOCK_NAME)
+    for chunk in chunks:
+        keyword = chunk.get_keyword()
+        if keyword == FUNCTION_COMMAND:
+            if current["rom_words"] or current["vm_commands"]:
+                functions.append(current)
+            current = _new_function_cost(chunk.command.split()[FUNCTION_NAME_POS])
+        elif keyword == ROUTINE_COMMENT and current["function"] != ROUTINES_BLOCK_NAME:
+            if current["rom_words"] or current["vm_commands"]:
+                functions.append(current)
+            current = _new_function_cost(ROUTINES_BLOCK_NAME)
+        words = chunk.get_words()
+        current["rom_words"] += words
+        current["cycles"] += estimate_cycles(instructions, labels, chunk, routines)
+        if keyword is not None:
+            current["vm_commands"] += 1
+        if keyword in CALL_COMMANDS:
+            current["calls"] += 1
+            current["call_words"] += words
+        elif keyword == RETURN_COMMAND:
+            current["returns"] += 1
+            current["return_words"] += words
+        elif keyword in COMPARE_COMMANDS:
+            current["comparisons"] += 1
+            current["compare_words"] += words
+            if keyword in UNCHECKED_COMPARE_COMMANDS:
+                current["unchecked_comparisons"] += 1
+                current["unchecked_compare_words"] += words
+    if current["rom_words"] or current["vm_commands"]:
+        functions.append(current)
+    functions.sort(key=lambda function_cost: (-function_cost["rom_words"], function_cost["function"]))
+    return functions
+
+
+def _new_function_cost(function_name):
+    """
+    :param function_name: the vm function name
+    :return: an empty cost dictionary for the function. The unchecked comparisons are counted in the comparisons as
+    well
+    """
+    return {"function": function_name, "rom_words": 0, "cycles": 0, "vm_commands": 0, "calls": 0, "returns": 0,
+            "comparisons": 0, "unchecked_comparisons": 0, "call_words": 0, "return_words": 0, "compare_words": 0,
+            "unchecked_compare_words": 0}
+
+
+def translate_to_lines(path, config=None, eliminated=None):
+    """
+    translates the given vm file or directory in memory (an asm file is read as is)
+    :param path: a vm file, a directory of vm files or a translated asm file
+    :param config: the code generation configuration (TranslatorConfig)
+    :param eliminated: a dictionary that is updated with the dead stores elimination of every function (see
+    vmTranslator.optimize_vm_lines)
+    :return: the translated asm lines
+    """
+    if path.endswith(ASM_SUFFIX):
+        with open(path) as asm_file:
+            return asm_file.read().splitlines()
+    output_file = io.StringIO()
+    if os.path.isdir(path):
+        vmTranslator.translate_directory_files(path, output_file, config, eliminated=eliminated)
+    else:
+        with open(path) as input_file:
+            vmTranslator.translate_file(input_file, path, output_file, True, config, eliminated=eliminated)
+        vmTranslator.write_shared_routines(output_file, config)
+    return output_file.getvalue().splitlines()
+
+
+def format_text(functions):
+    """
+    :param functions: the functions' costs list
+    :return: a text table of the costs
+    """
+    rows = [TEXT_HEADER]
+    for function_cost in functions:
+        rows.append(TEXT_ROW.format(function_cost["function"], function_cost["rom_words"], function_cost["cycles"],
+                                    function_cost["vm_commands"], function_cost["calls"], function_cost["returns"],
+                                    function_cost["comparisons"], function_cost["unchecked_comparisons"],
+                                    function_cost["call_words"], function_cost["return_words"],
+                                    function_cost["compare_words"], function_cost["unchecked_compare_words"]))
+    rows.append(TEXT_ROW.format("total", sum(f["rom_words"] for f in functions), sum(f["cycles"] for f in functions),
+                                sum(f["vm_commands"] for f in functions), sum(f["calls"] for f in functions),
+                                sum(f["returns"] for f in functions), sum(f["comparisons"] for f in functions),
+                                sum(f["unchecked_comparisons"] for f in functions),
+                                sum(f["call_words"] for f in functions), sum(f["return_words"] for f in functions),
+                                sum(f["compare_words"] for f in functions),
+                                sum(f["unchecked_compare_words"] for f in functions)))
+    return "\n".join(rows)
+
+
+def count_labels(asm_lines):
+    """
+    :param asm_lines: asm lines
+    :return: the number of the labels declared in the lines
+    """
+    return sum(1 for line in asm_lines if hackInstructions.is_label(hackInstructions.clean_line(line)))
+
+
+def compare_levels(path):
+    """
+    translates the given vm file or directory in every optimization level
+    :param path: a vm file or a directory of vm files
+    :return: a list of dictionaries of the total ROM words, cycles estimation and labels of every level
+    """
+    levels = []
+    for level in translatorConfig.OPTIMIZATION_LEVELS:
+        asm_lines = translate_to_lines(path, translatorConfig.get_level_config(level))
+        functions = analyze(asm_lines)
+        levels.append({"level": LEVEL_PREFIX + level,
+                       "rom_words": sum(function_cost["rom_words"] for function_cost in functions),
+                       "cycles": sum(function_cost["cycles"] for function_cost in functions),
+                       "labels": count_labels(asm_lines)})
+    return levels
+
+
+def format_levels_text(levels):
+    """
+    :param levels: the levels comparison list
+    :return: a text table of the comparison
+    """
+    return "\n".join([LEVELS_HEADER] + [LEVELS_ROW.format(level["level"], level["rom_words"], level["cycles"],
+                                                           level["labels"]) for level in levels])
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Static ROM size and cycle cost of every vm function")
+    arguments_parser.add_argument("path", help="a vm file, a directory of vm files or a translated asm file")
+    arguments_parser.add_argument("--json", action="store_true", help="prints the report as json")
+    arguments_parser.add_argument("--levels", action="store_true",
+                                  help="compares the total ROM words, cycles and labels of all the optimization levels")
+    vmTranslator.add_optimization_arguments(arguments_parser)
+    arguments = arguments_parser.parse_args()
+
+    if arguments.levels:
+        report = compare_levels(arguments.path)
+        text_report = format_levels_text(report)
+    else:
+        report = analyze(translate_to_lines(arguments.path, vmTranslator.get_config(arguments)))
+        text_report = format_text(report)
+    if arguments.json:
+        print(json.dumps(report, indent=JSON_INDENT))
+    else:
+        print(text_report)
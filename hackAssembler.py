@@ -0,0 +1,92 @@
+###########
+# imports #
+###########
+import sys
+
+import hackInstructions
+
+#############
+# constants #
+#############
+PATH_POS = 1  # the arguments position for the file path
+ASM_SUFFIX = "asm"
+HACK_SUFFIX = "hack"
+WRITING_MODE = "w"
+END_OF_LINE_MARK = "\n"
+VARIABLES_START_ADDRESS = 16
+PREDEFINED_SYMBOLS = {"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4, "SCREEN": 16384, "KBD": 24576}
+PREDEFINED_SYMBOLS.update({"R" + str(register): register for register in range(16)})
+C_INSTRUCTION_PREFIX = 0b111 << 13
+MEMORY_BIT = 1 << 12
+COMP_SHIFT = 6
+DEST_SHIFT = 3
+# the comp bits of every computation, written with A (the M variants set the memory bit)
+COMP_CODES = {"0": 0b101010, "1": 0b111111, "-1": 0b111010, "D": 0b001100, "A": 0b110000, "!D": 0b001101,
+              "!A": 0b110001, "-D": 0b001111, "-A": 0b110011, "D+1": 0b011111, "A+1": 0b110111, "D-1": 0b001110,
+              "A-1": 0b110010, "D+A": 0b000010, "A+D": 0b000010, "D-A": 0b010011, "A-D": 0b000111,
+              "D&A": 0b000000, "A&D": 0b000000, "D|A": 0b010101, "A|D": 0b010101}
+DEST_BITS = {hackInstructions.A_REGISTER: 0b100, hackInstructions.D_REGISTER: 0b010,
+             hackInstructions.M_REGISTER: 0b001}
+JUMP_CODES = {"": 0, "JGT": 1, "JEQ": 2, "JGE": 3, "JLT": 4, "JNE": 5, "JLE": 6, "JMP": 7}
+WORD_FORMAT = "{:016b}"
+
+
+def assemble(asm_lines):
+    """
+    assembles hack asm code into machine code
+    :param asm_lines: the asm lines
+    :return: a list of the machine code words (integers)
+    """
+    instructions, labels = hackInstructions.parse_program(asm_lines)
+    symbols = dict(PREDEFINED_SYMBOLS)
+    symbols.update(labels)
+    next_variable = VARIABLES_START_ADDRESS
+    words = []
+    for instruction in instructions:
+        if hackInstructions.is_a_instruction(instruction):
+            value = hackInstructions.get_a_value(instruction)
+            if isinstance(value, str):
+                if value not in symbols:  # a new variable
+                    symbols[value] = next_variable
+                    next_variable += 1
+                value = symbols[value]
+            words.append(value)
+        else:
+            words.append(encode_c_instruction(instruction))
+    return words
+
+
+def encode_c_instruction(instruction):
+    """
+    :param instruction: a cleaned C instruction
+    :return: the machine code word of the instruction
+    """
+    dest, comp, jump = hackInstructions.split_c_instruction(instruction)
+    word = C_INSTRUCTION_PREFIX
+    if hackInstructions.reads_memory(comp):
+        word |= MEMORY_BIT
+        comp = comp.replace(hackInstructions.M_REGISTER, hackInstructions.A_REGISTER)
+    word |= COMP_CODES[comp] << COMP_SHIFT
+    for register in dest:
+        word |= DEST_BITS[register] << DEST_SHIFT
+    return word | JUMP_CODES[jump]
+
+
+def assemble_file(file_name):
+    """
+    assembles the given asm file into a hack file with the same name in the same directory
+    :param file_name: the name of the asm file
+    """
+    with open(file_name) as input_file:
+        words = assemble(input_file.read().splitlines())
+    output_file_name = file_name[:-len(ASM_SUFFIX)] + HACK_SUFFIX
+    with open(output_file_name, WRITING_MODE) as output_file:
+        for word in words:
+            output_file.write(WORD_FORMAT.format(word) + END_OF_LINE_MARK)
+
+
+# main part
+if __name__ == '__main__':
+    if len(sys.argv) < PATH_POS + 1:
+        sys.exit()  # There is not an input
+    assemble_file(sys.argv[PATH_POS])
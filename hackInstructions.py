@@ -0,0 +1,194 @@
+###########
+# imports #
+###########
+import re
+
+#############
+# constants #
+#############
+COMMENT_MARK = "//"
+LABEL_PREFIX = "("
+LABEL_SUFFIX = ")"
+A_INSTRUCTION_PREFIX = "@"
+DEST_SEPARATOR = "="
+JUMP_SEPARATOR = ";"
+WORD_BITS = 16
+WORD_MASK = (1 << WORD_BITS) - 1
+WORD_SIGN = 1 << (WORD_BITS - 1)
+NUMBER_PATTERN = re.compile(r"^\d+$")
+# the jump conditions on the computed value
+JUMP_CONDITIONS = {"": lambda value: False,
+                   "JGT": lambda value: value > 0,
+                   "JEQ": lambda value: value == 0,
+                   "JGE": lambda value: value >= 0,
+                   "JLT": lambda value: value < 0,
+                   "JNE": lambda value: value != 0,
+                   "JLE": lambda value: value <= 0,
+                   "JMP": lambda value: True}
+# the computations of the hack ALU, on the operands x (D) and y (A or M)
+BINARY_COMPUTATIONS = {"D+1": lambda d, y: d + 1,
+                       "D-1": lambda d, y: d - 1,
+                       "D+y": lambda d, y: d + y,
+                       "y+D": lambda d, y: d + y,
+                       "D-y": lambda d, y: d - y,
+                       "y-D": lambda d, y: y - d,
+                       "D&y": lambda d, y: d & y,
+                       "y&D": lambda d, y: d & y,
+                       "D|y": lambda d, y: d | y,
+                       "y|D": lambda d, y: d | y,
+                       "D": lambda d, y: d,
+                       "!D": lambda d, y: ~d,
+                       "-D": lambda d, y: -d,
+                       "y": lambda d, y: y,
+                       "!y": lambda d, y: ~y,
+                       "-y": lambda d, y: -y,
+                       "y+1": lambda d, y: y + 1,
+                       "y-1": lambda d, y: y - 1}
+CONSTANT_COMPUTATIONS = {"0": 0, "1": 1, "-1": -1}
+A_REGISTER = "A"
+D_REGISTER = "D"
+M_REGISTER = "M"
+
+
+def to_word(value):
+    """
+    wraps the given integer into a signed 16 bit hack word
+    :param value: an integer
+    :return: the matching signed 16 bit value
+    """
+    value &= WORD_MASK
+    if value & WORD_SIGN:
+        return value - (WORD_MASK + 1)
+    return value
+
+
+def clean_line(line):
+    """
+    removes comments and white spaces from an asm line
+    :param line: the asm line
+    :return: the line without comments and white spaces
+    """
+    comment_pos = line.find(COMMENT_MARK)
+    if comment_pos >= 0:
+        line = line[:comment_pos]
+    return "".join(line.split())
+
+
+def is_label(instruction):
+    """
+    :param instruction: a cleaned asm line
+    :return: True if the line is a label declaration, False otherwise
+    """
+    return instruction.startswith(LABEL_PREFIX)
+
+
+def get_label_name(instruction):
+    """
+    :param instruction: a cleaned label declaration line: (name)
+    :return: the label name
+    """
+    return instruction[len(LABEL_PREFIX):-len(LABEL_SUFFIX)]
+
+
+def is_a_instruction(instruction):
+    """
+    :param instruction: a cleaned asm line
+    :return: True if the line is an A instruction, False otherwise
+    """
+    return instruction.startswith(A_INSTRUCTION_PREFIX)
+
+
+def get_a_value(instruction):
+    """
+    :param instruction: a cleaned A instruction: @value
+    :return: the numeric value of the instruction, or its symbol if it is not a number
+    """
+    value = instruction[len(A_INSTRUCTION_PREFIX):]
+    if NUMBER_PATTERN.match(value):
+        return int(value)
+    return value
+
+
+def split_c_instruction(instruction):
+    """
+    splits a C instruction to its parts: dest=comp;jump
+    :param instruction: a cleaned C instruction
+    :return: a tuple of the dest, comp and jump parts (dest and jump are empty strings when missing)
+    """
+    dest = ""
+    jump = ""
+    if DEST_SEPARATOR in instruction:
+        dest, instruction = instruction.split(DEST_SEPARATOR, 1)
+    if JUMP_SEPARATOR in instruction:
+        instruction, jump = instruction.split(JUMP_SEPARATOR, 1)
+    return dest, instruction, jump
+
+
+def is_jump(instruction):
+    """
+    :param instruction: a cleaned asm line
+    :return: True if the line is a C instruction with a jump part, False otherwise
+    """
+    return JUMP_SEPARATOR in instruction and not is_a_instruction(instruction)
+
+
+def reads_memory(comp):
+    """
+    :param comp: the comp part of a C instruction
+    :return: True if the computation reads the M register, False otherwise
+    """
+    return M_REGISTER in comp
+
+
+def compute(comp, a_value, d_value, m_value):
+    """
+    computes the hack ALU result of the given comp part. Any operand might be None for an unknown value, in which
+    case the result is unknown (None) unless it does not depend on it
+    :param comp: the comp part of a C instruction
+    :param a_value: the value of the A register
+    :param d_value: the value of the D register
+    :param m_value: the value of the M register (RAM[A])
+    :return: the computed value, or None if it is unknown
+    """
+    if comp in CONSTANT_COMPUTATIONS:
+        return CONSTANT_COMPUTATIONS[comp]
+    if reads_memory(comp):
+        y_value = m_value
+        generic_comp = comp.replace(M_REGISTER, "y")
+    else:
+        y_value = a_value
+        generic_comp = comp.replace(A_REGISTER, "y")
+    operation = BINARY_COMPUTATIONS[generic_comp]
+    if (D_REGISTER in generic_comp and not isinstance(d_value, int)) or \
+            ("y" in generic_comp and not isinstance(y_value, int)):
+        return None
+    return to_word(operation(d_value, y_value))
+
+
+def should_jump(jump, value):
+    """
+    :param jump: the jump part of a C instruction
+    :param value: the computed value
+    :return: True if the jump is taken, False otherwise
+    """
+    return JUMP_CONDITIONS[jump](value)
+
+
+def parse_program(lines):
+    """
+    parses asm lines into a list of instructions and a table of the labels
+    :param lines: the asm lines
+    :return: a tuple of the instructions list (without labels, comments and empty lines) and a dictionary from each
+    label name to the index of the instruction it points to
+    """
+    instructions = []
+    labels = {}
+    for line in lines:
+        instruction = clean_line(line)
+        if not instruction:
+            continue
+        if is_label(instruction):
+            labels[get_label_name(instruction)] = len(instructions)
+        else:
+            instructions.append(instruction)
+    return instructions, labels
@@ -0,0 +1,193 @@
+###########
+# imports #
+###########
+import argparse
+
+import hackAssembler
+import hackInstructions
+
+#############
+# constants #
+#############
+RAM_SIZE = 1 << 15
+ROM_SIZE = 1 << 15
+ADDRESS_MASK = RAM_SIZE - 1
+STACK_POINTER_ADDRESS = 0
+STACK_INITIAL_ADDRESS = 256
+A_INSTRUCTION_MASK = 1 << 15
+MEMORY_BIT = 1 << 12
+COMP_MASK = 0b111111
+DEST_MASK = 0b111
+JUMP_MASK = 0b111
+DEST_A_BIT = 0b100
+DEST_D_BIT = 0b010
+DEST_M_BIT = 0b001
+DEFAULT_MAX_CYCLES = 10000000
+# the ALU computation of every comp code, on x (D) and y (A or M)
+ALU_OPERATIONS = {0b101010: lambda x, y: 0,
+                  0b111111: lambda x, y: 1,
+                  0b111010: lambda x, y: -1,
+                  0b001100: lambda x, y: x,
+                  0b110000: lambda x, y: y,
+                  0b001101: lambda x, y: ~x,
+                  0b110001: lambda x, y: ~y,
+                  0b001111: lambda x, y: -x,
+                  0b110011: lambda x, y: -y,
+                  0b011111: lambda x, y: x + 1,
+                  0b110111: lambda x, y: y + 1,
+                  0b001110: lambda x, y: x - 1,
+                  0b110010: lambda x, y: y - 1,
+                  0b000010: lambda x, y: x + y,
+                  0b010011: lambda x, y: x - y,
+                  0b000111: lambda x, y: y - x,
+                  0b000000: lambda x, y: x & y,
+                  0b010101: lambda x, y: x | y}
+JUMP_DECISIONS = [hackInstructions.JUMP_CONDITIONS[jump]
+                  for jump in sorted(hackAssembler.JUMP_CODES, key=hackAssembler.JUMP_CODES.get)]
+RAM_REPORT_ADDRESSES = 16
+
+
+class HackSimulator:
+    """
+    Executes hack machine code on a RAM of 32K words, counting the executed cycles. A program halts when it reaches
+    the end of its code or an infinite loop of the form (L) @L 0;JMP
+    """
+
+    def __init__(self, words):
+        """
+        loads a program
+        :param words: the machine code words of the program
+        :raise ValueError: if the program does not fit in the ROM
+        """
+        if len(words) > ROM_SIZE:
+            raise ValueError("the program has {} words, more than the ROM size ({})".format(len(words), ROM_SIZE))
+        self.__program = [HackSimulator.__decode(word) for word in words]
+        self.__ram = [0] * RAM_SIZE
+        self.__a = 0
+        self.__d = 0
+        self.__pc = 0
+        self.__cycles = 0
+        self.__halted = False
+        self.__peak_stack_pointer = 0
+
+    @staticmethod
+    def __decode(word):
+        """
+        :param word: a machine code word
+        :return: a tuple of the decoded instruction: (value,) for an A instruction, and (alu operation, reads memory,
+        dest bits, jump decision) for a C instruction
+        """
+        if not word & A_INSTRUCTION_MASK:
+            return (word,)
+        comp = (word >> hackAssembler.COMP_SHIFT) & COMP_MASK
+        dest = (word >> hackAssembler.DEST_SHIFT) & DEST_MASK
+        return ALU_OPERATIONS[comp], bool(word & MEMORY_BIT), dest, JUMP_DECISIONS[word & JUMP_MASK]
+
+    def run(self, max_cycles=DEFAULT_MAX_CYCLES):
+        """
+        executes the program until it halts or the given number of cycles is executed
+        :param max_cycles: the maximal number of cycles to execute
+        :return: True if the program halted, False otherwise
+        """
+        program = self.__program
+        ram = self.__ram
+        a_value, d_value, pc, cycles = self.__a, self.__d, self.__pc, self.__cycles
+        peak_stack_pointer = self.__peak_stack_pointer
+        last_cycle = cycles + max_cycles
+        while cycles < last_cycle:
+            if pc >= len(program):
+                self.__halted = True
+                break
+            instruction = program[pc]
+            cycles += 1
+            if len(instruction) == 1:
+                a_value = instruction[0]
+                pc += 1
+                continue
+            operation, reads_memory, dest, should_jump = instruction
+            value = operation(d_value, ram[a_value & ADDRESS_MASK] if reads_memory else a_value)
+            value = ((value + (1 << 15)) & 0xFFFF) - (1 << 15)
+            if dest & DEST_M_BIT:
+                ram[a_value & ADDRESS_MASK] = value
+                if a_value == STACK_POINTER_ADDRESS and value > peak_stack_pointer:
+                    peak_stack_pointer = value
+            if should_jump(value):
+                if a_value == pc - 1 and len(program[a_value]) == 1:  # (L) @L 0;JMP - an infinite loop
+                    self.__halted = True
+                    break
+                pc = a_value
+            else:
+                pc += 1
+            if dest & DEST_A_BIT:
+                a_value = value
+            if dest & DEST_D_BIT:
+                d_value = value
+        self.__a, self.__d, self.__pc, self.__cycles = a_value, d_value, pc, cycles
+        self.__peak_stack_pointer = peak_stack_pointer
+        return self.__halted
+
+    def set_ram(self, address, value):
+        """
+        sets a RAM word, usually before the run (like a fixed input)
+        :param address: the RAM address
+        :param value: the 16 bit value
+        """
+        self.__ram[address & ADDRESS_MASK] = value
+
+    def get_ram(self):
+        """
+        :return: the RAM of the machine
+        """
+        return self.__ram
+
+    def get_cycles(self):
+        """
+        :return: the number of the executed cycles
+        """
+        return self.__cycles
+
+    def is_halted(self):
+        """
+        :return: True if the program halted, False otherwise
+        """
+        return self.__halted
+
+    def get_pc(self):
+        """
+        :return: the address of the next instruction (the jump of the infinite loop if the program halted in one)
+        """
+        return self.__pc
+
+    def get_peak_stack_pointer(self):
+        """
+        :return: the maximal value written to the stack pointer
+        """
+        return self.__peak_stack_pointer
+
+
+def simulate_lines(asm_lines, max_cycles=DEFAULT_MAX_CYCLES):
+    """
+    assembles and runs the given asm code
+    :param asm_lines: the asm lines
+    :param max_cycles: the maximal number of cycles to execute
+    :return: the simulator after the run
+    """
+    simulator = HackSimulator(hackAssembler.assemble(asm_lines))
+    simulator.run(max_cycles)
+    return simulator
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Runs a hack asm program")
+    arguments_parser.add_argument("path", help="an asm file")
+    arguments_parser.add_argument("--cycles", type=int, default=DEFAULT_MAX_CYCLES, help="maximal number of cycles")
+    arguments = arguments_parser.parse_args()
+
+    with open(arguments.path) as asm_file:
+        result = simulate_lines(asm_file.read().splitlines(), arguments.cycles)
+    stack_pointer = result.get_ram()[STACK_POINTER_ADDRESS]
+    print("halted:", result.is_halted(), "cycles:", result.get_cycles(),
+          "peak SP:", result.get_peak_stack_pointer())
+    print("RAM[0..15]:", result.get_ram()[:RAM_REPORT_ADDRESSES])
+    print("stack:", result.get_ram()[STACK_INITIAL_ADDRESS:max(stack_pointer, STACK_INITIAL_ADDRESS)])
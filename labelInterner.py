@@ -0,0 +1,68 @@
+#############
+# constants #
+#############
+# the labels outside of any function are named "$" and the label name, and vm names never contain "$", so no vm
+# label or function can start with two of them
+SHORT_LABEL_PREFIX = "$$"
+SHORT_LABEL_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+TABLE_SEPARATOR = " "
+END_OF_LINE_MARK = "\n"
+
+
+class LabelInterner:
+    """
+    Interns the internal labels of the translator (comparisons, return addresses, loops) into short unique names.
+    Keeps the original name of every short name as a side table
+    """
+
+    def __init__(self):
+        """
+        creates a new interner with an empty table
+        """
+        self.__short_names = {}  # full label name -> short label name
+        self.__full_names = {}  # short label name -> full label name
+
+    def intern(self, full_label_name):
+        """
+        :param full_label_name: the full name of an internal label
+        :return: the short name of the label (the same short name for the same full name)
+        """
+        if full_label_name not in self.__short_names:
+            short_name = SHORT_LABEL_PREFIX + LabelInterner.__to_digits(len(self.__short_names))
+            self.__short_names[full_label_name] = short_name
+            self.__full_names[short_name] = full_label_name
+        return self.__short_names[full_label_name]
+
+    @staticmethod
+    def __to_digits(number):
+        """
+        :param number: a non negative integer
+        :return: the number written in base 36
+        """
+        digits = SHORT_LABEL_DIGITS[number % len(SHORT_LABEL_DIGITS)]
+        number //= len(SHORT_LABEL_DIGITS)
+        while number:
+            digits = SHORT_LABEL_DIGITS[number % len(SHORT_LABEL_DIGITS)] + digits
+            number //= len(SHORT_LABEL_DIGITS)
+        return digits
+
+    def get_full_name(self, short_name):
+        """
+        :param short_name: a short label name
+        :return: the full label name it stands for
+        """
+        return self.__full_names[short_name]
+
+    def get_table(self):
+        """
+        :return: a list of (short name, full name) of the interned labels, in the order they were interned
+        """
+        return list(self.__full_names.items())
+
+    def write_table(self, table_file):
+        """
+        writes the side table of the interned labels: a line of "short_name full_name" for each label
+        :param table_file: the output table file
+        """
+        for short_name, full_name in self.__full_names.items():
+            table_file.write(short_name + TABLE_SEPARATOR + full_name + END_OF_LINE_MARK)
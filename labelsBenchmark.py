@@ -0,0 +1,76 @@
+###########
+# imports #
+###########
+import argparse
+import timeit
+
+import costAnalyzer
+import hackAssembler
+import hackInstructions
+import translatorConfig
+
+#############
+# constants #
+#############
+END_OF_LINE_MARK = "\n"
+ASSEMBLY_REPEATS = 5
+REPORT_HEADER = "{:<14} {:>12} {:>13} {:>9} {:>14}".format("labels", "asm_bytes", "symbol_bytes", "rom",
+                                                           "assembly_ms")
+REPORT_ROW = "{:<14} {:>12} {:>13} {:>9} {:>14.2f}"
+REPORT_CHANGE_ROW = "{:<14} {:>11.1f}% {:>13} {:>9} {:>13.1f}%"
+
+
+def count_symbol_bytes(asm_lines):
+    """
+    :param asm_lines: asm lines
+    :return: the total length of all the labels declarations and the symbolic A instructions
+    """
+    symbol_bytes = 0
+    for line in asm_lines:
+        instruction = hackInstructions.clean_line(line)
+        if hackInstructions.is_label(instruction):
+            symbol_bytes += len(hackInstructions.get_label_name(instruction))
+        elif hackInstructions.is_a_instruction(instruction):
+            value = hackInstructions.get_a_value(instruction)
+            if isinstance(value, str):
+                symbol_bytes += len(value)
+    return symbol_bytes
+
+
+def measure(path, config):
+    """
+    measures the asm output and its assembly time
+    :param path: a vm file or a directory of vm files
+    :param config: the code generation configuration
+    :return: a tuple of the asm size in bytes, the total length of the symbols, the ROM words and the assembly time in
+    milliseconds
+    """
+    asm_lines = costAnalyzer.translate_to_lines(path, config)
+    asm_bytes = sum(len(line) + len(END_OF_LINE_MARK) for line in asm_lines)
+    symbol_bytes = count_symbol_bytes(asm_lines)
+    rom_words = len(hackAssembler.assemble(asm_lines))
+    seconds = min(timeit.repeat(lambda: hackAssembler.assemble(asm_lines), number=1, repeat=ASSEMBLY_REPEATS))
+    return asm_bytes, symbol_bytes, rom_words, seconds * 1000
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Measures the asm size and assembly time reduction of "
+                                                           "short internal labels")
+    arguments_parser.add_argument("path", help="a vm file or a directory of vm files")
+    arguments_parser.add_argument("-O", dest="level", default=translatorConfig.DEFAULT_LEVEL,
+                                  choices=translatorConfig.OPTIMIZATION_LEVELS, help="optimization level")
+    arguments = arguments_parser.parse_args()
+
+    long_config = translatorConfig.get_level_config(arguments.level)
+    long_config.short_labels = False
+    short_config = translatorConfig.get_level_config(arguments.level)
+    short_config.short_labels = True
+    long_bytes, long_symbols, long_words, long_time = measure(arguments.path, long_config)
+    short_bytes, short_symbols, short_words, short_time = measure(arguments.path, short_config)
+    print(REPORT_HEADER)
+    print(REPORT_ROW.format("full", long_bytes, long_symbols, long_words, long_time))
+    print(REPORT_ROW.format("short", short_bytes, short_symbols, short_words, short_time))
+    print(REPORT_CHANGE_ROW.format("reduction", 100.0 * (long_bytes - short_bytes) / long_bytes,
+                                   long_symbols - short_symbols, long_words - short_words,
+                                   100.0 * (long_time - short_time) / long_time))
@@ -0,0 +1,268 @@
+###########
+# imports #
+###########
+import argparse
+import os
+
+import Parser
+import vmOptimizer
+
+#############
+# constants #
+#############
+KEYWORD_POS = 0
+SEGMENT_POS = 1
+INDEX_POS = 2
+FUNCTION_NAME_POS = 1
+ARGS_VARS_NUM_POS = 2
+COMMAND_PARTS_SEPARATOR = " "
+END_OF_LINE_MARK = "\n"
+LOCAL_SEGMENT = "local"
+TEMP_SEGMENT = "temp"
+TEMP_REGISTERS_NUMBER = 8
+# the temp registers are shared by all the functions: a called function or the caller after a return might read them
+ALL_TEMPS = frozenset((TEMP_SEGMENT, index) for index in range(TEMP_REGISTERS_NUMBER))
+# the arithmetic commands by the number of values they pop (and replace by their result)
+BINARY_OPERATIONS = ("add", "sub", "eq", "gt", "lt", "and", "or")
+UNARY_OPERATIONS = ("neg", "not")
+REPORT_HEADER = "{:<40} {:>14} {:>14}".format("function", "dead_commands", "uninitialized")
+REPORT_ROW = "{:<40} {:>14} {:>14}"
+TOTAL_ROW_NAME = "total"
+
+
+def eliminate_dead_stores(vm_lines):
+    """
+    removes the stores to local variables and temp registers that are never read afterwards, together with the
+    commands that computed the stored value (when they are pushes and arithmetic of the same basic block), and marks
+    the local variables that are always written before they are read, so the function declaration does not zero
+    them. The liveness of the variables is found per function over its basic blocks. The temp registers stay in the
+    final RAM of a program that halts in a loop, so a store to a temp register is removed only if a later store
+    surely overwrites it. Like the range analysis, the local variables are assumed not to be accessed through
+    pointers. Functions that jump outside of themselves are left as they are
+    :param vm_lines: the vm lines
+    :return: a tuple of the optimized vm lines and a dictionary from a function name to a tuple of the number of its
+    removed commands, the number of its uninitialized local variables and the indices of the local variables whose
+    values may change by the elimination (the uninitialized ones and the ones with removed stores)
+    """
+    optimized = []
+    eliminated = {}
+    for function_lines in vmOptimizer.split_functions(vm_lines):
+        function_lines, function_name, removed, uninitialized, changed_locals = _optimize_function(list(function_lines))
+        optimized.extend(function_lines)
+        if function_name is not None:
+            eliminated[function_name] = (removed, uninitialized, changed_locals)
+    return optimized, eliminated
+
+
+def _optimize_function(function_lines):
+    """
+    :param function_lines: the vm lines of a single function
+    :return: a tuple of the optimized lines, the function name (None for lines without a function), the number of
+    the removed commands, the number of the uninitialized local variables and the indices of the local variables
+    whose values may change (a frozenset)
+    """
+    first_position = next((position for position, line in enumerate(function_lines)
+                           if Parser.split_command(line)), None)
+    if first_position is None:
+        return function_lines, None, 0, 0, frozenset()
+    function_command = Parser.split_command(function_lines[first_position])
+    if function_command[KEYWORD_POS] != Parser.FUNCTION_COMMAND_MARK:
+        return function_lines, None, 0, 0, frozenset()
+    function_name = function_command[FUNCTION_NAME_POS]
+    locals_number = int(function_command[ARGS_VARS_NUM_POS])
+    all_locals = frozenset((LOCAL_SEGMENT, index) for index in range(locals_number))
+    removed = 0
+    changed_locals = set()
+    while True:
+        blocks, label_blocks = vmOptimizer.build_cfg(function_lines)
+        if any(block.get_jump_label() is not None and block.get_jump_label() not in label_blocks
+               for block in blocks):
+            return function_lines, function_name, 0, 0, frozenset()
+        live_in = _find_live_variables(function_lines, blocks, label_blocks, all_locals)
+        dead = set()
+        for block_index, block in enumerate(blocks):
+            dead.update(_find_dead_commands(function_lines, block,
+                                            _get_live_out(blocks, label_blocks, block_index, live_in, all_locals)))
+        if not dead:
+            break
+        removed += len(dead)
+        for position in dead:
+            command_parts = Parser.split_command(function_lines[position])
+            if command_parts[KEYWORD_POS] == Parser.POP_COMMAND_MARK and _get_variable(command_parts) in all_locals:
+                changed_locals.add(int(command_parts[INDEX_POS]))
+        function_lines = [line for position, line in enumerate(function_lines) if position not in dead]
+
+    live_at_entry = live_in[0]
+    uninitialized = [str(index) for index in range(locals_number) if (LOCAL_SEGMENT, index) not in live_at_entry]
+    changed_locals.update(int(index) for index in uninitialized)
+    if uninitialized:
+        function_lines[first_position] = COMMAND_PARTS_SEPARATOR.join(
+            function_command[:ARGS_VARS_NUM_POS + 1] + [Parser.UNINITIALIZED_LOCALS_MARK] + uninitialized) + \
+            END_OF_LINE_MARK
+    return function_lines, function_name, removed, len(uninitialized), frozenset(changed_locals)
+
+
+def _get_variable(command_parts):
+    """
+    :param command_parts: the parts of a push or pop command
+    :return: the (segment, index) of the command if it is a local variable or a temp register, None otherwise
+    """
+    if command_parts[SEGMENT_POS] in (LOCAL_SEGMENT, TEMP_SEGMENT):
+        return command_parts[SEGMENT_POS], int(command_parts[INDEX_POS])
+    return None
+
+
+def _get_live_out(blocks, label_blocks, block_index, live_in, all_locals):
+    """
+    :param blocks: the basic blocks of the function
+    :param label_blocks: the index of the block of every label
+    :param block_index: the index of the current block
+    :param live_in: the variables that are live at the start of every block
+    :param all_locals: the local variables of the function
+    :return: the variables that are live at the end of the block
+    """
+    block = blocks[block_index]
+    last_keyword = block.last_command[KEYWORD_POS] if block.last_command else None
+    if last_keyword == Parser.RETURN_COMMAND_MARK or last_keyword == Parser.TAIL_CALL_COMMAND_MARK:
+        return ALL_TEMPS
+    live_out = set()
+    jump_label = block.get_jump_label()
+    if jump_label is not None:
+        live_out |= live_in[label_blocks[jump_label]]
+    if block.falls_through():
+        if block_index + 1 < len(blocks):
+            live_out |= live_in[block_index + 1]
+        else:  # the end of the function lines might run into the next function
+            live_out |= ALL_TEMPS | all_locals
+    return live_out
+
+
+def _find_live_variables(function_lines, blocks, label_blocks, all_locals):
+    """
+    finds the variables that are live at the start of every block, by iterating backwards until no set changes. The
+    local variables start dead and become live where they are read. The temp registers start live and become dead
+    only where they are surely overwritten before they are read, so they stay live in a loop that never ends
+    :return: a list of the set of live variables at the start of every block
+    """
+    live_in = [set(ALL_TEMPS) for _ in blocks]
+    changed = True
+    while changed:
+        changed = False
+        for block_index in range(len(blocks) - 1, -1, -1):
+            live = set(_get_live_out(blocks, label_blocks, block_index, live_in, all_locals))
+            for position in reversed(blocks[block_index].commands):
+                _update_live_variables(Parser.split_command(function_lines[position]), live)
+            if live != live_in[block_index]:
+                live_in[block_index] = live
+                changed = True
+    return live_in
+
+
+def _update_live_variables(command_parts, live):
+    """
+    updates the live variables from after a command to before it
+    :param command_parts: the parts of the command
+    :param live: the set of the live variables. Updated in place
+    """
+    keyword = command_parts[KEYWORD_POS]
+    if keyword == Parser.POP_COMMAND_MARK:
+        live.discard(_get_variable(command_parts))
+    elif keyword == Parser.PUSH_COMMAND_MARK:
+        variable = _get_variable(command_parts)
+        if variable is not None:
+            live.add(variable)
+    elif keyword == Parser.CALL_COMMAND_MARK:
+        live |= ALL_TEMPS
+
+
+def _find_dead_commands(function_lines, block, live_out):
+    """
+    finds the dead stores of a block whose value is computed inside the block by pushes and arithmetic
+    :param function_lines: the vm lines of the function
+    :param block: the BasicBlock
+    :param live_out: the variables that are live at the end of the block
+    :return: the positions of the dead stores and the commands that computed their values
+    """
+    # the commands that computed every stack value (None for a value from before the block or from a call)
+    producers = []
+    stores = []  # (position of a store, variable, its value producers, the live variables after it)
+    for position in block.commands:
+        command_parts = Parser.split_command(function_lines[position])
+        keyword = command_parts[KEYWORD_POS]
+        if keyword.startswith(Parser.UNCHECKED_COMPARE_PREFIX):
+            keyword = keyword[len(Parser.UNCHECKED_COMPARE_PREFIX):]
+        if keyword == Parser.PUSH_COMMAND_MARK:
+            producers.append([position])
+        elif keyword in BINARY_OPERATIONS:
+            second = _pop_producers(producers)
+            first = _pop_producers(producers)
+            producers.append(first + second + [position] if first is not None and second is not None else None)
+        elif keyword in UNARY_OPERATIONS:
+            operand = _pop_producers(producers)
+            producers.append(operand + [position] if operand is not None else None)
+        elif keyword == Parser.POP_COMMAND_MARK:
+            value = _pop_producers(producers)
+            variable = _get_variable(command_parts)
+            if variable is not None and value is not None:
+                stores.append((position, variable, value))
+        elif keyword == Parser.IF_GOTO_COMMAND_MARK:
+            _pop_producers(producers)
+        elif keyword == Parser.CALL_COMMAND_MARK:
+            for _ in range(int(command_parts[ARGS_VARS_NUM_POS])):
+                _pop_producers(producers)
+            producers.append(None)
+
+    # a store is dead if its variable is written again (or not read) before it is read
+    dead = set()
+    live = set(live_out)
+    store_positions = {position: (variable, value) for position, variable, value in stores}
+    for position in reversed(block.commands):
+        command_parts = Parser.split_command(function_lines[position])
+        if position in store_positions and store_positions[position][0] not in live:
+            dead.add(position)
+            dead.update(store_positions[position][1])
+            continue
+        if position not in dead:
+            _update_live_variables(command_parts, live)
+    return dead
+
+
+def format_text(eliminated):
+    """
+    :param eliminated: a dictionary from a function name to a tuple of the number of its removed commands, the
+    number of its uninitialized local variables and the indices of its changed local variables
+    :return: a text table of the functions with eliminated commands or uninitialized local variables, and the total
+    """
+    rows = [REPORT_HEADER]
+    for function_name, (removed_commands, uninitialized_locals, _) in eliminated.items():
+        if removed_commands or uninitialized_locals:
+            rows.append(REPORT_ROW.format(function_name, removed_commands, uninitialized_locals))
+    rows.append(REPORT_ROW.format(TOTAL_ROW_NAME, sum(removed for removed, _, _ in eliminated.values()),
+                                  sum(uninitialized for _, uninitialized, _ in eliminated.values())))
+    return "\n".join(rows)
+
+
+def _pop_producers(producers):
+    """
+    :param producers: the producers of the stack values of the block. Updated in place
+    :return: the producers of the top value (None if it is not known)
+    """
+    return producers.pop() if producers else None
+
+
+# main part
+if __name__ == '__main__':
+    import vmTranslator  # imported here, since vmTranslator imports this module for its optimizations
+
+    arguments_parser = argparse.ArgumentParser(description="Reports the dead stores and the uninitialized local "
+                                                           "variables the liveness analysis eliminates per function")
+    arguments_parser.add_argument("path", help="a vm file or a directory of vm files")
+    arguments = arguments_parser.parse_args()
+
+    vm_files = vmTranslator.get_vm_files(arguments.path) if os.path.isdir(arguments.path) else [arguments.path]
+    all_eliminated = {}
+    for vm_file in sorted(vm_files):
+        with open(vm_file) as input_file:
+            optimized_lines, file_eliminated = eliminate_dead_stores(input_file.read().splitlines())
+        all_eliminated.update(file_eliminated)
+    print(format_text(all_eliminated))
@@ -0,0 +1,207 @@
+###########
+# imports #
+###########
+import hackAssembler
+import hackInstructions
+
+#############
+# constants #
+#############
+VARIABLES_START_ADDRESS = 16  # symbols that are not predefined are allocated from this address
+VOLATILE_ADDRESS = hackAssembler.PREDEFINED_SYMBOLS["KBD"]  # reading it twice might give different values
+
+
+class KnownValues:
+    """
+    The values the A and D registers and the memory are known to hold at a point of straight code. A value is an
+    integer for a known number, a string for the address of a symbol, or a tuple for an unknown value, where equal
+    tuples are equal values
+    """
+
+    def __init__(self):
+        """
+        creates a state where nothing is known
+        """
+        self.__unknown_counter = 0
+        self.__expressions = {}  # (comp, operands) -> the value the computation produced
+        self.__a = self.__new_unknown()
+        self.__d = self.__new_unknown()
+        self.__memory = {}  # address value -> the value known to be stored in it
+
+    def __new_unknown(self):
+        """
+        :return: a new unknown value, which is different from all the existing values
+        """
+        self.__unknown_counter += 1
+        return (self.__unknown_counter,)
+
+    def forget(self):
+        """
+        forgets everything known about the registers and the memory (at a label, which may be reached by a jump)
+        """
+        self.__a = self.__new_unknown()
+        self.__d = self.__new_unknown()
+        self.__memory = {}
+
+    def is_redundant_a_instruction(self, instruction):
+        """
+        :param instruction: a cleaned A instruction
+        :return: True if the A register already holds its value, False otherwise
+        """
+        return self.__a == KnownValues.__get_address_value(instruction)
+
+    def apply_a_instruction(self, instruction):
+        """
+        updates the state after the given A instruction
+        :param instruction: a cleaned A instruction
+        """
+        self.__a = KnownValues.__get_address_value(instruction)
+
+    @staticmethod
+    def __get_address_value(instruction):
+        """
+        :param instruction: a cleaned A instruction
+        :return: the value the instruction loads into A. Predefined symbols are replaced with their addresses
+        """
+        value = hackInstructions.get_a_value(instruction)
+        return hackAssembler.PREDEFINED_SYMBOLS.get(value, value)
+
+    def __read_memory(self):
+        """
+        :return: the value of RAM[A]. An unknown value is remembered, so reading it again gives the same value
+        """
+        if self.__a not in self.__memory:
+            value = self.__new_unknown()
+            if self.__a == VOLATILE_ADDRESS:
+                return value
+            self.__memory[self.__a] = value
+        return self.__memory[self.__a]
+
+    def __compute(self, comp):
+        """
+        :param comp: the comp part of a C instruction
+        :return: the value the computation produces
+        """
+        if comp == hackInstructions.A_REGISTER:
+            return self.__a
+        if comp == hackInstructions.D_REGISTER:
+            return self.__d
+        m_value = self.__read_memory() if hackInstructions.reads_memory(comp) else None
+        if comp == hackInstructions.M_REGISTER:
+            return m_value
+        value = hackInstructions.compute(comp, self.__a if isinstance(self.__a, int) else None,
+                                         self.__d if isinstance(self.__d, int) else None,
+                                         m_value if isinstance(m_value, int) else None)
+        if value is not None:
+            return value
+        # the same computation on the same values gives the same value
+        expression = (comp, self.__a if hackInstructions.A_REGISTER in comp else None,
+                      self.__d if hackInstructions.D_REGISTER in comp else None, m_value)
+        if expression not in self.__expressions:
+            self.__expressions[expression] = self.__new_unknown()
+        return self.__expressions[expression]
+
+    def is_redundant_address_load(self, a_instruction, c_instruction):
+        """
+        :param a_instruction: a cleaned A instruction
+        :param c_instruction: a cleaned C instruction that follows it
+        :return: True if the pair only computes into A the value it already holds (like @SP, A=M when A already
+        points to the top of the stack), False otherwise
+        """
+        dest, comp, jump = hackInstructions.split_c_instruction(c_instruction)
+        if jump or dest != hackInstructions.A_REGISTER:
+            return False
+        current_a = self.__a
+        self.__a = KnownValues.__get_address_value(a_instruction)
+        value = self.__compute(comp)
+        self.__a = current_a
+        return value == current_a
+
+    def is_redundant_c_instruction(self, instruction):
+        """
+        :param instruction: a cleaned C instruction
+        :return: True if the instruction does not jump and every register it writes already holds the computed
+        value, False otherwise
+        """
+        dest, comp, jump = hackInstructions.split_c_instruction(instruction)
+        if jump:
+            return False
+        value = self.__compute(comp)
+        if hackInstructions.A_REGISTER in dest and self.__a != value:
+            return False
+        if hackInstructions.D_REGISTER in dest and self.__d != value:
+            return False
+        return hackInstructions.M_REGISTER not in dest or self.__memory.get(self.__a) == value
+
+    def apply_c_instruction(self, instruction):
+        """
+        updates the state after the given C instruction
+        :param instruction: a cleaned C instruction
+        """
+        dest, comp, jump = hackInstructions.split_c_instruction(instruction)
+        value = self.__compute(comp)
+        if hackInstructions.M_REGISTER in dest:  # written to the address before A changes
+            self.__memory = {address: stored for address, stored in self.__memory.items()
+                             if not KnownValues.__may_alias(address, self.__a)}
+            if self.__a != VOLATILE_ADDRESS:
+                self.__memory[self.__a] = value
+        if hackInstructions.A_REGISTER in dest:
+            self.__a = value
+        if hackInstructions.D_REGISTER in dest:
+            self.__d = value
+
+    @staticmethod
+    def __may_alias(first_address, second_address):
+        """
+        :param first_address: an address value
+        :param second_address: an address value
+        :return: True if the addresses might be the same memory word, False if they are surely different
+        """
+        if first_address == second_address or isinstance(first_address, tuple) or \
+                isinstance(second_address, tuple):
+            return True
+        if type(first_address) == type(second_address):  # different numbers or different symbols
+            return False
+        number = first_address if isinstance(first_address, int) else second_address
+        return number >= VARIABLES_START_ADDRESS
+
+
+def optimize(asm_lines):
+    """
+    removes the instructions that load a register with the value it already holds or store into memory the value it
+    already holds, by following the known values of straight code. Everything is forgotten at labels. Comments are
+    kept in place
+    :param asm_lines: the asm lines (without line endings)
+    :return: a tuple of the optimized asm lines and the number of the removed instructions
+    """
+    optimized = []
+    removed = 0
+    known_values = KnownValues()
+    position = 0
+    while position < len(asm_lines):
+        line = asm_lines[position]
+        position += 1
+        instruction = hackInstructions.clean_line(line)
+        if not instruction:  # comment or empty line
+            optimized.append(line)
+        elif hackInstructions.is_label(instruction):
+            known_values.forget()
+            optimized.append(line)
+        elif hackInstructions.is_a_instruction(instruction):
+            next_instruction = hackInstructions.clean_line(asm_lines[position]) if position < len(asm_lines) else ""
+            if known_values.is_redundant_a_instruction(instruction):
+                removed += 1
+            elif next_instruction and not hackInstructions.is_label(next_instruction) and \
+                    not hackInstructions.is_a_instruction(next_instruction) and \
+                    known_values.is_redundant_address_load(instruction, next_instruction):
+                position += 1  # skips the pair
+                removed += 2
+            else:
+                known_values.apply_a_instruction(instruction)
+                optimized.append(line)
+        elif known_values.is_redundant_c_instruction(instruction):
+            removed += 1
+        else:
+            known_values.apply_c_instruction(instruction)
+            optimized.append(line)
+    return optimized, removed
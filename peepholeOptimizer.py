@@ -0,0 +1,122 @@
+###########
+# imports #
+###########
+import hackInstructions
+
+#############
+# constants #
+#############
+STACK_ADDRESS = "@SP"
+INCREMENT_MEMORY = "M=M+1"
+POP_TO_A = "AM=M-1"
+GO_TO_REGISTER_M = "A=M"
+ZERO_ADDRESS = "@0"
+ADD_A_TO_D = "D=D+A"
+# a push (or a run of pushes) that is immediately followed by a pop: the last increment of the stack pointer is
+# cancelled, and A points to the pushed value
+PUSH_POP_PATTERN = (INCREMENT_MEMORY, STACK_ADDRESS, POP_TO_A)
+# adding zero to D
+ADD_ZERO_PATTERN = (ZERO_ADDRESS, ADD_A_TO_D)
+
+
+def optimize(asm_lines):
+    """
+    runs the peephole optimizer on the given asm lines. Comments are kept in place, and patterns are never matched
+    across labels (a label may be reached by a jump)
+    :param asm_lines: the asm lines (without line endings)
+    :return: the optimized asm lines
+    """
+    optimized = []
+    window = []  # the positions in optimized of the instructions since the last label
+    for line in asm_lines:
+        instruction = hackInstructions.clean_line(line)
+        optimized.append(line)
+        if not instruction:  # comment or empty line
+            continue
+        if hackInstructions.is_label(instruction):
+            window = []
+            continue
+        window.append(len(optimized) - 1)
+        _apply_patterns(optimized, window)
+    return [line for line in optimized if line is not None]
+
+
+def _apply_patterns(optimized, window):
+    """
+    applies the patterns on the last instructions of the window until none of them matches
+    :param optimized: the optimized lines so far. Removed lines are replaced by None
+    :param window: the positions of the instructions since the last label. Updated on removals
+    """
+    changed = True
+    while changed:
+        changed = _cancel_push_pop(optimized, window) or _remove_add_zero(optimized, window)
+
+
+def _get_tail(optimized, window, length):
+    """
+    :param optimized: the optimized lines so far
+    :param window: the positions of the instructions since the last label
+    :param length: the number of instructions
+    :return: a tuple of the last instructions in the window, or None if there are not enough instructions
+    """
+    if len(window) < length:
+        return None
+    return tuple(hackInstructions.clean_line(optimized[position]) for position in window[-length:])
+
+
+def _remove_instruction(optimized, window, window_index):
+    """
+    removes an instruction from the optimized lines
+    :param optimized: the optimized lines so far
+    :param window: the positions of the instructions since the last label
+    :param window_index: the index of the removed instruction in the window
+    """
+    optimized[window[window_index]] = None
+    del window[window_index]
+
+
+def _cancel_push_pop(optimized, window):
+    """
+    @SP, M=M+1 (n times), @SP, AM=M-1 -> @SP, M=M+1 (n-1 times), A=M
+    :return: True if the pattern was applied, False otherwise
+    """
+    if _get_tail(optimized, window, len(PUSH_POP_PATTERN)) != PUSH_POP_PATTERN:
+        return False
+    # the increments must be of the stack pointer
+    increments_start = len(window) - len(PUSH_POP_PATTERN)
+    while increments_start > 0 and hackInstructions.clean_line(optimized[window[increments_start - 1]]) == \
+            INCREMENT_MEMORY:
+        increments_start -= 1
+    if increments_start == 0 or hackInstructions.clean_line(optimized[window[increments_start - 1]]) != \
+            STACK_ADDRESS:
+        return False
+    optimized[window[-1]] = GO_TO_REGISTER_M
+    _remove_instruction(optimized, window, -3)
+    _remove_instruction(optimized, window, -2)
+    return True
+
+
+def _remove_add_zero(optimized, window):
+    """
+    @0, D=D+A, X -> X, when X sets the A register without reading it or writing to the memory
+    :return: True if the pattern was applied, False otherwise
+    """
+    tail = _get_tail(optimized, window, len(ADD_ZERO_PATTERN) + 1)
+    if tail is None or tail[:-1] != ADD_ZERO_PATTERN or not _overrides_a(tail[-1]):
+        return False
+    _remove_instruction(optimized, window, -3)
+    _remove_instruction(optimized, window, -2)
+    return True
+
+
+def _overrides_a(instruction):
+    """
+    :param instruction: a cleaned asm instruction
+    :return: True if the instruction sets the A register without using it before (by reading it or by writing to
+    the memory it points to), False otherwise
+    """
+    if hackInstructions.is_a_instruction(instruction):
+        return True
+    dest, comp, jump = hackInstructions.split_c_instruction(instruction)
+    return hackInstructions.A_REGISTER in dest and hackInstructions.M_REGISTER not in dest and not jump and \
+        hackInstructions.A_REGISTER not in comp and not hackInstructions.reads_memory(comp)
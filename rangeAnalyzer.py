@@ -0,0 +1,341 @@
+###########
+# imports #
+###########
+import Parser
+import vmOptimizer
+
+#############
+# constants #
+#############
+KEYWORD_POS = 0
+SEGMENT_POS = 1
+INDEX_POS = 2
+ARGS_NUM_POS = 2
+JUMP_LABEL_POS = 1
+MIN_WORD = -(1 << 15)
+MAX_WORD = (1 << 15) - 1
+FULL_RANGE = (MIN_WORD, MAX_WORD)
+BOOLEAN_RANGE = (-1, 0)
+CONSTANT_SEGMENT = "constant"
+# the segments whose words only the current function changes (as long as they are not accessed through pointers)
+TRACKED_SEGMENTS = ("local", "argument")
+LOCAL_SEGMENT = "local"
+ADD_OPERATION = "add"
+SUB_OPERATION = "sub"
+NEGATION_OPERATION = "neg"
+AND_OPERATION = "and"
+OR_OPERATION = "or"
+NOT_OPERATION = "not"
+EQUAL_OPERATION = "eq"
+GREATER_OPERATION = "gt"
+LOWER_OPERATION = "lt"
+COMPARE_OPERATIONS = (EQUAL_OPERATION, GREATER_OPERATION, LOWER_OPERATION)
+WIDENING_VISITS = 3  # after this number of visits of a loop start, the growing bounds of its ranges jump to the limits
+
+
+class StackValue:
+    """
+    The abstract value of a stack word: the range of its possible values, the variable it was pushed from (if it is
+    still the value of the variable) and the comparison it is the result of (if any)
+    """
+
+    def __init__(self, value_range, variable=None, condition=None, negated=False):
+        """
+        creates a new abstract value
+        :param value_range: a tuple of the minimal and maximal values
+        :param variable: the (segment, index, version) of the variable the value is a copy of, or None
+        :param condition: a tuple of (operation, x, y) for a comparison result of x and y (StackValues), or None
+        :param negated: True if the value is the negation of the comparison result
+        """
+        self.range = value_range
+        self.variable = variable
+        self.condition = condition
+        self.negated = negated
+
+
+def mark_unchecked_comparisons(vm_lines):
+    """
+    replaces every comparison whose subtraction cannot overflow with the matching unchecked comparison. Equality
+    comparisons never need the overflow checks. For gt and lt, the ranges of the local and argument variables are
+    found by an interval analysis over the basic blocks of every function, which follows constants, additions,
+    and masks and the conditions of the branches (so loop counters are bounded by their loop conditions)
+    :param vm_lines: the vm lines
+    :return: the vm lines with the unchecked comparisons
+    """
+    marked = []
+    for function_lines in vmOptimizer.split_functions(vm_lines):
+        function_lines = list(function_lines)
+        for position in _find_unchecked_comparisons(function_lines):
+            keyword = Parser.split_command(function_lines[position])[KEYWORD_POS]
+            function_lines[position] = function_lines[position].replace(
+                keyword, Parser.UNCHECKED_COMPARE_PREFIX + keyword, 1)
+        marked.extend(function_lines)
+    return marked
+
+
+def _find_unchecked_comparisons(function_lines):
+    """
+    :param function_lines: the vm lines of a single function
+    :return: the positions of the comparisons of the function that cannot overflow
+    """
+    blocks, label_blocks = vmOptimizer.build_cfg(function_lines)
+    unchecked = set()
+    for block in blocks:
+        for position in block.commands:
+            if Parser.split_command(function_lines[position])[KEYWORD_POS] == EQUAL_OPERATION:
+                unchecked.add(position)
+    jump_labels = [block.get_jump_label() for block in blocks]
+    if any(label is not None and label not in label_blocks for label in jump_labels):
+        return unchecked  # jumps outside of the function are left for the translator to handle
+
+    entry_states = _find_entry_states(function_lines, blocks, label_blocks)
+    for block_index, block in enumerate(blocks):
+        if block_index in entry_states:
+            _run_block(function_lines, block, entry_states[block_index], unchecked)
+    return unchecked
+
+
+def _find_entry_states(function_lines, blocks, label_blocks):
+    """
+    finds the ranges of the variables at the start of every reachable block, by iterating until no range grows
+    :return: a dictionary from a block index to its variables ranges (a dictionary from (segment, index) to a range.
+    Missing variables might hold any value)
+    """
+    entry_states = {0: {}}
+    visits = {}
+    to_visit = [0]
+    while to_visit:
+        block_index = to_visit.pop()
+        visits[block_index] = visits.get(block_index, 0) + 1
+        block = blocks[block_index]
+        exit_state, jump_value = _run_block(function_lines, block, entry_states[block_index], None)
+        for successor, state in _get_successors_states(blocks, label_blocks, block_index, exit_state, jump_value):
+            if successor not in entry_states:
+                entry_states[successor] = state
+            else:
+                # every loop has an edge back to an earlier block, whose ranges are widened to end the iterations
+                joined = _join_states(entry_states[successor], state,
+                                      successor <= block_index and visits.get(successor, 0) >= WIDENING_VISITS)
+                if joined == entry_states[successor]:
+                    continue
+                entry_states[successor] = joined
+            if successor not in to_visit:
+                to_visit.append(successor)
+    return entry_states
+
+
+def _get_successors_states(blocks, label_blocks, block_index, exit_state, jump_value):
+    """
+    :param blocks: the basic blocks of the function
+    :param label_blocks: the index of the block of every label
+    :param block_index: the index of the current block
+    :param exit_state: the variables ranges at the end of the block
+    :param jump_value: the StackValue an if-goto at the end of the block pops, or None
+    :return: a list of (successor block index, variables ranges at its start) for every edge that might be taken
+    """
+    block = blocks[block_index]
+    successors = []
+    jump_label = block.get_jump_label()
+    if jump_label is not None:
+        jump_state = exit_state
+        if jump_value is not None:  # an if-goto jumps when its value is true (not zero)
+            jump_state = _refine_state(exit_state, jump_value, True)
+        if jump_state is not None:
+            successors.append((label_blocks[jump_label], jump_state))
+    if block.falls_through() and block_index + 1 < len(blocks):
+        next_state = exit_state
+        if jump_value is not None:
+            next_state = _refine_state(exit_state, jump_value, False)
+        if next_state is not None:
+            successors.append((block_index + 1, next_state))
+    return successors
+
+
+def _join_states(first_state, second_state, widen):
+    """
+    :param first_state: the previous variables ranges at the start of a block
+    :param second_state: the variables ranges of another edge into the block
+    :param widen: True for moving the bounds that grew to the word limits
+    :return: the variables ranges that cover both states
+    """
+    joined = {}
+    for variable, (first_min, first_max) in first_state.items():
+        if variable not in second_state:
+            continue
+        second_min, second_max = second_state[variable]
+        joined_min, joined_max = min(first_min, second_min), max(first_max, second_max)
+        if widen:
+            joined_min = MIN_WORD if joined_min < first_min else joined_min
+            joined_max = MAX_WORD if joined_max > first_max else joined_max
+        if (joined_min, joined_max) != FULL_RANGE:
+            joined[variable] = (joined_min, joined_max)
+    return joined
+
+
+def _refine_state(state, value, is_true):
+    """
+    narrows the ranges of the compared variables on a branch edge
+    :param state: the variables ranges before the branch
+    :param value: the StackValue the branch depends on
+    :param is_true: True for the edge taken when the value is true, False otherwise
+    :return: the variables ranges on the edge, or None if the edge is never taken
+    """
+    if value.condition is None:
+        return state
+    operation, x, y = value.condition
+    holds = is_true != value.negated
+    if operation == GREATER_OPERATION:  # x > y is y < x
+        operation, x, y = LOWER_OPERATION, y, x
+    if operation == EQUAL_OPERATION:
+        if not holds:
+            return state
+        x_range = y_range = (max(x.range[0], y.range[0]), min(x.range[1], y.range[1]))
+    elif holds:  # x < y
+        x_range = (x.range[0], min(x.range[1], y.range[1] - 1))
+        y_range = (max(y.range[0], x.range[0] + 1), y.range[1])
+    else:  # x >= y
+        x_range = (max(x.range[0], y.range[0]), x.range[1])
+        y_range = (y.range[0], min(y.range[1], x.range[1]))
+    if x_range[0] > x_range[1] or y_range[0] > y_range[1]:
+        return None
+    refined = dict(state)
+    for compared, compared_range in ((x, x_range), (y, y_range)):
+        if compared.variable is not None:
+            refined[compared.variable[:2]] = compared_range
+    return refined
+
+
+def _run_block(function_lines, block, entry_state, unchecked):
+    """
+    follows the ranges of the variables and of the stack words through the commands of a block
+    :param function_lines: the vm lines of the function
+    :param block: the BasicBlock
+    :param entry_state: the variables ranges at the start of the block
+    :param unchecked: a set to add the positions of the comparisons that cannot overflow to, or None
+    :return: a tuple of the variables ranges at the end of the block and the StackValue popped by its if-goto (or
+    None if it does not end with an if-goto)
+    """
+    state = dict(entry_state)
+    versions = {}  # the number of assignments of every variable in the block, to tell apart copies of old values
+    stack = []  # the stack words pushed in the block (the words below them might hold any value)
+    jump_value = None
+
+    def pop():
+        return stack.pop() if stack else StackValue(FULL_RANGE)
+
+    for position in block.commands:
+        command_parts = Parser.split_command(function_lines[position])
+        keyword = command_parts[KEYWORD_POS]
+        if keyword == Parser.PUSH_COMMAND_MARK:
+            stack.append(_push_value(state, versions, command_parts))
+        elif keyword == Parser.POP_COMMAND_MARK:
+            value = pop()
+            variable = (command_parts[SEGMENT_POS], int(command_parts[INDEX_POS]))
+            if variable[0] in TRACKED_SEGMENTS:
+                versions[variable] = versions.get(variable, 0) + 1
+                if value.range == FULL_RANGE:
+                    state.pop(variable, None)
+                else:
+                    state[variable] = value.range
+        elif keyword == Parser.FUNCTION_COMMAND_MARK:
+            for local_index in range(int(command_parts[ARGS_NUM_POS])):
+                state[(LOCAL_SEGMENT, local_index)] = (0, 0)  # the locals are initialized to 0
+        elif keyword == Parser.CALL_COMMAND_MARK:
+            for _ in range(int(command_parts[ARGS_NUM_POS])):
+                pop()
+            stack.append(StackValue(FULL_RANGE))
+        elif keyword == Parser.IF_GOTO_COMMAND_MARK:
+            jump_value = _forget_old_copies(pop(), versions)
+        elif keyword in COMPARE_OPERATIONS:
+            y = pop()
+            x = pop()
+            if unchecked is not None and _cannot_overflow(x.range, y.range):
+                unchecked.add(position)
+            stack.append(StackValue(BOOLEAN_RANGE, condition=(keyword, x, y)))
+        elif keyword == NOT_OPERATION:
+            value = pop()
+            stack.append(StackValue((~value.range[1], ~value.range[0]), condition=value.condition,
+                                    negated=not value.negated))
+        elif keyword == NEGATION_OPERATION:
+            value_min, value_max = pop().range
+            stack.append(StackValue(_to_range(-value_max, -value_min)))
+        elif keyword in (ADD_OPERATION, SUB_OPERATION, AND_OPERATION, OR_OPERATION):
+            y_range = pop().range
+            x_range = pop().range
+            stack.append(StackValue(_binary_operation_range(keyword, x_range, y_range)))
+    return state, jump_value
+
+
+def _forget_old_copies(value, versions):
+    """
+    :param value: a StackValue
+    :param versions: the number of assignments of every variable in the block
+    :return: the value, where the compared values that are no longer the values of their variables are not linked to
+    them
+    """
+    if value.condition is None:
+        return value
+    operation, x, y = value.condition
+    compared = []
+    for compared_value in (x, y):
+        variable = compared_value.variable
+        if variable is not None and versions.get(variable[:2], 0) != variable[2]:
+            compared_value = StackValue(compared_value.range)
+        compared.append(compared_value)
+    return StackValue(value.range, condition=(operation, compared[0], compared[1]), negated=value.negated)
+
+
+def _push_value(state, versions, command_parts):
+    """
+    :param state: the current variables ranges
+    :param versions: the number of assignments of every variable in the block
+    :param command_parts: the parts of a push command
+    :return: the StackValue of the pushed word
+    """
+    segment, index = command_parts[SEGMENT_POS], int(command_parts[INDEX_POS])
+    if segment == CONSTANT_SEGMENT:
+        return StackValue((index, index))
+    if segment in TRACKED_SEGMENTS:
+        variable = (segment, index)
+        return StackValue(state.get(variable, FULL_RANGE), variable + (versions.get(variable, 0),))
+    return StackValue(FULL_RANGE)
+
+
+def _to_range(value_min, value_max):
+    """
+    :param value_min: the minimal mathematical value of a computation
+    :param value_max: the maximal mathematical value of a computation
+    :return: the range of the computed word, which might be anything if the computation might overflow
+    """
+    if value_min < MIN_WORD or value_max > MAX_WORD:
+        return FULL_RANGE
+    return value_min, value_max
+
+
+def _binary_operation_range(operation, x_range, y_range):
+    """
+    :param operation: add, sub, and or or
+    :param x_range: the range of the second stack value
+    :param y_range: the range of the top stack value
+    :return: the range of the result
+    """
+    if operation == ADD_OPERATION:
+        return _to_range(x_range[0] + y_range[0], x_range[1] + y_range[1])
+    if operation == SUB_OPERATION:
+        return _to_range(x_range[0] - y_range[1], x_range[1] - y_range[0])
+    not_negative_maxes = [value_max for value_min, value_max in (x_range, y_range) if value_min >= 0]
+    if operation == AND_OPERATION:  # a not negative mask bounds the result
+        return (0, min(not_negative_maxes)) if not_negative_maxes else FULL_RANGE
+    if len(not_negative_maxes) < 2:  # or operation
+        return FULL_RANGE
+    # the result has no bits above the highest bit of the operands
+    return max(x_range[0], y_range[0]), (1 << max(not_negative_maxes).bit_length()) - 1
+
+
+def _cannot_overflow(x_range, y_range):
+    """
+    :param x_range: the range of the second stack value
+    :param y_range: the range of the top stack value
+    :return: True if x - y surely fits in a word, False otherwise
+    """
+    return x_range[0] - y_range[1] >= MIN_WORD and x_range[1] - y_range[0] <= MAX_WORD
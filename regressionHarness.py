@@ -0,0 +1,293 @@
+###########
+# imports #
+###########
+import argparse
+import bisect
+import json
+import os
+import sys
+
+import costAnalyzer
+import hackAssembler
+import hackInstructions
+import hackSimulator
+import translatorConfig
+import vmTranslator
+
+#############
+# constants #
+#############
+LEVEL_PREFIX = "-O"
+JSON_INDENT = 2
+INPUT_SEPARATOR = "="
+STACK_POINTER_ADDRESS = 0
+LOCAL_ADDRESS = 1
+FRAME_SIZE = 5  # the return address, LCL, ARG, THIS and THAT of the caller are saved below the frame
+SAVED_LOCAL_OFFSET = 1  # the saved LCL is right after the return address
+STACK_INITIAL_ADDRESS = 256
+HEAP_BASE = 2048
+KEYBOARD_ADDRESS = hackAssembler.PREDEFINED_SYMBOLS["KBD"]
+# the compared RAM regions (besides the stack below the stack pointer): the segment pointers and the temp
+# registers, the static variables, and the heap and the screen. R13-R15 are scratch registers of the translator.
+# The temp registers are always compared: the dead stores elimination keeps the temp stores that stay in the final RAM
+COMPARED_REGIONS = ((0, 13), (16, STACK_INITIAL_ADDRESS), (HEAP_BASE, KEYBOARD_ADDRESS))
+MAX_REPORTED_DIFFERENCES = 8
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+STATUS_OK = "ok"
+STATUS_MISMATCH = "MISMATCH"
+STATUS_NOT_HALTED = "NOT HALTED"
+STATUS_SKIPPED = "skipped"
+FAILED_STATUSES = (STATUS_MISMATCH, STATUS_NOT_HALTED)
+REPORT_HEADER = "{:<24} {:<6} {:<10} {:>9} {:>9} {:>8} {:>11} {:>11} {:>8}".format(
+    "program", "level", "status", "base_rom", "opt_rom", "rom", "base_cycles", "opt_cycles", "cycles")
+REPORT_ROW = "{:<24} {:<6} {:<10} {:>9} {:>9} {:>7.1f}% {:>11} {:>11} {:>7.1f}%"
+REPORT_SKIPPED_ROW = "{:<24} {:<6} {:<10} {}"
+DIFFERENCES_ROW = "    RAM[{}]: {} (baseline) != {} (optimized)"
+SUMMARY_ROW = "{} runs: {} failed, {} slower, {} larger than the baseline"
+
+
+def get_programs(corpus_path):
+    """
+    :param corpus_path: a vm file, a directory of vm files (a single program) or a directory of programs (vm files
+    and directories of vm files)
+    :return: a sorted list of the programs paths
+    """
+    if not os.path.isdir(corpus_path) or vmTranslator.get_vm_files(corpus_path):
+        return [corpus_path]
+    programs = []
+    for entry in sorted(os.listdir(corpus_path)):
+        entry_path = os.path.join(corpus_path, entry)
+        if (os.path.isdir(entry_path) and vmTranslator.get_vm_files(entry_path)) or \
+                entry.endswith("." + vmTranslator.VM_SUFFIX):
+            programs.append(entry_path)
+    return programs
+
+
+def run_program(path, config, inputs, max_cycles):
+    """
+    translates a program and runs it on the hack simulator
+    :param path: a vm file or a directory of vm files
+    :param config: the code generation configuration
+    :param inputs: a dictionary from a RAM address to the value it holds when the program starts
+    :param max_cycles: the maximal number of cycles to execute
+    :return: a tuple of the number of the ROM words of the program, the simulator after the run and the functions
+    of the program with their changed local variables (see _get_changed_locals)
+    :raise ValueError: if the program does not fit in the ROM
+    """
+    eliminated = {}
+    asm_lines = costAnalyzer.translate_to_lines(path, config, eliminated)
+    words = hackAssembler.assemble(asm_lines)
+    simulator = hackSimulator.HackSimulator(words)
+    for address, value in inputs.items():
+        simulator.set_ram(address, value)
+    simulator.run(max_cycles)
+    return len(words), simulator, _get_changed_locals(asm_lines, eliminated)
+
+
+def _get_changed_locals(asm_lines, eliminated):
+    """
+    :param asm_lines: the asm lines of a program
+    :param eliminated: the dead stores elimination of every function of the program (see
+    vmTranslator.optimize_vm_lines). Empty when the elimination is off
+    :return: a list of tuples of the ROM address of a function and the indices of its local variables whose values
+    may change by the dead stores elimination, sorted by the address. The code of a function runs from its address
+    to the address of the next function
+    """
+    labels = hackInstructions.parse_program(asm_lines)[1]
+    return sorted(((labels[function_name], changed_locals)
+                   for function_name, (_, _, changed_locals) in eliminated.items() if function_name in labels),
+                  key=lambda function: function[0])
+
+
+def _get_function_locals(functions, code_address):
+    """
+    :param functions: the functions of a program with their changed local variables (see _get_changed_locals)
+    :param code_address: a ROM address
+    :return: the indices of the changed local variables of the function whose code holds the address (none for the
+    code outside of the functions)
+    """
+    position = bisect.bisect_right([function_address for function_address, _ in functions], code_address) - 1
+    return functions[position][1] if position >= 0 else frozenset()
+
+
+def find_differences(baseline, optimized, baseline_functions=(), optimized_functions=()):
+    """
+    compares the final states of two runs: the compared regions and the stack below the stack pointer. The words
+    above the stack pointer that the stack reached are left from earlier calls, and the return addresses in the
+    frames depend on the code layout, so they are not compared. The local variables and the working stacks of the
+    frames are compared, except for the local variables the dead stores elimination proved dead in the function of
+    the frame, which keep a different value
+    :param baseline: the simulator after the baseline run
+    :param optimized: the simulator after the optimized run
+    :param baseline_functions: the functions of the baseline program with their changed local variables (see
+    _get_changed_locals)
+    :param optimized_functions: the functions of the optimized program with their changed local variables
+    :return: a list of the addresses whose values are different
+    """
+    baseline_ram = baseline.get_ram()
+    optimized_ram = optimized.get_ram()
+    dead_stack_start = min(baseline_ram[STACK_POINTER_ADDRESS], optimized_ram[STACK_POINTER_ADDRESS])
+    dead_stack_end = max(baseline.get_peak_stack_pointer(), optimized.get_peak_stack_pointer())
+    ignored = set()
+    for simulator, functions in ((baseline, baseline_functions), (optimized, optimized_functions)):
+        ram = simulator.get_ram()
+        frames = _get_frames(ram)
+        ignored.update(frame - FRAME_SIZE for frame in frames)
+        # the current frame runs the code at the program counter, and every caller runs the code at the return
+        # address saved in the frame it called
+        code_addresses = [simulator.get_pc()] + [ram[frame - FRAME_SIZE] for frame in frames[:-1]]
+        for frame, code_address in zip(frames, code_addresses):
+            ignored.update(frame + index for index in _get_function_locals(functions, code_address))
+    stack_end = max(baseline_ram[STACK_POINTER_ADDRESS], optimized_ram[STACK_POINTER_ADDRESS], STACK_INITIAL_ADDRESS)
+    differences = []
+    for start, end in COMPARED_REGIONS + ((STACK_INITIAL_ADDRESS, min(stack_end, HEAP_BASE)),):
+        differences.extend(address for address in range(start, end)
+                           if baseline_ram[address] != optimized_ram[address] and address not in ignored and
+                           not dead_stack_start <= address < dead_stack_end)
+    return sorted(differences)
+
+
+def _get_frames(ram):
+    """
+    :param ram: the RAM after a run
+    :return: the list of the LCL addresses of the frames on the stack from the current one to the first one, found
+    by following the saved LCL of every frame
+    """
+    frames = []
+    frame = ram[LOCAL_ADDRESS]
+    while STACK_INITIAL_ADDRESS + FRAME_SIZE <= frame <= ram[STACK_POINTER_ADDRESS]:
+        frames.append(frame)
+        caller_frame = ram[frame - FRAME_SIZE + SAVED_LOCAL_OFFSET]
+        if caller_frame >= frame:  # the frames of the callers are always lower
+            break
+        frame = caller_frame
+    return frames
+
+
+def check_program(path, level, baseline_level, inputs, max_cycles):
+    """
+    runs a program translated in the baseline level and in an optimized level, and compares their final states
+    :param path: a vm file or a directory of vm files
+    :param level: the optimized level
+    :param baseline_level: the baseline level
+    :param inputs: a dictionary from a RAM address to the value it holds when the programs start
+    :param max_cycles: the maximal number of cycles to execute
+    :return: a dictionary of the program, the level, the status, the ROM words and the cycles of both runs, and the
+    different RAM words (or the reason the program is skipped)
+    """
+    record = {"program": os.path.basename(os.path.normpath(path)), "level": LEVEL_PREFIX + level}
+    try:
+        baseline_config = translatorConfig.get_level_config(baseline_level)
+        optimized_config = translatorConfig.get_level_config(level)
+        baseline_words, baseline, baseline_functions = run_program(path, baseline_config, inputs, max_cycles)
+        optimized_words, optimized, optimized_functions = run_program(path, optimized_config, inputs, max_cycles)
+    except ValueError as error:
+        record.update({"status": STATUS_SKIPPED, "reason": str(error)})
+        return record
+    baseline_ram = baseline.get_ram()
+    optimized_ram = optimized.get_ram()
+    differences = find_differences(baseline, optimized, baseline_functions, optimized_functions)
+    if not baseline.is_halted() or not optimized.is_halted():
+        status = STATUS_NOT_HALTED
+    elif differences:
+        status = STATUS_MISMATCH
+    else:
+        status = STATUS_OK
+    record.update({"status": status,
+                   "baseline_rom_words": baseline_words, "rom_words": optimized_words,
+                   "baseline_cycles": baseline.get_cycles(), "cycles": optimized.get_cycles(),
+                   "differences": [(address, baseline_ram[address], optimized_ram[address])
+                                   for address in differences[:MAX_REPORTED_DIFFERENCES]]})
+    return record
+
+
+def run_corpus(corpus_path, levels, baseline_level, inputs, max_cycles):
+    """
+    checks every program of the corpus in every optimized level
+    :return: a list of the records of the checks (as check_program returns)
+    """
+    return [check_program(program, level, baseline_level, inputs, max_cycles)
+            for program in get_programs(corpus_path) for level in levels]
+
+
+def _get_change(baseline_value, value):
+    """
+    :return: the change from the baseline value in percents
+    """
+    return 100.0 * (value - baseline_value) / baseline_value if baseline_value else 0.0
+
+
+def format_text(records):
+    """
+    :param records: the records of the checks
+    :return: the text report: a row of the ROM words and the cycles of every check, the different RAM words of the
+    mismatches and a summary
+    """
+    lines = [REPORT_HEADER]
+    for record in records:
+        if record["status"] == STATUS_SKIPPED:
+            lines.append(REPORT_SKIPPED_ROW.format(record["program"], record["level"], record["status"],
+                                                   record["reason"]))
+            continue
+        lines.append(REPORT_ROW.format(record["program"], record["level"], record["status"],
+                                       record["baseline_rom_words"], record["rom_words"],
+                                       _get_change(record["baseline_rom_words"], record["rom_words"]),
+                                       record["baseline_cycles"], record["cycles"],
+                                       _get_change(record["baseline_cycles"], record["cycles"])))
+        for address, baseline_value, optimized_value in record["differences"]:
+            lines.append(DIFFERENCES_ROW.format(address, baseline_value, optimized_value))
+    checked = [record for record in records if record["status"] != STATUS_SKIPPED]
+    lines.append(SUMMARY_ROW.format(len(records), count_failures(records),
+                                    sum(record["cycles"] > record["baseline_cycles"] for record in checked),
+                                    sum(record["rom_words"] > record["baseline_rom_words"] for record in checked)))
+    return "\n".join(lines)
+
+
+def count_failures(records):
+    """
+    :param records: the records of the checks
+    :return: the number of the checks whose optimized run does not match the baseline run
+    """
+    return sum(record["status"] in FAILED_STATUSES for record in records)
+
+
+def parse_inputs(input_arguments):
+    """
+    :param input_arguments: a list of "address=value" texts
+    :return: a dictionary from a RAM address to its value
+    """
+    inputs = {}
+    for input_argument in input_arguments:
+        address, value = input_argument.split(INPUT_SEPARATOR)
+        inputs[int(address)] = int(value)
+    return inputs
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Checks that the optimized translations of a corpus of vm "
+                                                           "programs end in the same state as the baseline "
+                                                           "translation, and reports their ROM words and cycles")
+    arguments_parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS,
+                                  help="a vm file, a directory of vm files or a directory of programs (the corpus "
+                                       "directory by default)")
+    arguments_parser.add_argument("-O", dest="levels", nargs="+", default=[translatorConfig.LEVEL_SPEED],
+                                  choices=translatorConfig.OPTIMIZATION_LEVELS, help="the optimized levels")
+    arguments_parser.add_argument("--baseline", default=translatorConfig.LEVEL_NONE,
+                                  choices=translatorConfig.OPTIMIZATION_LEVELS, help="the baseline level")
+    arguments_parser.add_argument("--input", dest="inputs", action="append", default=[],
+                                  help="a RAM word the programs start with, as address=value (like 24576=75 for a "
+                                       "pressed key)")
+    arguments_parser.add_argument("--cycles", type=int, default=hackSimulator.DEFAULT_MAX_CYCLES,
+                                  help="maximal number of cycles of every run")
+    arguments_parser.add_argument("--json", action="store_true", help="prints the report as json")
+    arguments = arguments_parser.parse_args()
+
+    report = run_corpus(arguments.corpus, arguments.levels, arguments.baseline, parse_inputs(arguments.inputs),
+                        arguments.cycles)
+    if arguments.json:
+        print(json.dumps(report, indent=JSON_INDENT))
+    else:
+        print(format_text(report))
+    if count_failures(report):
+        sys.exit(1)
@@ -0,0 +1,348 @@
+###########
+# imports #
+###########
+import argparse
+import os
+import sys
+
+import Parser
+import vmOptimizer
+import vmTranslator
+
+#############
+# constants #
+#############
+KEYWORD_POS = 0
+FUNCTION_NAME_POS = 1
+ARGS_VARS_NUM_POS = 2
+STACK_BASE = 256  # the bootstrap sets the stack pointer to this address
+HEAP_BASE = 2048  # the stack region ends where the heap starts
+FRAME_SIZE = 5  # a call pushes the return address, LCL, ARG, THIS and THAT
+ENTRY_FUNCTION = "Sys.init"
+ENTRY_ARGS_NUMBER = 0  # the bootstrap calls Sys.init without arguments
+# the change of the stack depth of every command that does not call a function
+STACK_EFFECTS = {Parser.PUSH_COMMAND_MARK: 1, Parser.POP_COMMAND_MARK: -1, Parser.IF_GOTO_COMMAND_MARK: -1,
+                 "add": -1, "sub": -1, "eq": -1, "gt": -1, "lt": -1, "and": -1, "or": -1, "neg": 0, "not": 0}
+CALL_COMMANDS = (Parser.CALL_COMMAND_MARK, Parser.TAIL_CALL_COMMAND_MARK)
+UNBOUNDED = "unbounded"
+REPORT_HEADER = "{:<40} {:>7} {:>9} {:>11}".format("function", "locals", "max_depth", "worst_case")
+REPORT_ROW = "{:<40} {:>7} {:>9} {:>11}"
+ENTRY_REPORT = "stack words used from {}: {}, peak stack pointer: {} (the heap starts at {})"
+RECURSION_REPORT = "recursive: {}"
+UNDEFINED_REPORT = "not analyzed, counted as using no stack: {}"
+OVERFLOW_REPORT = "error: the stack might overflow into the heap"
+
+
+class FunctionStack:
+    """
+    The stack usage of a single function: the number of its local variables, the maximum depth of its operand stack
+    (above its local variables) and the calls it makes
+    """
+
+    def __init__(self, name, locals_number):
+        """
+        creates the usage of a function without calls
+        :param name: the function name
+        :param locals_number: the number of its local variables
+        """
+        self.name = name
+        self.locals_number = locals_number
+        self.max_depth = 0  # None if a loop keeps growing the stack
+        self.calls = []  # (called function, operand stack depth before the call, arguments number, is tail call)
+
+    def get_peak(self):
+        """
+        :return: the maximum number of words the function itself uses above its frame (its local variables and its
+        operand stack), or None if it is unbounded
+        """
+        if self.max_depth is None:
+            return None
+        return self.locals_number + self.max_depth
+
+
+def analyze(vm_lines):
+    """
+    finds the stack usage of every function in the given vm lines
+    :param vm_lines: the vm lines (of one or more files)
+    :return: a dictionary from a function name to its FunctionStack
+    """
+    functions = {}
+    for function_lines in vmOptimizer.split_functions(vm_lines):
+        function_stack = analyze_function(list(function_lines))
+        if function_stack is not None:
+            functions[function_stack.name] = function_stack
+    return functions
+
+
+def analyze_function(function_lines):
+    """
+    finds the maximum operand stack depth of a function and its calls, by following the depth at the start of every
+    basic block until no depth grows. A jump to a label outside of the function is not followed
+    :param function_lines: the vm lines of a single function
+    :return: the FunctionStack of the function, or None if the lines do not start with a function command
+    """
+    first_command = next((command_parts for command_parts in map(Parser.split_command, function_lines)
+                          if command_parts), None)
+    if not first_command or first_command[KEYWORD_POS] != Parser.FUNCTION_COMMAND_MARK:
+        return None
+    function_stack = FunctionStack(first_command[FUNCTION_NAME_POS], int(first_command[ARGS_VARS_NUM_POS]))
+    blocks, label_blocks = vmOptimizer.build_cfg(function_lines)
+    entry_depths = {0: 0}
+    visits = {}
+    calls = {}  # the position of a call -> (called function, the largest depth before it, arguments number, is tail)
+    to_visit = [0]
+    while to_visit:
+        block_index = to_visit.pop()
+        visits[block_index] = visits.get(block_index, 0) + 1
+        if visits[block_index] > len(blocks):  # the depth grows on every round of a loop
+            function_stack.max_depth = None
+            return function_stack
+        end_depth, peak_depth = _run_block(function_lines, blocks[block_index], entry_depths[block_index], calls)
+        function_stack.max_depth = max(function_stack.max_depth, peak_depth)
+        for successor in _get_successors(blocks, label_blocks, block_index):
+            if successor in entry_depths and entry_depths[successor] >= end_depth:
+                continue
+            entry_depths[successor] = end_depth
+            if successor not in to_visit:
+                to_visit.append(successor)
+    function_stack.calls = [calls[position] for position in sorted(calls)]
+    return function_stack
+
+
+def _run_block(function_lines, block, depth, calls):
+    """
+    follows the operand stack depth over the commands of a block
+    :param function_lines: the vm lines of the function
+    :param block: the BasicBlock
+    :param depth: the depth at the start of the block
+    :param calls: a dictionary from the position of a call to its details. Updated with the calls of the block
+    :return: a tuple of the depth at the end of the block and the maximum depth inside it
+    """
+    peak_depth = depth
+    for position in block.commands:
+        command_parts = Parser.split_command(function_lines[position])
+        keyword = command_parts[KEYWORD_POS]
+        if keyword in CALL_COMMANDS:
+            args_number = int(command_parts[ARGS_VARS_NUM_POS])
+            if position not in calls or calls[position][1] < depth:
+                calls[position] = (command_parts[FUNCTION_NAME_POS], depth, args_number,
+                                   keyword == Parser.TAIL_CALL_COMMAND_MARK)
+            depth += 1 - args_number  # the arguments are replaced by the returned value
+        else:
+            if keyword.startswith(Parser.UNCHECKED_COMPARE_PREFIX):
+                keyword = keyword[len(Parser.UNCHECKED_COMPARE_PREFIX):]
+            depth += STACK_EFFECTS.get(keyword, 0)
+        peak_depth = max(peak_depth, depth)
+    return depth, peak_depth
+
+
+def _get_successors(blocks, label_blocks, block_index):
+    """
+    :param blocks: the basic blocks of the function
+    :param label_blocks: the index of the block of every label
+    :param block_index: the index of the current block
+    :return: the indices of the blocks that might be executed after the current block
+    """
+    block = blocks[block_index]
+    successors = []
+    jump_label = block.get_jump_label()
+    if jump_label in label_blocks:
+        successors.append(label_blocks[jump_label])
+    if block.falls_through() and block_index + 1 < len(blocks):
+        successors.append(block_index + 1)
+    return successors
+
+
+def find_worst_usage(functions):
+    """
+    finds the worst case stack usage of every function, including the functions it calls. A call adds the frame of
+    the called function above the operand stack of the caller. A tail call replaces the frame of the caller, so the
+    frame of the called function starts where the arguments of the caller were (the caller is assumed to be called
+    with its smallest number of arguments). Functions that are not analyzed are counted as using no stack
+    :param functions: a dictionary from a function name to its FunctionStack
+    :return: a dictionary from a function name to the maximum number of words it and the functions it calls use
+    above its frame, or None if the usage is unbounded (a recursion that grows the stack)
+    """
+    args_numbers = _get_smallest_args_numbers(functions)
+    edges = {}  # function -> (called function, the words between the two frames) for every call to an analyzed one
+    for function_stack in functions.values():
+        edges[function_stack.name] = []
+        for called_function, depth, args_number, is_tail_call in function_stack.calls:
+            if called_function not in functions:
+                continue
+            if is_tail_call:
+                distance = args_number - args_numbers.get(function_stack.name, ENTRY_ARGS_NUMBER)
+            else:
+                distance = function_stack.locals_number + depth + FRAME_SIZE
+            edges[function_stack.name].append((called_function, distance))
+
+    worst_usage = {}
+    for component in find_call_cycles(functions):  # the called components come first
+        for function_name in component:
+            worst_usage[function_name] = functions[function_name].get_peak()
+        # a component without a cycle settles in one round, and a bounded cycle settles in a round per function
+        for round_number in range(len(component) + 1):
+            changed = False
+            for function_name in component:
+                usage = _get_usage(function_name, functions, edges, worst_usage)
+                if usage != worst_usage[function_name]:
+                    worst_usage[function_name] = usage
+                    changed = True
+            if not changed:
+                break
+        else:  # the usage of the component keeps growing
+            for function_name in component:
+                worst_usage[function_name] = None
+    return worst_usage
+
+
+def _get_smallest_args_numbers(functions):
+    """
+    :param functions: a dictionary from a function name to its FunctionStack
+    :return: a dictionary from a called function to the smallest number of arguments it is called with
+    """
+    args_numbers = {ENTRY_FUNCTION: ENTRY_ARGS_NUMBER}
+    for function_stack in functions.values():
+        for called_function, depth, args_number, is_tail_call in function_stack.calls:
+            args_numbers[called_function] = min(args_numbers.get(called_function, args_number), args_number)
+    return args_numbers
+
+
+def _get_usage(function_name, functions, edges, worst_usage):
+    """
+    :return: the usage of a function based on the current usage of the functions it calls, or None if any of them is
+    unbounded
+    """
+    usage = functions[function_name].get_peak()
+    for called_function, distance in edges[function_name]:
+        if usage is None or worst_usage[called_function] is None:
+            return None
+        usage = max(usage, distance + worst_usage[called_function])
+    return usage
+
+
+def find_call_cycles(functions):
+    """
+    splits the call graph into its strongly connected components (by Tarjan's algorithm, without recursion)
+    :param functions: a dictionary from a function name to its FunctionStack
+    :return: a list of the components (lists of function names), where every component comes after the components
+    it calls
+    """
+    called = {name: [call[0] for call in function_stack.calls if call[0] in functions]
+              for name, function_stack in functions.items()}
+    indices = {}
+    low_links = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in functions:
+        if root in indices:
+            continue
+        indices[root] = low_links[root] = len(indices)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(called[root]))]
+        while work:
+            function_name, called_iterator = work[-1]
+            called_function = next(called_iterator, None)
+            if called_function is not None:
+                if called_function not in indices:
+                    indices[called_function] = low_links[called_function] = len(indices)
+                    stack.append(called_function)
+                    on_stack.add(called_function)
+                    work.append((called_function, iter(called[called_function])))
+                elif called_function in on_stack:
+                    low_links[function_name] = min(low_links[function_name], indices[called_function])
+                continue
+            work.pop()
+            if work:
+                caller = work[-1][0]
+                low_links[caller] = min(low_links[caller], low_links[function_name])
+            if low_links[function_name] == indices[function_name]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == function_name:
+                        break
+                components.append(component)
+    return components
+
+
+def find_recursive_functions(functions):
+    """
+    :param functions: a dictionary from a function name to its FunctionStack
+    :return: a sorted list of the functions that might call themselves (directly or through other functions)
+    """
+    recursive = []
+    for component in find_call_cycles(functions):
+        function_name = component[0]
+        if len(component) > 1 or any(call[0] == function_name for call in functions[function_name].calls):
+            recursive.extend(component)
+    return sorted(recursive)
+
+
+def find_undefined_functions(functions):
+    """
+    :param functions: a dictionary from a function name to its FunctionStack
+    :return: a sorted list of the called functions that are not analyzed
+    """
+    return sorted({call[0] for function_stack in functions.values() for call in function_stack.calls
+                   if call[0] not in functions})
+
+
+def get_peak_stack_pointer(worst_usage):
+    """
+    :param worst_usage: the worst case usage of every function (as find_worst_usage returns)
+    :return: the largest value the stack pointer might get when running from Sys.init, or None if it is unbounded
+    """
+    if worst_usage.get(ENTRY_FUNCTION) is None:
+        return None
+    return STACK_BASE + FRAME_SIZE + worst_usage[ENTRY_FUNCTION]
+
+
+def _format_usage(usage):
+    """
+    :param usage: a number of words or None
+    :return: the text of the usage in the report
+    """
+    return UNBOUNDED if usage is None else usage
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Finds the maximum operand stack depth of every vm "
+                                                           "function and the worst case stack usage from Sys.init")
+    arguments_parser.add_argument("path", help="a vm file or a directory of vm files")
+    vmTranslator.add_optimization_arguments(arguments_parser)
+    arguments_parser.add_argument("--heap-base", type=int, default=HEAP_BASE,
+                                  help="the address the stack must stay below")
+    arguments = arguments_parser.parse_args()
+    translation_config = vmTranslator.get_config(arguments)
+
+    program_lines = []
+    vm_files = vmTranslator.get_vm_files(arguments.path) if os.path.isdir(arguments.path) else [arguments.path]
+    for vm_file in sorted(vm_files):
+        with open(vm_file) as input_file:
+            program_lines.extend(vmTranslator.optimize_vm_lines(input_file, translation_config))
+    program_functions = analyze(program_lines)
+    program_usage = find_worst_usage(program_functions)
+    print(REPORT_HEADER)
+    for name in sorted(program_functions):
+        print(REPORT_ROW.format(name, program_functions[name].locals_number,
+                                _format_usage(program_functions[name].max_depth),
+                                _format_usage(program_usage[name])))
+    recursive_functions = find_recursive_functions(program_functions)
+    if recursive_functions:
+        print(RECURSION_REPORT.format(" ".join(recursive_functions)))
+    undefined_functions = find_undefined_functions(program_functions)
+    if undefined_functions:
+        print(UNDEFINED_REPORT.format(" ".join(undefined_functions)))
+    if ENTRY_FUNCTION in program_functions:
+        peak_stack_pointer = get_peak_stack_pointer(program_usage)
+        print(ENTRY_REPORT.format(ENTRY_FUNCTION, _format_usage(program_usage[ENTRY_FUNCTION]),
+                                  _format_usage(peak_stack_pointer), arguments.heap_base))
+        if peak_stack_pointer is None or peak_stack_pointer >= arguments.heap_base:
+            print(OVERFLOW_REPORT)
+            sys.exit(1)
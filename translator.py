@@ -2,6 +2,8 @@
 # imports #
 ###########
 import Parser
+from labelInterner import LabelInterner
+from translatorConfig import TranslatorConfig
 
 #############
 # constants #
@@ -9,12 +11,19 @@ import Parser
 END_OF_LINE_MARK = "\n"
 GO_TO_REGISTER_M = "A=M" + END_OF_LINE_MARK
 GO_TO_PREVIOUS_REGISTER_M = "AM=M-1" + END_OF_LINE_MARK
+GO_TO_PREVIOUS_ADDRESS = "A=M-1" + END_OF_LINE_MARK
 GO_TO_REGISTER_D = "A=D" + END_OF_LINE_MARK
 GETTING_REGISTER_VALUE = "D=M" + END_OF_LINE_MARK
 GETTING_ADDRESS_VALUE = "D=A" + END_OF_LINE_MARK
 REDUCE_MEMORY = "M=M-1" + END_OF_LINE_MARK
 INCREMENT_MEMORY = "M=M+1" + END_OF_LINE_MARK
 REDUCE_D = "D=D-1" + END_OF_LINE_MARK
+INCREMENT_A = "A=A+1" + END_OF_LINE_MARK
+GO_TO_NEXT_REGISTER_M = "A=M+1" + END_OF_LINE_MARK
+REDUCE_A = "A=A-1" + END_OF_LINE_MARK
+GO_TO_D_PLUS_MEMORY = "A=D+M" + END_OF_LINE_MARK
+ADD_MEMORY_TO_D = "D=D+M" + END_OF_LINE_MARK
+CONSTANTS_INTO_D = {"0": "D=0" + END_OF_LINE_MARK, "1": "D=1" + END_OF_LINE_MARK}
 UPDATE_MEMORY_TO_D = "M=D" + END_OF_LINE_MARK
 UPDATE_MEMORY_TO_INCREMENTED_D = "M=D+1" + END_OF_LINE_MARK
 ADDING_D_TO_MEMORY = "M=D+M" + END_OF_LINE_MARK
@@ -26,6 +35,8 @@ NEGATION_MEMORY = "M=-M" + END_OF_LINE_MARK
 NOT_MEMORY = "M=!M" + END_OF_LINE_MARK
 OR_D_MEMORY = "M=M|D" + END_OF_LINE_MARK
 AND_D_MEMORY = "M=M&D" + END_OF_LINE_MARK
+OR_D_MEMORY_TO_D = "D=D|M" + END_OF_LINE_MARK
+AND_D_MEMORY_TO_D = "D=D&M" + END_OF_LINE_MARK
 ADD_A_TO_D = "D=D+A" + END_OF_LINE_MARK
 FALSE_INTO_MEMORY = "M=0" + END_OF_LINE_MARK
 TRUE_INTO_MEMORY = "M=-1" + END_OF_LINE_MARK
@@ -79,6 +90,22 @@ END_LOOP_LABEL = "ENDLOOP"
 STACK_INITIAL_ADDRESS = 256
 SYS_INIT_VM_COMMAND = "call Sys.init 0"
 BOOTING_FILE_NAME = "Sys"
+CALL_ROUTINE_LABEL = "__VM_CALL"
+RETURN_ROUTINE_LABEL = "__VM_RETURN"
+COMPARE_ROUTINE_PREFIX = "__VM_"
+CALL_TARGET_REGISTER = "R13"
+CALL_ARGS_REGISTER = "R14"
+ROUTINE_RETURN_REGISTER = "R15"
+ROUTINE_COMMENT = "routine "
+COMPARE_CONDITIONS = {EQUAL_OPERATION: JUMP_EQUAL, GREATER_OPERATION: JUMP_POSITIVE, LOWER_OPERATION: JUMP_NEGATIVE}
+BINARY_OPERATIONS = {ADD_OPERATION: ADDING_D_TO_MEMORY, SUB_OPERATION: SUBTRACTION_D_FROM_M_TO_M,
+                     AND_OPERATION: AND_D_MEMORY, OR_OPERATION: OR_D_MEMORY}
+UNARY_OPERATIONS = {NEGATION_OPERATION: NEGATION_MEMORY, NOT_OPERATION: NOT_MEMORY}
+MAX_STACK_WALK = 3  # the longest A=A+1 walk to a stack slot before the stack pointer is written back
+# the commands that start or end a basic block: the stack pointer is written back before them
+BASIC_BLOCK_BOUNDARIES = (Parser.LABEL_COMMAND_TYPE, Parser.GOTO_COMMAND_TYPE, Parser.IF_GOTO_COMMAND_TYPE,
+                          Parser.CALL_COMMAND_TYPE, Parser.TAIL_CALL_COMMAND_TYPE, Parser.FUNCTION_COMMAND_TYPE,
+                          Parser.RETURN_COMMAND_TYPE)
 
 
 class Translator:
@@ -86,14 +113,50 @@ class Translator:
     A translator class that translates an instruction in vm language to machine code. Has an internal Parser object
     that is set to a certain line and translates the current parsed line
     """
+    __used_routines = set()  # the labels of the shared routines that the translated code jumps to
 
-    def __init__(self, parser):
+    def __init__(self, parser, config=None, label_interner=None, first_label_number=0):
         """
         initializes the Translator object the translates vm commands to asm commands
         :param parser: a parser that is set to a certain line of vm file
+        :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+        :param label_interner: the LabelInterner of the short labels. Should be shared by all the translators that
+        write into the same output
+        :param first_label_number: the number of the first comparison label, for continuing the numbering of an earlier
+        translator of the same file
         """
         self.__parser = parser
-        self.__label_counter = 0  # counts label for comparison operations
+        self.__config = config if config is not None else TranslatorConfig()
+        self.__label_interner = label_interner if label_interner is not None else LabelInterner()
+        self.__label_counter = first_label_number  # counts label for comparison operations
+        # the number of pushed values that are not counted yet in the stack pointer (batched stack pointer mode)
+        self.__stack_offset = 0
+
+    @staticmethod
+    def get_used_routines():
+        """
+        :return: a copy of the labels of the shared routines that the translated code jumps to (they are shared by all
+        the translators)
+        """
+        return set(Translator.__used_routines)
+
+    @staticmethod
+    def set_used_routines(routines):
+        """
+        sets the shared routines that the translated code jumps to, so an output continues an earlier translation
+        :param routines: the labels of the used shared routines
+        """
+        Translator.__used_routines.clear()
+        Translator.__used_routines.update(routines)
+
+    @staticmethod
+    def __jump_to_routine(routine_label):
+        """
+        :param routine_label: the label of a shared routine
+        :return: the asm code of a jump to the routine, which is recorded as used
+        """
+        Translator.__used_routines.add(routine_label)
+        return Translator.__translate_goto(routine_label)
 
     def translate(self):
         """
@@ -104,6 +167,13 @@ class Translator:
         # returns a comment of the full command for the understandability of the asm file
         line_comment = COMMENT_SIGN + self.__parser.get_command() + END_OF_LINE_MARK
         trans = line_comment
+        if self.__config.batch_stack_pointer and line_type != Parser.EMPTY_COMMAND_TYPE:
+            if self.__ends_basic_block(line_type):
+                trans += self.__flush_stack_offset()
+            elif line_type == Parser.ARITHMETIC_COMMAND_TYPE:
+                return trans + self.__translate_batched_arithmetic()
+            else:  # push or pop
+                return trans + self.__translate_batched_push_pop()
         if line_type == Parser.ARITHMETIC_COMMAND_TYPE:
             trans += self.__translate_arithmetic()
         elif line_type == Parser.PUSH_COMMAND_TYPE or line_type == Parser.POP_COMMAND_TYPE:
@@ -114,6 +184,8 @@ class Translator:
             trans += self.__translate_jumps()
         elif line_type == Parser.CALL_COMMAND_TYPE:
             trans += self.__translate_call()
+        elif line_type == Parser.TAIL_CALL_COMMAND_TYPE:
+            trans += self.__translate_tail_call()
         elif line_type == Parser.FUNCTION_COMMAND_TYPE:
             trans += self.__translate_function_declaration()
         elif line_type == Parser.RETURN_COMMAND_TYPE:
@@ -122,12 +194,170 @@ class Translator:
             return EMPTY_COMMAND
         return trans
 
+    def translate_end_of_file(self):
+        """
+        Writes back the stack pointer if the last commands of the file left it behind (batched stack pointer mode).
+        Should be written after the translation of the last command of the file.
+        :return: the machine hack commands (an empty string if the stack pointer is up to date)
+        """
+        return self.__flush_stack_offset()
+
+    def __ends_basic_block(self, line_type):
+        """
+        :param line_type: the type of the current command
+        :return: True if the command starts or ends a basic block (or is a comparison, whose code has internal
+        branches), False otherwise
+        """
+        if line_type == Parser.ARITHMETIC_COMMAND_TYPE:
+            operation = self.__parser.get_operation()
+            return operation in COMPARE_CONDITIONS or operation.startswith(Parser.UNCHECKED_COMPARE_PREFIX)
+        return line_type in BASIC_BLOCK_BOUNDARIES
+
+    def __flush_stack_offset(self):
+        """
+        writes the batched pushes and pops into the stack pointer (without changing D)
+        :return: the asm code updating the stack pointer (an empty string if it is up to date)
+        """
+        if self.__stack_offset == 0:
+            return EMPTY_COMMAND
+        trans = Translator.__get_A_instruction(STACK) + INCREMENT_MEMORY * self.__stack_offset
+        self.__stack_offset = 0
+        return trans
+
+    @staticmethod
+    def __stack_slot(slot):
+        """
+        A = SP + slot, without changing D
+        :param slot: the slot index relative to the stack pointer in the memory (-1 to MAX_STACK_WALK)
+        :return: the asm code for putting the slot address in A
+        """
+        if slot < 0:
+            return Translator.__get_A_instruction(STACK) + GO_TO_REGISTER_M + REDUCE_A * -slot
+        return Translator.__get_A_instruction(STACK) + GO_TO_REGISTER_M + INCREMENT_A * slot
+
+    def __batched_push_d(self):
+        """
+        pushes D into the stack without updating the stack pointer
+        :return: the matching asm code
+        """
+        trans = EMPTY_COMMAND
+        if self.__stack_offset > MAX_STACK_WALK:
+            trans += self.__flush_stack_offset()
+        trans += Translator.__stack_slot(self.__stack_offset) + UPDATE_MEMORY_TO_D
+        self.__stack_offset += 1
+        return trans
+
+    def __batched_pop_top(self, operation):
+        """
+        makes A point to the top stack value and pops it. The pop is batched if the value was pushed in the current
+        batch, otherwise the stack pointer is reduced
+        :param operation: the operation on the top stack value (M) after it is popped
+        :return: the matching asm code
+        """
+        trans = EMPTY_COMMAND
+        if self.__stack_offset - 1 > MAX_STACK_WALK:
+            trans += self.__flush_stack_offset()
+        if self.__stack_offset == 0:
+            return trans + Translator.__operate_on_top_stack_value(operation)
+        self.__stack_offset -= 1
+        return trans + Translator.__stack_slot(self.__stack_offset) + operation
+
+    def __translate_batched_arithmetic(self):
+        """
+        translates a non comparison arithmetic operation with a batched stack pointer
+        :return: the matching asm code
+        """
+        operation = self.__parser.get_operation()
+        if operation in UNARY_OPERATIONS:
+            # pops the value and pushes the result back into the batch
+            trans = self.__batched_pop_top(UNARY_OPERATIONS[operation])
+            self.__stack_offset += 1
+            return trans
+        # the second value is right below the popped top value
+        return self.__batched_pop_top(GETTING_REGISTER_VALUE) + REDUCE_A + BINARY_OPERATIONS[operation]
+
+    def __translate_batched_push_pop(self):
+        """
+        translates a push or pop command with a batched stack pointer
+        :return: the matching asm code
+        """
+        segment = self.__parser.get_segment_label()
+        address = self.__parser.get_address()
+        if self.__parser.get_type() == Parser.PUSH_COMMAND_TYPE or segment == CONSTANT_SEGMENT:
+            return self.__load_segment_value(segment, address) + self.__batched_push_d()
+        compute_address, store_value = self.__store_segment_value(segment, address)
+        return compute_address + self.__batched_pop_top(GETTING_REGISTER_VALUE) + store_value
+
+    def __load_segment_value(self, segment, address):
+        """
+        D = segment[address]
+        :param segment: the vm segment
+        :param address: the address to access in the segment
+        :return: the shortest asm code for putting the segment value in D
+        """
+        if segment == CONSTANT_SEGMENT:
+            if address in CONSTANTS_INTO_D:
+                return CONSTANTS_INTO_D[address]
+            return Translator.__get_A_instruction(address) + GETTING_ADDRESS_VALUE
+        if segment in LABELS_TRANSLATOR:
+            segment_key = LABELS_TRANSLATOR[segment]
+            walk = Translator.__walk_to_segment_address(segment_key, int(address)) + GETTING_REGISTER_VALUE
+            computed = Translator.__get_A_instruction(address) + GETTING_ADDRESS_VALUE + \
+                Translator.__get_A_instruction(segment_key) + GO_TO_D_PLUS_MEMORY + GETTING_REGISTER_VALUE
+            return Translator.__shortest(walk, computed)
+        return Translator.__get_A_instruction(self.__get_fixed_address(segment, address)) + GETTING_REGISTER_VALUE
+
+    def __store_segment_value(self, segment, address):
+        """
+        segment[address] = D
+        :param segment: the vm segment
+        :param address: the address to access in the segment
+        :return: a tuple of the asm code that prepares the address (before the value is popped into D) and the asm
+        code that stores D (the shortest combination)
+        """
+        if segment in LABELS_TRANSLATOR:
+            segment_key = LABELS_TRANSLATOR[segment]
+            walk = Translator.__walk_to_segment_address(segment_key, int(address)) + UPDATE_MEMORY_TO_D
+            compute_address = Translator.__get_A_instruction(address) + GETTING_ADDRESS_VALUE + \
+                Translator.__get_A_instruction(segment_key) + ADD_MEMORY_TO_D + \
+                Translator.__get_A_instruction(ADDR_STORE_REGISTER) + UPDATE_MEMORY_TO_D
+            stored = Translator.__get_A_instruction(ADDR_STORE_REGISTER) + GO_TO_REGISTER_M + UPDATE_MEMORY_TO_D
+            if Translator.__count_instructions(walk) <= Translator.__count_instructions(compute_address + stored):
+                return EMPTY_COMMAND, walk
+            return compute_address, stored
+        return EMPTY_COMMAND, Translator.__get_A_instruction(self.__get_fixed_address(segment, address)) + \
+            UPDATE_MEMORY_TO_D
+
+    def __get_fixed_address(self, segment, address):
+        """
+        :param segment: a vm segment with fixed addresses (temp, static or pointer)
+        :param address: the address to access in the segment
+        :return: the asm address (number or symbol) of the segment entry
+        """
+        if segment == TEMP_SEGMENT:
+            return int(TEMP_MEMORY) + int(address)
+        if segment == STATIC_SEGMENT:
+            return self.__parser.get_file_name() + LABEL_FILENAME_SEPARATOR + address
+        return POINTER_ADDRESS_TRANSLATOR[address]  # pointer segment
+
+    @staticmethod
+    def __shortest(*translations):
+        """
+        :param translations: asm codes with the same effect
+        :return: the code with the fewest instructions (the first one on a tie)
+        """
+        return min(translations, key=Translator.__count_instructions)
+
     def __translate_arithmetic(self):
         """
         translate an arithmetic operation to asm
         :return: the asm command matching the arithmetic operation
         """
         operation = self.__parser.get_operation()
+        if operation.startswith(Parser.UNCHECKED_COMPARE_PREFIX):
+            return self.__unchecked_compare(COMPARE_CONDITIONS[operation[len(Parser.UNCHECKED_COMPARE_PREFIX):]])
+        if operation in COMPARE_CONDITIONS and not self.__config.inline_comparisons:
+            return self.__call_compare_routine(operation)  # the routine pushes the result by itself
         if operation == ADD_OPERATION:
             trans = Translator.__translate_add()
         elif operation == SUB_OPERATION:
@@ -251,54 +481,127 @@ class Translator:
         result should be true for the second_top_value > first_top_value the condition should be JGT
         :return: the comparison asm code
         """
+        regular_minus_label, true_label, false_label, next_command_label = \
+            [self.__create_internal_label_name(label + str(self.__label_counter), LABEL_ALTER_SEP)
+             for label in (REGULAR_MINUS_LABEL, TRUE_LABEL, FALSE_LABEL, NEXT_COMMAND_LABEL)]
+        trans = Translator.__compare_sequence(condition, regular_minus_label, true_label, false_label,
+                                              next_command_label)
+        self.__label_counter += 1  # increment the label counter after this use
+        return trans
+
+    def __unchecked_compare(self, condition):
+        """
+        Computes the asm code for comparison between the 2 top values in the stack, when their subtraction is known
+        not to overflow: the result is set by the sign of the subtraction only
+        @SP
+        AM=M-1
+        D=M
+        A=A-1
+        D=M-D
+        M=-1
+        @TRUE_LABEL
+        D;condition
+        @SP
+        A=M-1
+        M=0
+        (TRUE_LABEL)
+        :param condition: the comparison condition (see __compare)
+        :return: the comparison asm code
+        """
+        true_label = self.__create_internal_label_name(TRUE_LABEL + str(self.__label_counter), LABEL_ALTER_SEP)
+        self.__label_counter += 1
+        return Translator.__operate_on_top_stack_value(GETTING_REGISTER_VALUE) + REDUCE_A + \
+            SUBTRACTION_D_FROM_M_TO_D + TRUE_INTO_MEMORY + Translator.__get_A_instruction(true_label) + \
+            Translator.__jump_based_on_D(condition) + Translator.__get_A_instruction(STACK) + GO_TO_PREVIOUS_ADDRESS + \
+            FALSE_INTO_MEMORY + Translator.__declare_label(true_label)
+
+    @staticmethod
+    def __compare_sequence(condition, regular_minus_label, true_label, false_label, next_command_label):
+        """
+        the asm code for comparison between the 2 top values in the stack, using the given full label names
+        :param condition: the comparison condition (see __compare)
+        :param regular_minus_label: the label of the subtraction without overflow risk
+        :param true_label: the label of setting a true result
+        :param false_label: the label of setting a false result
+        :param next_command_label: the label after the comparison
+        :return: the comparison asm code
+        """
         stack_value = Translator.__operate_on_top_stack_value(GETTING_REGISTER_VALUE)
         temp_register_address = Translator.__get_A_instruction(COMPARE_TEMP_REGISTER)
-        true_label_address = Translator.__get_A_instruction(self.__create_full_label_name(TRUE_LABEL +
-                                                                                          str(self.__label_counter),
-                                                                                          LABEL_ALTER_SEP))
-        false_label_address = Translator.__get_A_instruction(self.__create_full_label_name(FALSE_LABEL +
-                                                                                           str(self.__label_counter),
-                                                                                           LABEL_ALTER_SEP))
+        true_label_address = Translator.__get_A_instruction(true_label)
+        false_label_address = Translator.__get_A_instruction(false_label)
         # gets the top stack value into a temp register
         first_value_into_temp = stack_value + temp_register_address + UPDATE_MEMORY_TO_D
-        regular_minus_label_address = \
-            Translator.__get_A_instruction(self.__create_full_label_name(REGULAR_MINUS_LABEL +
-                                                                         str(self.__label_counter), LABEL_ALTER_SEP))
-        jump_if_not_negative = Translator.__jump_based_on_D(JUMP_NOT_NEGATIVE)
-        second_value = Translator.__get_A_instruction(STACK) + GO_TO_PREVIOUS_REGISTER_M + GETTING_REGISTER_VALUE
-        jump_if_not_positive = Translator.__jump_based_on_D(JUMP_NOT_POSITIVE)
-
-        # set the result in case the top value is negative and the second is positive.
-        # If the compare condition is greater than zero, then the result should be true now. For other conditions
-        # the result should be false
-        if condition == JUMP_POSITIVE:
-            set_result = true_label_address + JUMP_ALWAYS_OPERATION
+        regular_minus_label_address = Translator.__get_A_instruction(regular_minus_label)
+        # only peeks at the second value, since the regular minus code pops it
+        second_value = Translator.__get_A_instruction(STACK) + GO_TO_PREVIOUS_ADDRESS + GETTING_REGISTER_VALUE
+        # the subtraction cannot overflow when both values are negative or both are not negative
+        both_negative = second_value + temp_register_address + AND_D_MEMORY_TO_D + regular_minus_label_address + \
+            Translator.__jump_based_on_D(JUMP_NEGATIVE)
+        both_not_negative = second_value + temp_register_address + OR_D_MEMORY_TO_D + regular_minus_label_address + \
+            Translator.__jump_based_on_D(JUMP_NOT_NEGATIVE)
+
+        # set the result in case the values have different signs, based on the sign of the second value (after
+        # popping it). Different values are never equal, and the negative value is the lower one
+        set_result = stack_value
+        if condition == JUMP_EQUAL:
+            set_result += false_label_address + JUMP_ALWAYS_OPERATION
+        elif condition == JUMP_POSITIVE:
+            set_result += false_label_address + Translator.__jump_based_on_D(JUMP_NEGATIVE) + true_label_address + \
+                JUMP_ALWAYS_OPERATION
         else:
-            set_result = false_label_address + JUMP_ALWAYS_OPERATION
+            set_result += true_label_address + Translator.__jump_based_on_D(JUMP_NEGATIVE) + false_label_address + \
+                JUMP_ALWAYS_OPERATION
 
         # regular_minus_content: no overflow risk on subtraction, so subtracting the 2 values and jump based on the
         # result to set the boolean value
-        regular_minus_label_title = self.__create_label(REGULAR_MINUS_LABEL + str(self.__label_counter), LABEL_ALTER_SEP)
+        regular_minus_label_title = Translator.__declare_label(regular_minus_label)
         regular_minus_content = stack_value + temp_register_address + SUBTRACTION_M_FROM_D_TO_D + true_label_address + \
                                 Translator.__jump_based_on_D(condition)
         # the true and false labels - sets the stack value to the result of the comparison
-        false_label_title = self.__create_label(FALSE_LABEL + str(self.__label_counter), LABEL_ALTER_SEP)
+        false_label_title = Translator.__declare_label(false_label)
         false_label_content = Translator.__operate_on_stack(FALSE_INTO_MEMORY)
-        jump_next = Translator.__get_A_instruction(self.__create_full_label_name(NEXT_COMMAND_LABEL +
-                                                                                 str(self.__label_counter),
-                                                                                 LABEL_ALTER_SEP)) + \
-                    JUMP_ALWAYS_OPERATION
-        true_label_title = self.__create_label(TRUE_LABEL + str(self.__label_counter), LABEL_ALTER_SEP)
+        jump_next = Translator.__get_A_instruction(next_command_label) + JUMP_ALWAYS_OPERATION
+        true_label_title = Translator.__declare_label(true_label)
         true_label_content = Translator.__operate_on_stack(TRUE_INTO_MEMORY)
-        next_command_label = self.__create_label(NEXT_COMMAND_LABEL + str(self.__label_counter), LABEL_ALTER_SEP)
+        next_command_label_title = Translator.__declare_label(next_command_label)
 
         # combines all the comparison code
-        trans = first_value_into_temp + regular_minus_label_address + jump_if_not_negative + second_value + \
-                regular_minus_label_address + jump_if_not_positive + set_result + regular_minus_label_title + \
-                regular_minus_content + false_label_title + false_label_content + jump_next + \
-                true_label_title + true_label_content + next_command_label
-        self.__label_counter += 1  # increment the label counter after this use
-        return trans
+        return first_value_into_temp + both_negative + both_not_negative + set_result + regular_minus_label_title + \
+            regular_minus_content + false_label_title + false_label_content + jump_next + \
+            true_label_title + true_label_content + next_command_label_title
+
+    def __call_compare_routine(self, operation):
+        """
+        translates a comparison to a jump to the shared comparison routine of the operation
+        :param operation: the comparison operation (eq, gt, lt)
+        :return: the asm code for calling the routine
+        """
+        return_label = self.__create_internal_label_name(NEXT_COMMAND_LABEL + str(self.__label_counter),
+                                                         LABEL_ALTER_SEP)
+        self.__label_counter += 1
+        return Translator.__get_A_instruction(return_label) + GETTING_ADDRESS_VALUE + \
+            Translator.__jump_to_routine(COMPARE_ROUTINE_PREFIX + operation.upper()) + \
+            Translator.__declare_label(return_label)
+
+    @staticmethod
+    def __compare_routine(operation):
+        """
+        the shared comparison routine of the given operation. Gets the return address in D, replaces the 2 top
+        values in the stack with the comparison result and jumps back
+        :param operation: the comparison operation (eq, gt, lt)
+        :return: the asm code of the routine
+        """
+        routine_label = COMPARE_ROUTINE_PREFIX + operation.upper()
+        regular_minus_label, true_label, false_label, next_command_label = \
+            [routine_label + LABEL_ALTER_SEP + label
+             for label in (REGULAR_MINUS_LABEL, TRUE_LABEL, FALSE_LABEL, NEXT_COMMAND_LABEL)]
+        return Translator.__declare_label(routine_label) + \
+            Translator.__get_A_instruction(ROUTINE_RETURN_REGISTER) + UPDATE_MEMORY_TO_D + \
+            Translator.__compare_sequence(COMPARE_CONDITIONS[operation], regular_minus_label, true_label,
+                                          false_label, next_command_label) + \
+            Translator.__increment_stack() + \
+            Translator.__get_A_instruction(ROUTINE_RETURN_REGISTER) + GO_TO_REGISTER_M + JUMP_ALWAYS_OPERATION
 
     def __translate_eq(self):
         """
@@ -351,10 +654,12 @@ class Translator:
         command = self.__parser.get_type()
 
         if segment in LABELS_TRANSLATOR:  # local-like segments (local, argument, this, that)
-            return Translator.__translate_local_push_pop(address, LABELS_TRANSLATOR[segment], command)
+            return self.__translate_segment_push_pop(address, LABELS_TRANSLATOR[segment], command)
         elif segment == CONSTANT_SEGMENT:
             return Translator.__translate_constant_push_pop(address)
         elif segment == TEMP_SEGMENT:
+            if self.__config.small_index_addressing:
+                return Translator.__translate_direct_temp_push_pop(address, command)
             return Translator.__translate_temp_push_pop(address, command)
         elif segment == STATIC_SEGMENT:
             return self.__translate_static_push_pop(address, command)
@@ -379,6 +684,80 @@ class Translator:
             return Translator.__get_local_address(segment_key, address) + Translator.__reduce_stack() + \
                    Translator.__put_stack_content_in_address()
 
+    def __translate_segment_push_pop(self, address, segment_key, command):
+        """
+        translates local-like push and pop commands (local, argument, this, that) to asm code, in the addressing the
+        configuration selects
+        :param address: the address to access in the given segment
+        :param segment_key: the segment asm representation
+        :param command: the push/pop command
+        :return: the asm code for the push/pop local operation
+        """
+        if self.__config.small_index_addressing:
+            return Translator.__translate_small_index_push_pop(address, segment_key, command)
+        return Translator.__translate_local_push_pop(address, segment_key, command)
+
+    @staticmethod
+    def __translate_small_index_push_pop(address, segment_key, command):
+        """
+        translates local-like push and pop commands by walking from the segment base with A=M+1 / A=A+1 steps instead
+        of computing the address in D, and pops straight into the address without the R13 round trip. The walk grows
+        with the index, so both translations are built and the generic code is used only when it emits fewer
+        instructions (the walk is kept on a tie)
+        :param address: the address to access in the given segment
+        :param segment_key: the segment asm representation
+        :param command: the push/pop command
+        :return: the shortest asm code for the push/pop local operation
+        """
+        generic_trans = Translator.__translate_local_push_pop(address, segment_key, command)
+        segment_address = Translator.__walk_to_segment_address(segment_key, int(address))
+        if command == Parser.PUSH_COMMAND_TYPE:
+            direct_trans = segment_address + GETTING_REGISTER_VALUE + \
+                Translator.__operate_on_stack(UPDATE_MEMORY_TO_D) + Translator.__increment_stack()
+        else:
+            direct_trans = Translator.__operate_on_top_stack_value(GETTING_REGISTER_VALUE) + segment_address + \
+                UPDATE_MEMORY_TO_D
+        if Translator.__count_instructions(direct_trans) <= Translator.__count_instructions(generic_trans):
+            return direct_trans
+        return generic_trans
+
+    @staticmethod
+    def __walk_to_segment_address(segment_key, index):
+        """
+        A = segment + i, by walking from the segment base address
+        :param segment_key: the segment asm representation
+        :param index: the index in the segment
+        :return: the command for putting (segment base address + i) in A register
+        """
+        if index == 0:
+            return Translator.__get_A_instruction(segment_key) + GO_TO_REGISTER_M
+        return Translator.__get_A_instruction(segment_key) + GO_TO_NEXT_REGISTER_M + INCREMENT_A * (index - 1)
+
+    @staticmethod
+    def __count_instructions(trans):
+        """
+        :param trans: asm code
+        :return: the number of instructions (ROM words) in the code
+        """
+        return sum(1 for line in trans.split(END_OF_LINE_MARK) if line and not line.startswith(LABEL_PREFIX))
+
+    @staticmethod
+    def __translate_direct_temp_push_pop(address, command):
+        """
+        translates temp push and pop commands to asm code that accesses the fixed temp register directly
+        :param address: the address to access in the temp segment
+        :param command: the push/pop command
+        :return: the asm code for the push/pop temp operation
+        """
+        temp_register = int(TEMP_MEMORY) + int(address)
+        # push temp
+        if command == Parser.PUSH_COMMAND_TYPE:
+            return Translator.__push_address_to_stack(temp_register)
+        # pop temp
+        else:
+            return Translator.__operate_on_top_stack_value(GETTING_REGISTER_VALUE) + \
+                   Translator.__get_A_instruction(temp_register) + UPDATE_MEMORY_TO_D
+
     @staticmethod
     def __translate_temp_push_pop(address, command):
         """
@@ -525,6 +904,15 @@ class Translator:
         return Translator.__get_A_instruction(address) + GETTING_ADDRESS_VALUE + \
                Translator.__operate_on_stack(UPDATE_MEMORY_TO_D)
 
+    @staticmethod
+    def __declare_label(full_label_name):
+        """
+        (full_label_name)
+        :param full_label_name: the full label name
+        :return: the label declaration
+        """
+        return LABEL_PREFIX + full_label_name + LABEL_SUFFIX + END_OF_LINE_MARK
+
     def __create_label(self, label_name, label_sep):
         """
         (label_name + INDEX)
@@ -551,6 +939,19 @@ class Translator:
         label_full_name += label_sep + label_name
         return label_full_name
 
+    def __create_internal_label_name(self, label_name, label_sep):
+        """
+        creates the name of a label the translator generates (which is not a vm label or function), a short interned
+        name if the configuration uses short labels
+        :param label_name: the pure label name
+        :param label_sep: the separator between the label prefix and the pure label name
+        :return: the label name
+        """
+        label_full_name = self.__create_full_label_name(label_name, label_sep)
+        if self.__config.short_labels:
+            return self.__label_interner.intern(label_full_name)
+        return label_full_name
+
     @staticmethod
     def __translate_goto(address):
         """
@@ -561,11 +962,19 @@ class Translator:
         """
         return Translator.__get_A_instruction(address) + JUMP_ALWAYS_OPERATION
 
-    @staticmethod
-    def __translate_return():
+    def __translate_return(self):
         """
         :return: the machine hack commands for a vm return command
         """
+        if not self.__config.inline_returns:
+            return Translator.__jump_to_routine(RETURN_ROUTINE_LABEL)
+        return Translator.__return_sequence()
+
+    @staticmethod
+    def __return_sequence():
+        """
+        :return: the full hack commands sequence of a return
+        """
         # stores the return address into a temp register
         stores_return_into_temp = Translator.__get_A_instruction(DIST_TO_RET_ADDRESS) + GETTING_ADDRESS_VALUE + \
             Translator.__get_A_instruction(LOCAL_KEYWORD) + SUBTRACTION_D_FROM_M_TO_A + \
@@ -589,9 +998,11 @@ class Translator:
 
     def translate_booting(self):
         """
-        Creates the asm commands for calling the sys.init file and initializing the stack.
+        Creates the asm commands for calling the sys.init file and initializing the stack. Starts a new output, so
+        no shared routine is used yet.
         :return: the machine hack commands
         """
+        Translator.__used_routines.clear()
         # update the command to be the sys init first command
         self.__parser.set_command(SYS_INIT_VM_COMMAND)
         self.__parser.parse()
@@ -639,7 +1050,9 @@ class Translator:
         """
         # gets the call return label
         return_address = RETURN_LABEL + str(self.__parser.get_function_call_number())
-        full_return_address = self.__create_full_label_name(return_address, LABEL_SEP)
+        full_return_address = self.__create_internal_label_name(return_address, LABEL_SEP)
+        if not self.__config.inline_calls:
+            return self.__call_call_routine(full_return_address) + Translator.__declare_label(full_return_address)
         # push return address to the stack
         push_ret_address = Translator.__put_address_in_stack(full_return_address) + Translator.__increment_stack()
         # push the memory segments' values to the stack (for restoration later)
@@ -658,11 +1071,89 @@ class Translator:
         # jumps to the function definition
         jump_to_func = Translator.__translate_goto(self.__parser.get_called_function_name())
         # puts a return label
-        return_label = self.__create_label(return_address, LABEL_SEP)
+        return_label = Translator.__declare_label(full_return_address)
 
         return push_ret_address + push_LCL + push_ARG + push_THIS + push_THAT + \
                repos_ARG + repos_LCL + jump_to_func + return_label
 
+    def __call_call_routine(self, full_return_address):
+        """
+        translates a function call to a jump to the shared call routine, passing the called function in R13, the
+        number of arguments in R14 and the return address in D
+        :param full_return_address: the return label name
+        :return: the asm code for calling the routine (without the return label)
+        """
+        return Translator.__get_A_instruction(self.__parser.get_function_arg_var_num()) + GETTING_ADDRESS_VALUE + \
+            Translator.__get_A_instruction(CALL_ARGS_REGISTER) + UPDATE_MEMORY_TO_D + \
+            Translator.__get_A_instruction(self.__parser.get_called_function_name()) + GETTING_ADDRESS_VALUE + \
+            Translator.__get_A_instruction(CALL_TARGET_REGISTER) + UPDATE_MEMORY_TO_D + \
+            Translator.__get_A_instruction(full_return_address) + GETTING_ADDRESS_VALUE + \
+            Translator.__jump_to_routine(CALL_ROUTINE_LABEL)
+
+    @staticmethod
+    def __call_routine():
+        """
+        the shared call routine: pushes the return address (given in D) and the segments of the caller, repositions
+        ARG (by the number of arguments in R14) and LCL and jumps to the called function (given in R13)
+        :return: the asm code of the routine
+        """
+        push_ret_address = Translator.__operate_on_stack(UPDATE_MEMORY_TO_D) + Translator.__increment_stack()
+        push_segments = Translator.__push_address_to_stack(LOCAL_KEYWORD) + \
+            Translator.__push_address_to_stack(ARGUMENT_KEYWORD) + \
+            Translator.__push_address_to_stack(THIS_KEYWORD) + Translator.__push_address_to_stack(THAT_KEYWORD)
+        repos_ARG = Translator.__get_A_instruction(CALL_ARGS_REGISTER) + GETTING_REGISTER_VALUE + \
+            Translator.__get_A_instruction(DIST_TO_RET_ADDRESS) + ADD_A_TO_D + \
+            Translator.__get_A_instruction(STACK) + SUBTRACTION_D_FROM_M_TO_D + \
+            Translator.__get_A_instruction(ARGUMENT_KEYWORD) + UPDATE_MEMORY_TO_D
+        repos_LCL = Translator.__get_A_instruction(STACK) + GETTING_REGISTER_VALUE + \
+            Translator.__get_A_instruction(LOCAL_KEYWORD) + UPDATE_MEMORY_TO_D
+        jump_to_func = Translator.__get_A_instruction(CALL_TARGET_REGISTER) + GO_TO_REGISTER_M + JUMP_ALWAYS_OPERATION
+        return Translator.__declare_label(CALL_ROUTINE_LABEL) + push_ret_address + push_segments + repos_ARG + \
+            repos_LCL + jump_to_func
+
+    @staticmethod
+    def translate_shared_routines():
+        """
+        Creates the shared routines the configuration uses instead of inline sequences, only the ones that the
+        translated code jumps to. Should be written once in the output, after the translation of the last file.
+        :return: the machine hack commands of the routines (an empty string if no routine is used)
+        """
+        trans = EMPTY_COMMAND
+        if CALL_ROUTINE_LABEL in Translator.__used_routines:
+            trans += Translator.__routine_comment(CALL_ROUTINE_LABEL) + Translator.__call_routine()
+        if RETURN_ROUTINE_LABEL in Translator.__used_routines:
+            trans += Translator.__routine_comment(RETURN_ROUTINE_LABEL) + \
+                Translator.__declare_label(RETURN_ROUTINE_LABEL) + Translator.__return_sequence()
+        for operation in COMPARE_CONDITIONS:
+            if COMPARE_ROUTINE_PREFIX + operation.upper() in Translator.__used_routines:
+                trans += Translator.__routine_comment(COMPARE_ROUTINE_PREFIX + operation.upper()) + \
+                    Translator.__compare_routine(operation)
+        return trans
+
+    @staticmethod
+    def __routine_comment(routine_label):
+        """
+        :param routine_label: the label of a shared routine
+        :return: the comment line that opens the routine code
+        """
+        return COMMENT_SIGN + ROUTINE_COMMENT + routine_label + END_OF_LINE_MARK
+
+    def __translate_tail_call(self):
+        """
+        translates a tail call (a call that is immediately followed by a return) to hack command. The frame of the
+        current function is reused: the arguments are moved into the current arguments, the locals and the working
+        stack are dropped and the called function returns straight to the caller of the current function. Valid only
+        when both functions have the same number of arguments, so the saved frame stays in place
+        :return: the matching hack command
+        """
+        move_args = EMPTY_COMMAND
+        for arg_index in reversed(range(int(self.__parser.get_function_arg_var_num()))):
+            move_args += self.__translate_segment_push_pop(str(arg_index), ARGUMENT_KEYWORD, Parser.POP_COMMAND_TYPE)
+        # the stack of the called function starts right after the saved frame, where the current locals start
+        drop_locals = Translator.__get_A_instruction(LOCAL_KEYWORD) + GETTING_REGISTER_VALUE + \
+            Translator.__get_A_instruction(STACK) + UPDATE_MEMORY_TO_D
+        return move_args + drop_locals + Translator.__translate_goto(self.__parser.get_called_function_name())
+
     def __translate_function_declaration(self):
         """
         translates function declaration vm command to hack command
@@ -670,14 +1161,43 @@ class Translator:
         """
         # puts a function label
         create_func_label = self.__create_label(EMPTY_COMMAND, EMPTY_COMMAND)
+        vars_num = int(self.__parser.get_function_arg_var_num())
+        uninitialized = self.__parser.get_uninitialized_locals()
+        # without any variable to zero, the loop only moves the stack
+        if self.__config.unroll_prologue or (uninitialized and len(uninitialized) == vars_num):
+            return create_func_label + Translator.__unrolled_push_vars(vars_num, uninitialized)
         # push nArgs zeros to the stack to be used as local variables
+        loop_label = self.__create_internal_label_name(LOOP_LABEL, LABEL_ALTER_SEP)
+        end_loop_label = self.__create_internal_label_name(END_LOOP_LABEL, LABEL_ALTER_SEP)
         push_vars = Translator.__get_A_instruction(self.__parser.get_function_arg_var_num()) + GETTING_ADDRESS_VALUE + \
-                    self.__create_label(LOOP_LABEL, LABEL_ALTER_SEP) + \
-                    Translator.__get_A_instruction(self.__create_full_label_name(END_LOOP_LABEL, LABEL_ALTER_SEP)) + \
+                    Translator.__declare_label(loop_label) + Translator.__get_A_instruction(end_loop_label) + \
                     Translator.__jump_based_on_D(JUMP_EQUAL) + Translator.__operate_on_stack(FALSE_INTO_MEMORY) + \
-                    Translator.__increment_stack() + REDUCE_D + \
-                    Translator.__translate_goto(self.__create_full_label_name(LOOP_LABEL, LABEL_ALTER_SEP)) + \
-                    self.__create_label(END_LOOP_LABEL, LABEL_ALTER_SEP)
+                    Translator.__increment_stack() + REDUCE_D + Translator.__translate_goto(loop_label) + \
+                    Translator.__declare_label(end_loop_label)
 
         return create_func_label + push_vars
 
+    @staticmethod
+    def __unrolled_push_vars(vars_num, uninitialized=()):
+        """
+        zeroes the local variables with straight code and then moves the stack above them
+        :param vars_num: the number of local variables of the function
+        :param uninitialized: the local variables that are not zeroed
+        :return: the matching hack command
+        """
+        if vars_num == 0:
+            return EMPTY_COMMAND
+        zero_vars = EMPTY_COMMAND
+        previous_var = None
+        for var in range(vars_num):
+            if var in uninitialized:
+                continue
+            if previous_var is None:
+                zero_vars += Translator.__operate_on_stack(INCREMENT_A * var + FALSE_INTO_MEMORY)
+            else:
+                zero_vars += INCREMENT_A * (var - previous_var) + FALSE_INTO_MEMORY
+            previous_var = var
+        if vars_num == 1:
+            return zero_vars + Translator.__increment_stack()
+        return zero_vars + Translator.__get_A_instruction(vars_num) + GETTING_ADDRESS_VALUE + \
+            Translator.__get_A_instruction(STACK) + ADDING_D_TO_MEMORY
@@ -0,0 +1,89 @@
+#############
+# constants #
+#############
+LEVEL_NONE = "0"
+LEVEL_BASIC = "1"
+LEVEL_SPEED = "2"
+LEVEL_SIZE = "s"
+OPTIMIZATION_LEVELS = (LEVEL_NONE, LEVEL_BASIC, LEVEL_SPEED, LEVEL_SIZE)
+DEFAULT_LEVEL = LEVEL_NONE
+
+
+class TranslatorConfig:
+    """
+    The code generation strategy of the translator. Every flag selects one shape of the generated code, and the
+    optimization levels are coherent combinations of these flags
+    """
+
+    def __init__(self, inline_calls=True, inline_returns=True, inline_comparisons=True, unroll_prologue=False,
+                 peephole=False, short_labels=False, small_index_addressing=False,
+                 tail_calls=False, batch_stack_pointer=False, simplify_control_flow=False, eliminate_load_store=False,
+                 unchecked_comparisons=False, eliminate_dead_stores=False):
+        """
+        creates a new configuration. The defaults generate the original (unoptimized) code
+        :param inline_calls: True for emitting the whole call sequence on every call, False for jumping to a shared
+        call routine
+        :param inline_returns: True for emitting the whole return sequence on every return, False for jumping to a
+        shared return routine
+        :param inline_comparisons: True for emitting the whole comparison sequence on every eq/gt/lt, False for
+        jumping to a shared comparison routine
+        :param unroll_prologue: True for zeroing the local variables with straight code, False for a loop
+        :param peephole: True for running the peephole optimizer on the generated code
+        :param short_labels: True for interning the internal labels (comparisons, return addresses, loops) into short
+        names
+        :param small_index_addressing: True for addressing local-like segments by walking from their base (when it is
+        shorter than computing the address) and accessing temp registers directly
+        :param tail_calls: True for translating a call that is immediately followed by a return into a jump that
+        reuses the current frame, when possible
+        :param batch_stack_pointer: True for addressing the stack relative to the stack pointer at the beginning of
+        the basic block and writing the stack pointer back only at the block boundaries
+        :param simplify_control_flow: True for threading jumps and removing jumps to the next command, unreachable
+        code and unused labels of every function before the translation
+        :param eliminate_load_store: True for removing the generated instructions that load or store a value that is
+        already in place
+        :param unchecked_comparisons: True for comparing by a plain subtraction when it cannot overflow (always for
+        eq, and for gt and lt when the range analysis bounds the compared values)
+        :param eliminate_dead_stores: True for removing the stores to local variables and temp registers that are
+        never read and not zeroing the local variables that are always written before they are read
+        """
+        self.inline_calls = inline_calls
+        self.inline_returns = inline_returns
+        self.inline_comparisons = inline_comparisons
+        self.unroll_prologue = unroll_prologue
+        self.peephole = peephole
+        self.short_labels = short_labels
+        self.small_index_addressing = small_index_addressing
+        self.tail_calls = tail_calls
+        self.batch_stack_pointer = batch_stack_pointer
+        self.simplify_control_flow = simplify_control_flow
+        self.eliminate_load_store = eliminate_load_store
+        self.unchecked_comparisons = unchecked_comparisons
+        self.eliminate_dead_stores = eliminate_dead_stores
+
+
+def get_level_config(level):
+    """
+    creates the configuration of the given optimization level:
+    0 - the original code.
+    1 - the original code shape with the peephole and load/store optimizers.
+    2 - optimizes for speed: inline sequences, unrolled prologues and unchecked comparisons.
+    s - optimizes for size: shared call, return and comparison routines and looped prologues.
+    Levels 2 and s also use short internal labels, small index addressing, tail calls, a batched stack pointer,
+    control flow simplification and dead store elimination.
+    :param level: the optimization level (one of OPTIMIZATION_LEVELS)
+    :return: the matching configuration
+    """
+    if level == LEVEL_NONE:
+        return TranslatorConfig()
+    if level == LEVEL_BASIC:
+        return TranslatorConfig(peephole=True, eliminate_load_store=True)
+    if level == LEVEL_SPEED:
+        return TranslatorConfig(unroll_prologue=True, peephole=True, short_labels=True, small_index_addressing=True,
+                                tail_calls=True, batch_stack_pointer=True, simplify_control_flow=True,
+                                eliminate_load_store=True, unchecked_comparisons=True, eliminate_dead_stores=True)
+    if level == LEVEL_SIZE:
+        return TranslatorConfig(inline_calls=False, inline_returns=False, inline_comparisons=False, peephole=True,
+                                short_labels=True, small_index_addressing=True, tail_calls=True,
+                                batch_stack_pointer=True, simplify_control_flow=True, eliminate_load_store=True,
+                                eliminate_dead_stores=True)
+    raise ValueError("unknown optimization level: " + str(level))
@@ -0,0 +1,422 @@
+###########
+# imports #
+###########
+import argparse
+import io
+import os
+import struct
+import sys
+import timeit
+from array import array
+
+import Parser
+import translatorConfig
+import vmTranslator
+from labelInterner import LabelInterner
+from translator import Translator
+
+#############
+# constants #
+#############
+BINARY_SUFFIX = "vmb"
+READING_BINARY_MODE = "rb"
+WRITING_BINARY_MODE = "wb"
+MAGIC = b"VMIR"
+FORMAT_VERSION = 3
+CODE_TYPE = "H"  # every command is three fixed-width integers: the opcode and two operands
+CODE_SIZE = 2
+MAX_CODE = 0xFFFF  # vm indices and numbers are 15 bit values, names are limited by the size of the table
+WORDS_PER_COMMAND = 3
+BYTE_ORDER = "little"
+# magic, version, code size, the applied vm passes, the length of the string table in bytes and the number of commands
+HEADER_FORMAT = "<4sHHHII"
+# the configuration flags of the vm level optimizations, which are applied before the compilation. The header keeps
+# a bit for every applied one (by its position), and the program is translated only with the same optimizations
+VM_PASSES_FLAGS = ("simplify_control_flow", "eliminate_dead_stores", "unchecked_comparisons", "tail_calls")
+STRINGS_SEPARATOR = "\n"  # names never contain white spaces
+STRINGS_ENCODING = "utf-8"
+FILE_NAME_STRING = 0  # the first string in the table is the name of the vm file (the prefix of its static symbols)
+# the opcodes are the positions in this tuple: the command type and the keyword of every command
+OPCODES = ((Parser.PUSH_COMMAND_TYPE, Parser.PUSH_COMMAND_MARK),
+           (Parser.POP_COMMAND_TYPE, Parser.POP_COMMAND_MARK),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "add"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "sub"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "neg"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "eq"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "gt"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "lt"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "and"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "or"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, "not"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, Parser.UNCHECKED_COMPARE_PREFIX + "eq"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, Parser.UNCHECKED_COMPARE_PREFIX + "gt"),
+           (Parser.ARITHMETIC_COMMAND_TYPE, Parser.UNCHECKED_COMPARE_PREFIX + "lt"),
+           (Parser.LABEL_COMMAND_TYPE, Parser.LABEL_COMMAND_MARK),
+           (Parser.GOTO_COMMAND_TYPE, Parser.GOTO_COMMAND_MARK),
+           (Parser.IF_GOTO_COMMAND_TYPE, Parser.IF_GOTO_COMMAND_MARK),
+           (Parser.FUNCTION_COMMAND_TYPE, Parser.FUNCTION_COMMAND_MARK),
+           (Parser.CALL_COMMAND_TYPE, Parser.CALL_COMMAND_MARK),
+           (Parser.TAIL_CALL_COMMAND_TYPE, Parser.TAIL_CALL_COMMAND_MARK),
+           (Parser.RETURN_COMMAND_TYPE, Parser.RETURN_COMMAND_MARK),
+           # a function command with more parts (like uninitialized locals): its name and a string of the other parts
+           (Parser.FUNCTION_COMMAND_TYPE, Parser.FUNCTION_COMMAND_MARK))
+EXTENDED_FUNCTION_OPCODE = len(OPCODES) - 1
+OPCODE_NUMBERS = {keyword: opcode for opcode, (command_type, keyword) in enumerate(OPCODES[:EXTENDED_FUNCTION_OPCODE])}
+PARTS_SEPARATOR = " "
+SEGMENTS = ("argument", "local", "static", "constant", "this", "that", "pointer", "temp")
+SEGMENT_NUMBERS = {segment: number for number, segment in enumerate(SEGMENTS)}
+# the command types by their operands: a segment and an index, a name, or a name and a number
+SEGMENT_COMMAND_TYPES = (Parser.PUSH_COMMAND_TYPE, Parser.POP_COMMAND_TYPE)
+NAME_COMMAND_TYPES = (Parser.LABEL_COMMAND_TYPE, Parser.GOTO_COMMAND_TYPE, Parser.IF_GOTO_COMMAND_TYPE)
+NAME_NUMBER_COMMAND_TYPES = (Parser.FUNCTION_COMMAND_TYPE, Parser.CALL_COMMAND_TYPE, Parser.TAIL_CALL_COMMAND_TYPE)
+FIRST_OPERAND_POS = 1
+SECOND_OPERAND_POS = 2
+BENCHMARK_REPEATS = 3
+REPORT_HEADER = "{:<8} {:>12} {:>14} {:>12}".format("input", "parse_ms", "translate_ms", "bytes")
+REPORT_ROW = "{:<8} {:>12.2f} {:>14.2f} {:>12}"
+REPORT_CHANGE_ROW = "{:<8} {:>11.1f}x {:>13.1f}x {:>11.1f}%"
+
+
+class BinaryProgram:
+    """
+    The commands of a vm file in the binary intermediate format: an array of fixed-width integers (an opcode and two
+    operands per command) and an interned table of the function, label and file names. Keeps the vm level
+    optimizations that were applied to the commands
+    """
+
+    def __init__(self, file_name, vm_passes=0):
+        """
+        creates an empty program
+        :param file_name: the name of the vm file (without a directory and a suffix)
+        :param vm_passes: the bits of the vm level optimizations that were applied to the commands (see get_vm_passes)
+        """
+        self.vm_passes = vm_passes
+        self.strings = [file_name]
+        self.string_numbers = {file_name: FILE_NAME_STRING}
+        self.codes = array(CODE_TYPE)
+
+    def get_file_name(self):
+        """
+        :return: the name of the vm file
+        """
+        return self.strings[FILE_NAME_STRING]
+
+    def __intern(self, name):
+        """
+        :param name: a function, label or file name
+        :return: the number of the name in the string table (added if it is new)
+        """
+        if name not in self.string_numbers:
+            if len(self.strings) > MAX_CODE:
+                raise ValueError("too many names in " + self.get_file_name())
+            self.string_numbers[name] = len(self.strings)
+            self.strings.append(name)
+        return self.string_numbers[name]
+
+    def add_command(self, command_type, command_parts):
+        """
+        appends a parsed command to the program
+        :param command_type: the command type (one of the Parser command type constants)
+        :param command_parts: the list of the command parts
+        """
+        if command_type == Parser.EMPTY_COMMAND_TYPE:
+            return
+        keyword = command_parts[Parser.COMMAND_POS]
+        if keyword not in OPCODE_NUMBERS:
+            raise ValueError("unknown vm command: " + " ".join(command_parts))
+        opcode = OPCODE_NUMBERS[keyword]
+        first_operand = second_operand = 0
+        if command_type == Parser.FUNCTION_COMMAND_TYPE and len(command_parts) > SECOND_OPERAND_POS + 1:
+            opcode = EXTENDED_FUNCTION_OPCODE
+            first_operand = self.__intern(command_parts[FIRST_OPERAND_POS])
+            second_operand = self.__intern(PARTS_SEPARATOR.join(command_parts[SECOND_OPERAND_POS:]))
+        elif command_type in SEGMENT_COMMAND_TYPES:
+            first_operand = SEGMENT_NUMBERS[command_parts[FIRST_OPERAND_POS]]
+            second_operand = int(command_parts[SECOND_OPERAND_POS])
+        elif command_type in NAME_COMMAND_TYPES:
+            first_operand = self.__intern(command_parts[FIRST_OPERAND_POS])
+        elif command_type in NAME_NUMBER_COMMAND_TYPES:
+            first_operand = self.__intern(command_parts[FIRST_OPERAND_POS])
+            second_operand = int(command_parts[SECOND_OPERAND_POS])
+        self.codes.extend((opcode, first_operand, second_operand))
+
+    def get_commands(self):
+        """
+        decodes the commands, without any tokenization
+        :return: a generator of a tuple of the command type and the list of the command parts for every command
+        """
+        codes = self.codes
+        strings = self.strings
+        for position in range(0, len(codes), WORDS_PER_COMMAND):
+            opcode = codes[position]
+            command_type, keyword = OPCODES[opcode]
+            if command_type in SEGMENT_COMMAND_TYPES:
+                yield command_type, [keyword, SEGMENTS[codes[position + 1]], str(codes[position + 2])]
+            elif command_type in NAME_COMMAND_TYPES:
+                yield command_type, [keyword, strings[codes[position + 1]]]
+            elif opcode == EXTENDED_FUNCTION_OPCODE:
+                yield command_type, [keyword, strings[codes[position + 1]]] + \
+                    strings[codes[position + 2]].split(PARTS_SEPARATOR)
+            elif command_type in NAME_NUMBER_COMMAND_TYPES:
+                yield command_type, [keyword, strings[codes[position + 1]], str(codes[position + 2])]
+            else:
+                yield command_type, [keyword]
+
+    def to_bytes(self):
+        """
+        :return: the program in the binary intermediate format
+        """
+        strings = STRINGS_SEPARATOR.join(self.strings).encode(STRINGS_ENCODING)
+        codes = self.codes
+        if sys.byteorder != BYTE_ORDER:
+            codes = array(CODE_TYPE, codes)
+            codes.byteswap()
+        header = struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, CODE_SIZE, self.vm_passes, len(strings),
+                             len(codes) // WORDS_PER_COMMAND)
+        return header + strings + codes.tobytes()
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        loads a program from the binary intermediate format
+        :param data: the bytes of the program
+        :return: the loaded BinaryProgram
+        """
+        header_size = struct.calcsize(HEADER_FORMAT)
+        magic, version, code_size, vm_passes, strings_size, commands_number = \
+            struct.unpack(HEADER_FORMAT, data[:header_size])
+        if magic != MAGIC or version != FORMAT_VERSION or code_size != array(CODE_TYPE).itemsize:
+            raise ValueError("not a binary vm program of version " + str(FORMAT_VERSION))
+        strings_end = header_size + strings_size
+        strings = data[header_size:strings_end].decode(STRINGS_ENCODING).split(STRINGS_SEPARATOR)
+        program = BinaryProgram(strings[FILE_NAME_STRING], vm_passes)
+        program.strings = strings
+        program.string_numbers = {name: number for number, name in enumerate(strings)}
+        program.codes.frombytes(data[strings_end:strings_end + commands_number * WORDS_PER_COMMAND * CODE_SIZE])
+        if sys.byteorder != BYTE_ORDER:
+            program.codes.byteswap()
+        return program
+
+
+def get_vm_passes(config):
+    """
+    :param config: a code generation configuration (TranslatorConfig)
+    :return: the bits of the vm level optimizations the configuration applies
+    """
+    return sum(1 << position for position, flag in enumerate(VM_PASSES_FLAGS) if getattr(config, flag))
+
+
+def check_vm_passes(program, config):
+    """
+    checks that a binary program can be translated with the given configuration
+    :param program: the BinaryProgram
+    :param config: the code generation configuration (TranslatorConfig) of the translation
+    :raise ValueError: if the program was compiled with other vm level optimizations than the configuration applies
+    """
+    if program.vm_passes != get_vm_passes(config):
+        raise ValueError(program.get_file_name() + " was compiled with other vm optimizations than the translation "
+                                                   "configuration")
+
+
+def compile_lines(vm_lines, file_name, config=None):
+    """
+    parses vm lines into a binary program. The call numbers of the parsers are not changed
+    :param vm_lines: the vm lines
+    :param file_name: the name of the vm file (without a directory and a suffix)
+    :param config: the code generation configuration (TranslatorConfig) whose vm level optimizations were applied to
+    the lines. The original code shape (no optimization) by default
+    :return: the BinaryProgram of the lines
+    """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    calls_numbers = Parser.Parser.get_calls_numbers()
+    program = BinaryProgram(file_name, get_vm_passes(config))
+    file_parser = Parser.Parser(file_name)
+    for line in vm_lines:
+        file_parser.set_command(line)
+        if file_parser.get_type() != Parser.EMPTY_COMMAND_TYPE:
+            file_parser.parse()
+            program.add_command(file_parser.get_type(), file_parser.get_parts())
+    Parser.Parser.set_calls_numbers(calls_numbers)
+    return program
+
+
+def compile_file(vm_file_name, config=None):
+    """
+    compiles a vm file into a binary program next to it. The vm level optimizations of the configuration (control
+    flow simplification, unchecked comparisons, tail calls) are applied before the compilation, so the translation of
+    the program does not repeat them
+    :param vm_file_name: the name of the vm file
+    :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+    :return: the name of the binary file
+    """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    with open(vm_file_name) as input_file:
+        vm_lines = vmTranslator.optimize_vm_lines(input_file, config)
+        program = compile_lines(vm_lines, get_file_name(vm_file_name), config)
+    binary_file_name = vm_file_name[:-len(vmTranslator.VM_SUFFIX)] + BINARY_SUFFIX
+    with open(binary_file_name, WRITING_BINARY_MODE) as binary_file:
+        binary_file.write(program.to_bytes())
+    return binary_file_name
+
+
+def load_file(binary_file_name):
+    """
+    :param binary_file_name: the name of a binary vm file
+    :return: the BinaryProgram in the file
+    """
+    with open(binary_file_name, READING_BINARY_MODE) as binary_file:
+        return BinaryProgram.from_bytes(binary_file.read())
+
+
+def get_file_name(vm_file_name):
+    """
+    :param vm_file_name: the path of a vm or binary vm file
+    :return: the file name only, without its directories and suffix
+    """
+    return os.path.splitext(os.path.basename(vm_file_name))[0]
+
+
+def translate_program(program, output_file, write_boot, config=None, label_interner=None):
+    """
+    translates a binary program to the given output asm file. The commands are set in the parser without tokenizing,
+    and the vm level optimizations are not repeated (they were applied when the program was compiled, so the
+    configuration must apply the same ones)
+    :param program: the BinaryProgram
+    :param output_file: the output asm file
+    :param write_boot: should the function write the booting lines in the beginning of the translation
+    :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+    :param label_interner: the LabelInterner of the short labels of the output file
+    :return: the number of the redundant instructions the load/store optimizer removed
+    :raise ValueError: if the program was compiled with other vm level optimizations than the configuration applies
+    """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    if label_interner is None:
+        label_interner = LabelInterner()
+    check_vm_passes(program, config)
+    file_parser = Parser.Parser(program.get_file_name())
+    file_translator = Translator(file_parser, config, label_interner)
+    asm_commands = []
+    if write_boot:
+        asm_commands.append(file_translator.translate_booting())
+    for command_type, command_parts in program.get_commands():
+        file_parser.set_parsed_command(command_type, command_parts)
+        asm_commands.append(file_translator.translate())
+    asm_commands.append(file_translator.translate_end_of_file())
+    return vmTranslator.write_asm(asm_commands, output_file, config)
+
+
+def translate_path(path, config=None):
+    """
+    translates a binary vm file, or all the binary vm files in a directory, into one asm file (named like the
+    translation of the vm files)
+    :param path: a binary vm file or a directory of binary vm files
+    :param config: the code generation configuration (TranslatorConfig)
+    :return: the name of the output asm file
+    """
+    if os.path.isdir(path):
+        binary_files = get_binary_files(path)
+        output_file_name = os.path.join(path, os.path.basename(os.path.normpath(path)) + "." +
+                                        vmTranslator.ASM_SUFFIX)
+    else:
+        binary_files = [path]
+        output_file_name = path[:-len(BINARY_SUFFIX)] + vmTranslator.ASM_SUFFIX
+    label_interner = LabelInterner()
+    with open(output_file_name, vmTranslator.WRITING_MODE) as output_file:
+        for file_number, binary_file_name in enumerate(binary_files):
+            translate_program(load_file(binary_file_name), output_file, file_number == 0, config, label_interner)
+        vmTranslator.write_shared_routines(output_file, config)
+    vmTranslator.write_labels_table(output_file_name, config, label_interner)
+    return output_file_name
+
+
+def get_binary_files(directory_full_path):
+    """
+    :param directory_full_path: the name of the given directory
+    :return: a list of the full paths of all the binary vm files in the given directory. The binary files of vm files
+    are in the order of vmTranslator.get_vm_files, so the output is the same as translating the vm files, and the
+    binary files without a vm file follow them
+    """
+    binary_files = [os.path.join(directory_full_path, directory_file)
+                    for directory_file in os.listdir(directory_full_path)
+                    if directory_file.endswith("." + BINARY_SUFFIX)]
+    vm_files_order = {vm_file_name[:-len(vmTranslator.VM_SUFFIX)] + BINARY_SUFFIX: position
+                      for position, vm_file_name in enumerate(vmTranslator.get_vm_files(directory_full_path))}
+    return sorted(binary_files, key=lambda binary_file: (vm_files_order.get(binary_file, len(vm_files_order)),
+                                                         binary_file))
+
+
+def benchmark(vm_file_name, config):
+    """
+    measures the parsing and the translation of a vm file from its text and from its binary program. The vm level
+    optimizations are applied once before the measures, and both inputs (and their sizes) hold the optimized commands
+    :param vm_file_name: the name of the vm file
+    :param config: the code generation configuration
+    :return: a tuple of two tuples (for the text and for the binary input) of the parsing time and the translation
+    time in milliseconds and the input size in bytes
+    """
+    with open(vm_file_name) as input_file:
+        vm_text = input_file.read()
+    file_name = get_file_name(vm_file_name)
+    vm_lines = list(vmTranslator.optimize_vm_lines(vm_text.splitlines(), config))
+    binary_data = compile_lines(vm_lines, file_name, config).to_bytes()
+    calls_numbers = Parser.Parser.get_calls_numbers()
+
+    def parse_text():
+        file_parser = Parser.Parser(file_name)
+        for line in vm_lines:
+            file_parser.set_command(line)
+            file_parser.parse()
+
+    def parse_binary():
+        file_parser = Parser.Parser(file_name)
+        for command_type, command_parts in BinaryProgram.from_bytes(binary_data).get_commands():
+            file_parser.set_parsed_command(command_type, command_parts)
+
+    def translate_text():
+        file_parser = Parser.Parser(file_name)
+        file_translator = Translator(file_parser, config, LabelInterner())
+        vmTranslator.translate_lines(vm_lines, file_translator, file_parser, [file_translator.translate_booting()],
+                                     io.StringIO(), config)
+
+    def translate_binary():
+        translate_program(BinaryProgram.from_bytes(binary_data), io.StringIO(), True, config)
+
+    times = [min(timeit.repeat(measured, number=1, repeat=BENCHMARK_REPEATS)) * 1000
+             for measured in (parse_text, parse_binary, translate_text, translate_binary)]
+    Parser.Parser.set_calls_numbers(calls_numbers)
+    # the size of the optimized text, every line with one end of line mark
+    text_size = sum(len((line.rstrip(vmTranslator.END_OF_LINE_MARK) + vmTranslator.END_OF_LINE_MARK)
+                        .encode(STRINGS_ENCODING)) for line in vm_lines)
+    return (times[0], times[2], text_size), (times[1], times[3], len(binary_data))
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Compiles vm files into the binary intermediate format, "
+                                                           "translates binary vm files into hack asm code, or "
+                                                           "measures the binary input against text parsing")
+    arguments_parser.add_argument("action", choices=("compile", "translate", "benchmark"))
+    arguments_parser.add_argument("path", help="a vm file or a directory of vm files (binary vm files for translate)")
+    vmTranslator.add_optimization_arguments(arguments_parser)
+    arguments = arguments_parser.parse_args()
+    translation_config = vmTranslator.get_config(arguments)
+
+    if arguments.action == "translate":
+        translate_path(arguments.path, translation_config)
+    else:
+        vm_files = vmTranslator.get_vm_files(arguments.path) if os.path.isdir(arguments.path) else [arguments.path]
+        for vm_file in vm_files:
+            if arguments.action == "compile":
+                compile_file(vm_file, translation_config)
+                continue
+            text_result, binary_result = benchmark(vm_file, translation_config)
+            print(vm_file)
+            print(REPORT_HEADER)
+            print(REPORT_ROW.format("text", *text_result))
+            print(REPORT_ROW.format("binary", *binary_result))
+            print(REPORT_CHANGE_ROW.format("speedup", text_result[0] / binary_result[0],
+                                           text_result[1] / binary_result[1],
+                                           100.0 * (text_result[2] - binary_result[2]) / text_result[2]))
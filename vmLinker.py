@@ -0,0 +1,348 @@
+###########
+# imports #
+###########
+import argparse
+import io
+import os
+
+import Parser
+import translatorConfig
+import vmBinary
+import vmTranslator
+from labelInterner import LabelInterner
+from translator import Translator, LABEL_SEP, RETURN_LABEL
+
+#############
+# constants #
+#############
+OBJECT_SUFFIX = "vmo"
+READING_BINARY_MODE = "rb"
+WRITING_BINARY_MODE = "wb"
+OBJECT_ENCODING = "utf-8"
+END_OF_LINE_MARK = "\n"
+FIELDS_SEPARATOR = " "
+FLAG_SEPARATOR = "="
+FORMAT_MARK = "VMOBJ"
+FORMAT_VERSION = "2"
+# the header records of an object file, one record per line: the record name and its fields
+FILE_RECORD = "file"
+CONFIG_RECORD = "config"
+EXPORT_RECORD = "export"
+IMPORT_RECORD = "import"
+CALLS_RECORD = "calls"
+STATIC_RECORD = "static"
+LABEL_RECORD = "label"
+ROUTINE_RECORD = "routine"
+BODY_RECORD = "body"  # the last record: the rest of the file is the body
+ASM_BODY = "asm"  # translated and optimized asm lines
+BINARY_BODY = "vmb"  # a program in the binary intermediate format, translated when linking
+STATIC_SEGMENT = "static"
+SEGMENT_POS = 1
+INDEX_POS = 2
+CALLED_FUNCTION_POS = 1
+DECLARED_FUNCTION_POS = 1
+ENTRY_FUNCTION = "Sys.init"
+FLAG_ON = "1"
+FLAG_OFF = "0"
+
+
+class VmObject:
+    """
+    A relocatable object of a vm file: its body (asm code or a binary program), the functions it exports, the
+    functions it calls from other objects and its static symbols. Asm bodies also keep the number of calls to every
+    function and their short labels table, so the linker can renumber their return labels, and the shared routines
+    they jump to, so the linker writes only the used routines
+    """
+
+    def __init__(self, file_name, config_flags):
+        """
+        creates an object without symbols and body
+        :param file_name: the name of the vm file (without a directory and a suffix)
+        :param config_flags: a dictionary from the flags of the code generation configuration to their values
+        """
+        self.file_name = file_name
+        self.config_flags = config_flags
+        self.exports = []
+        self.imports = []
+        self.calls = {}  # called function -> the number of calls to it in the body (return labels 0 to calls - 1)
+        self.statics = []
+        self.labels = []  # (short name, full name) of the short labels of the body, in the order they were interned
+        self.routines = []  # the labels of the shared routines the body jumps to
+        self.body_type = ASM_BODY
+        self.body = None  # a list of asm lines, or the bytes of a binary program
+
+    def to_bytes(self):
+        """
+        :return: the object file contents: a line for every header record, followed by the body
+        """
+        records = [[FORMAT_MARK, FORMAT_VERSION], [FILE_RECORD, self.file_name],
+                   [CONFIG_RECORD] + [flag + FLAG_SEPARATOR + (FLAG_ON if value else FLAG_OFF)
+                                      for flag, value in self.config_flags.items()]]
+        records += [[EXPORT_RECORD, function_name] for function_name in self.exports]
+        records += [[IMPORT_RECORD, function_name] for function_name in self.imports]
+        records += [[CALLS_RECORD, function_name, str(calls)] for function_name, calls in self.calls.items()]
+        records += [[STATIC_RECORD, symbol] for symbol in self.statics]
+        records += [[LABEL_RECORD, short_name, full_name] for short_name, full_name in self.labels]
+        records += [[ROUTINE_RECORD, routine_label] for routine_label in self.routines]
+        records.append([BODY_RECORD, self.body_type])
+        header = "".join(FIELDS_SEPARATOR.join(record) + END_OF_LINE_MARK for record in records)
+        if self.body_type == BINARY_BODY:
+            return header.encode(OBJECT_ENCODING) + self.body
+        return (header + "".join(line + END_OF_LINE_MARK for line in self.body)).encode(OBJECT_ENCODING)
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        loads an object from the object file contents
+        :param data: the bytes of the object file
+        :return: the loaded VmObject
+        """
+        vm_object = VmObject(None, {})
+        position = 0
+        while True:
+            line_end = data.index(END_OF_LINE_MARK.encode(OBJECT_ENCODING), position)
+            record = data[position:line_end].decode(OBJECT_ENCODING).split(FIELDS_SEPARATOR)
+            position = line_end + len(END_OF_LINE_MARK)
+            if record[0] == FORMAT_MARK:
+                if record[1] != FORMAT_VERSION:
+                    raise ValueError("unsupported object version: " + record[1])
+            elif record[0] == FILE_RECORD:
+                vm_object.file_name = record[1]
+            elif record[0] == CONFIG_RECORD:
+                vm_object.config_flags = {flag: value == FLAG_ON for flag, value in
+                                          (field.split(FLAG_SEPARATOR) for field in record[1:])}
+            elif record[0] == EXPORT_RECORD:
+                vm_object.exports.append(record[1])
+            elif record[0] == IMPORT_RECORD:
+                vm_object.imports.append(record[1])
+            elif record[0] == CALLS_RECORD:
+                vm_object.calls[record[1]] = int(record[2])
+            elif record[0] == STATIC_RECORD:
+                vm_object.statics.append(record[1])
+            elif record[0] == LABEL_RECORD:
+                vm_object.labels.append((record[1], record[2]))
+            elif record[0] == ROUTINE_RECORD:
+                vm_object.routines.append(record[1])
+            elif record[0] == BODY_RECORD:
+                vm_object.body_type = record[1]
+                break
+            else:
+                raise ValueError("unknown object record: " + record[0])
+        if vm_object.body_type == BINARY_BODY:
+            vm_object.body = data[position:]
+        else:
+            vm_object.body = data[position:].decode(OBJECT_ENCODING).splitlines()
+        return vm_object
+
+
+def compile_object(vm_file_name, config=None, binary=False):
+    """
+    translates a vm file into a relocatable object
+    :param vm_file_name: the name of the vm file
+    :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+    :param binary: True for a binary program body (translated when linking, with the configuration of the link,
+    which must apply the same vm level optimizations), False for an asm body (translated with the given
+    configuration, which the link must use as well)
+    :return: the VmObject of the file
+    """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    with open(vm_file_name) as input_file:
+        vm_lines = input_file.read().splitlines()
+    file_name = vmBinary.get_file_name(vm_file_name)
+    vm_object = VmObject(file_name, vars(config))
+    _collect_symbols(vm_object, vm_lines)
+    if binary:
+        vm_object.body_type = BINARY_BODY
+        vm_lines = vmTranslator.optimize_vm_lines(vm_lines, config)
+        vm_object.body = vmBinary.compile_lines(vm_lines, file_name, config).to_bytes()
+        return vm_object
+
+    # the calls of the object are numbered from 0, and relocated by the linker
+    calls_numbers = Parser.Parser.get_calls_numbers()
+    Parser.Parser.set_calls_numbers({})
+    used_routines = Translator.get_used_routines()
+    Translator.set_used_routines(())
+    label_interner = LabelInterner()
+    output_file = io.StringIO()
+    vmTranslator.translate_file(vm_lines, vm_file_name, output_file, False, config, label_interner)
+    vm_object.calls = {function_name: last_call + 1
+                       for function_name, last_call in Parser.Parser.get_calls_numbers().items()}
+    Parser.Parser.set_calls_numbers(calls_numbers)
+    vm_object.routines = sorted(Translator.get_used_routines())
+    Translator.set_used_routines(used_routines)
+    vm_object.labels = label_interner.get_table()
+    vm_object.body = output_file.getvalue().splitlines()
+    return vm_object
+
+
+def _collect_symbols(vm_object, vm_lines):
+    """
+    sets the exported functions, the imported functions and the static symbols of an object
+    :param vm_object: the VmObject
+    :param vm_lines: the vm lines of its file
+    """
+    called_functions = []
+    for line in vm_lines:
+        command_parts = Parser.split_command(line)
+        if not command_parts:
+            continue
+        keyword = command_parts[Parser.COMMAND_POS]
+        if keyword == Parser.FUNCTION_COMMAND_MARK:
+            vm_object.exports.append(command_parts[DECLARED_FUNCTION_POS])
+        elif keyword == Parser.CALL_COMMAND_MARK or keyword == Parser.TAIL_CALL_COMMAND_MARK:
+            called_functions.append(command_parts[CALLED_FUNCTION_POS])
+        elif (keyword == Parser.PUSH_COMMAND_MARK or keyword == Parser.POP_COMMAND_MARK) and \
+                command_parts[SEGMENT_POS] == STATIC_SEGMENT:
+            symbol = vm_object.file_name + "." + command_parts[INDEX_POS]
+            if symbol not in vm_object.statics:
+                vm_object.statics.append(symbol)
+    for function_name in called_functions:
+        if function_name not in vm_object.exports and function_name not in vm_object.imports:
+            vm_object.imports.append(function_name)
+
+
+def write_object(vm_object, object_file_name):
+    """
+    :param vm_object: a VmObject
+    :param object_file_name: the name of the object file to write
+    """
+    with open(object_file_name, WRITING_BINARY_MODE) as object_file:
+        object_file.write(vm_object.to_bytes())
+
+
+def load_object(object_file_name):
+    """
+    :param object_file_name: the name of an object file
+    :return: the VmObject in the file
+    """
+    with open(object_file_name, READING_BINARY_MODE) as object_file:
+        return VmObject.from_bytes(object_file.read())
+
+
+def check_objects(vm_objects, config):
+    """
+    checks that the objects can be linked together
+    :param vm_objects: a list of VmObjects
+    :param config: the code generation configuration of the link
+    :raise ValueError: if an asm body was translated with another configuration, a binary body was compiled with other
+    vm level optimizations, a function is exported twice, two objects share a file name (and so their static symbols),
+    a called function is not exported by any object or there is no Sys.init
+    """
+    exporters = {}
+    file_names = set()
+    for vm_object in vm_objects:
+        if vm_object.body_type == ASM_BODY and vm_object.config_flags != vars(config):
+            raise ValueError(vm_object.file_name + " was translated with another configuration")
+        if vm_object.body_type == BINARY_BODY:
+            vmBinary.check_vm_passes(vmBinary.BinaryProgram.from_bytes(vm_object.body), config)
+        if vm_object.file_name in file_names:
+            raise ValueError("more than one object of the file " + vm_object.file_name)
+        file_names.add(vm_object.file_name)
+        for function_name in vm_object.exports:
+            if function_name in exporters:
+                raise ValueError(function_name + " is defined in " + exporters[function_name] + " and in " +
+                                 vm_object.file_name)
+            exporters[function_name] = vm_object.file_name
+    for vm_object in vm_objects:
+        for function_name in vm_object.imports:
+            if function_name not in exporters:
+                raise ValueError(vm_object.file_name + " calls the undefined function " + function_name)
+    if ENTRY_FUNCTION not in exporters:
+        raise ValueError(ENTRY_FUNCTION + " is not defined")
+
+
+def link(vm_objects, output_file, config=None, label_interner=None):
+    """
+    links objects into one asm program: the bootstrap, the body of every object in order and the shared routines that
+    the bodies jump to. The return labels of asm bodies are renumbered after the calls of the objects before them,
+    and their short labels are interned again, which gives the same labels as translating all the vm files together
+    :param vm_objects: a list of VmObjects
+    :param output_file: the output asm file
+    :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+    :param label_interner: the LabelInterner of the short labels of the output file
+    """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    if label_interner is None:
+        label_interner = LabelInterner()
+    check_objects(vm_objects, config)
+    Parser.Parser.set_calls_numbers({})
+    boot_translator = Translator(Parser.Parser(vm_objects[0].file_name), config, label_interner)
+    vmTranslator.write_asm([boot_translator.translate_booting()], output_file, config)
+    for vm_object in vm_objects:
+        if vm_object.body_type == BINARY_BODY:
+            vmBinary.translate_program(vmBinary.BinaryProgram.from_bytes(vm_object.body), output_file, False, config,
+                                       label_interner)
+            continue
+        Translator.set_used_routines(Translator.get_used_routines().union(vm_object.routines))
+        new_names = _relocate_return_labels(vm_object)
+        if config.short_labels:
+            new_names = {short_name: label_interner.intern(new_names.get(full_name, full_name))
+                         for short_name, full_name in vm_object.labels}
+        for asm_line in vm_object.body:
+            output_file.write(vmTranslator.rename_label(asm_line, new_names) + END_OF_LINE_MARK)
+    vmTranslator.write_shared_routines(output_file, config)
+
+
+def _relocate_return_labels(vm_object):
+    """
+    numbers the return labels of an asm body after the calls that are already linked, and counts its calls as linked
+    :param vm_object: a VmObject with an asm body
+    :return: a dictionary from the full return labels of the object to their linked names
+    """
+    calls_numbers = Parser.Parser.get_calls_numbers()
+    new_names = {}
+    for function_name, calls in vm_object.calls.items():
+        first_call = calls_numbers.get(function_name, -1) + 1  # the first call of a function is numbered 0
+        for call_number in range(calls):
+            new_names[function_name + LABEL_SEP + RETURN_LABEL + str(call_number)] = \
+                function_name + LABEL_SEP + RETURN_LABEL + str(first_call + call_number)
+        calls_numbers[function_name] = first_call + calls - 1
+    Parser.Parser.set_calls_numbers(calls_numbers)
+    return new_names
+
+
+def get_object_files(paths):
+    """
+    :param paths: object files and directories of object files
+    :return: a list of the object files, where every directory is replaced by its object files
+    """
+    object_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            object_files += sorted(os.path.join(path, directory_file) for directory_file in os.listdir(path)
+                                   if directory_file.endswith("." + OBJECT_SUFFIX))
+        else:
+            object_files.append(path)
+    return object_files
+
+
+# main part
+if __name__ == '__main__':
+    arguments_parser = argparse.ArgumentParser(description="Translates vm files into relocatable objects, or links "
+                                                           "objects into a hack asm program")
+    arguments_parser.add_argument("action", choices=("compile", "link"))
+    arguments_parser.add_argument("paths", nargs="+",
+                                  help="compile: vm files or directories of vm files (an object is written next to "
+                                       "every vm file). link: the output asm file, followed by object files or "
+                                       "directories of object files, in their order in the program")
+    arguments_parser.add_argument("--binary", action="store_true",
+                                  help="compiles into binary program bodies, which are translated when linking")
+    vmTranslator.add_optimization_arguments(arguments_parser)
+    arguments = arguments_parser.parse_args()
+    translation_config = vmTranslator.get_config(arguments)
+
+    if arguments.action == "compile":
+        for path in arguments.paths:
+            vm_files = vmTranslator.get_vm_files(path) if os.path.isdir(path) else [path]
+            for vm_file in vm_files:
+                write_object(compile_object(vm_file, translation_config, arguments.binary),
+                             vm_file[:-len(vmTranslator.VM_SUFFIX)] + OBJECT_SUFFIX)
+    else:
+        output_file_name = arguments.paths[0]
+        output_label_interner = LabelInterner()
+        with open(output_file_name, vmTranslator.WRITING_MODE) as output_asm_file:
+            link([load_object(object_file) for object_file in get_object_files(arguments.paths[1:])],
+                 output_asm_file, translation_config, output_label_interner)
+        vmTranslator.write_labels_table(output_file_name, translation_config, output_label_interner)
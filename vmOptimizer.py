@@ -0,0 +1,290 @@
+###########
+# imports #
+###########
+import Parser
+
+#############
+# constants #
+#############
+KEYWORD_POS = 0
+FUNCTION_NAME_POS = 1
+FUNCTION_ARGS_VARS_POS = 2
+COMMAND_PARTS_SEPARATOR = " "
+END_OF_LINE_MARK = "\n"
+JUMP_LABEL_POS = 1
+JUMP_COMMANDS = (Parser.GOTO_COMMAND_MARK, Parser.IF_GOTO_COMMAND_MARK)
+# commands after which the next command is never reached
+BLOCK_EXIT_COMMANDS = (Parser.GOTO_COMMAND_MARK, Parser.RETURN_COMMAND_MARK, Parser.TAIL_CALL_COMMAND_MARK)
+# commands that end a basic block
+BLOCK_END_COMMANDS = BLOCK_EXIT_COMMANDS + (Parser.IF_GOTO_COMMAND_MARK,)
+
+
+def get_function_arities(vm_lines):
+    """
+    finds the number of arguments of every called function, based on its call commands
+    :param vm_lines: the vm lines
+    :return: a dictionary from a function name to its number of arguments. Functions that are called with different
+    numbers of arguments are mapped to None
+    """
+    arities = {}
+    for line in vm_lines:
+        command_parts = Parser.split_command(line)
+        if command_parts and command_parts[KEYWORD_POS] == Parser.CALL_COMMAND_MARK:
+            function_name = command_parts[FUNCTION_NAME_POS]
+            arity = int(command_parts[FUNCTION_ARGS_VARS_POS])
+            if arities.setdefault(function_name, arity) != arity:
+                arities[function_name] = None
+    return arities
+
+
+def mark_tail_calls(vm_lines):
+    """
+    replaces every call that is immediately followed by a return (only empty lines or comments between them) with a
+    tail-call command, and removes the return. The tail call reuses the frame of the current function, which is
+    possible only when the called function has the same number of arguments as the current one, whose number of
+    arguments is known from its calls in the same lines (recursive calls in particular)
+    :param vm_lines: the vm lines
+    :return: the vm lines with tail calls
+    """
+    arities = get_function_arities(vm_lines)
+    optimized = []
+    current_function = None
+    call_position = None  # the position in optimized of the last call, while only empty lines follow it
+    for line in vm_lines:
+        command_parts = Parser.split_command(line)
+        if not command_parts:
+            optimized.append(line)
+            continue
+        keyword = command_parts[KEYWORD_POS]
+        if keyword == Parser.RETURN_COMMAND_MARK and call_position is not None:
+            call_parts = Parser.split_command(optimized[call_position])
+            if _can_reuse_frame(current_function, call_parts, arities):
+                optimized[call_position] = COMMAND_PARTS_SEPARATOR.join([Parser.TAIL_CALL_COMMAND_MARK] +
+                                                                        call_parts[FUNCTION_NAME_POS:]) + \
+                    END_OF_LINE_MARK
+                call_position = None
+                continue  # the return is never reached
+        call_position = None
+        if keyword == Parser.FUNCTION_COMMAND_MARK:
+            current_function = command_parts[FUNCTION_NAME_POS]
+        elif keyword == Parser.CALL_COMMAND_MARK:
+            call_position = len(optimized)
+        optimized.append(line)
+    return optimized
+
+
+def _can_reuse_frame(current_function, call_parts, arities):
+    """
+    :param current_function: the name of the function the call is in
+    :param call_parts: the parts of the call command
+    :param arities: the known number of arguments of the functions
+    :return: True if the called function can reuse the frame of the current function, False otherwise
+    """
+    # a recursive call sets the number of arguments of the current function by itself
+    arity = int(call_parts[FUNCTION_ARGS_VARS_POS])
+    return current_function is not None and arities.get(current_function) == arity
+
+
+class BasicBlock:
+    """
+    A basic block of a vm function: a range of lines that starts with its labels and ends with a jump, a return or
+    right before the next label
+    """
+
+    def __init__(self, start):
+        """
+        creates a new empty block
+        :param start: the position of the first line of the block
+        """
+        self.start = start
+        self.end = start  # the position after the last line of the block
+        self.labels = []  # the labels declared at the start of the block
+        self.commands = []  # the positions of the commands of the block (including its labels)
+        self.last_command = None  # the parts of the last command of the block
+
+    def get_jump_label(self):
+        """
+        :return: the label the block jumps to at its end, or None if it does not end with a jump
+        """
+        if self.last_command and self.last_command[KEYWORD_POS] in JUMP_COMMANDS:
+            return self.last_command[JUMP_LABEL_POS]
+        return None
+
+    def falls_through(self):
+        """
+        :return: True if the command after the block may be executed after it, False otherwise
+        """
+        return not self.last_command or self.last_command[KEYWORD_POS] not in BLOCK_EXIT_COMMANDS
+
+
+def build_cfg(function_lines):
+    """
+    splits the lines of a single function into its basic blocks
+    :param function_lines: the vm lines of the function (starting with its function command, if there is one)
+    :return: the list of the basic blocks in the order of the lines, and a dictionary from a label name to the index
+    of its block
+    """
+    blocks = [BasicBlock(0)]
+    label_blocks = {}
+    for position, line in enumerate(function_lines):
+        command_parts = Parser.split_command(line)
+        block = blocks[-1]
+        if command_parts:
+            keyword = command_parts[KEYWORD_POS]
+            # a label starts a new block, unless the block has only labels so far
+            if keyword == Parser.LABEL_COMMAND_MARK and len(block.labels) != len(block.commands):
+                block = BasicBlock(position)
+                blocks.append(block)
+            elif block.last_command and block.last_command[KEYWORD_POS] in BLOCK_END_COMMANDS:
+                block = BasicBlock(position)
+                blocks.append(block)
+            if keyword == Parser.LABEL_COMMAND_MARK:
+                block.labels.append(command_parts[JUMP_LABEL_POS])
+                label_blocks[command_parts[JUMP_LABEL_POS]] = len(blocks) - 1
+            block.commands.append(position)
+            block.last_command = command_parts
+        block.end = position + 1
+    return blocks, label_blocks
+
+
+def optimize_control_flow(vm_lines):
+    """
+    simplifies the control flow of every function: threads jumps to jumps, removes jumps to the next command,
+    removes unreachable blocks and removes labels that are not jumped to
+    :param vm_lines: the vm lines
+    :return: the optimized vm lines
+    """
+    optimized = []
+    for function_lines in split_functions(vm_lines):
+        optimized.extend(_optimize_function_control_flow(function_lines))
+    return optimized
+
+
+def split_functions(vm_lines):
+    """
+    splits vm lines into the lines of every function
+    :param vm_lines: the vm lines
+    :return: a list of the lines of every function, starting with its function command. The lines before the first
+    function are the first item
+    """
+    functions = []
+    function_start = 0
+    for position, line in enumerate(vm_lines):
+        command_parts = Parser.split_command(line)
+        if command_parts and command_parts[KEYWORD_POS] == Parser.FUNCTION_COMMAND_MARK:
+            functions.append(vm_lines[function_start:position])
+            function_start = position
+    functions.append(vm_lines[function_start:])
+    return functions
+
+
+def _optimize_function_control_flow(function_lines):
+    """
+    runs the control flow passes on a single function until none of them changes it
+    :param function_lines: the vm lines of the function
+    :return: the optimized lines of the function
+    """
+    changed = True
+    while changed:
+        blocks, label_blocks = build_cfg(function_lines)
+        jump_labels = [block.get_jump_label() for block in blocks]
+        if any(label is not None and label not in label_blocks for label in jump_labels):
+            return function_lines  # jumps outside of the function are left for the translator to handle
+        changed = _thread_jumps(function_lines, blocks, label_blocks) or \
+            _remove_jumps_to_next(function_lines, blocks, label_blocks) or \
+            _remove_unreachable_blocks(function_lines, blocks, label_blocks) or \
+            _remove_unused_labels(function_lines, blocks)
+        function_lines = [line for line in function_lines if line is not None]
+    return function_lines
+
+
+def _get_final_label(label, blocks, label_blocks):
+    """
+    :param label: a label of the function
+    :param blocks: the basic blocks of the function
+    :param label_blocks: the index of the block of every label
+    :return: the label that is finally reached by jumping to the given label, after following the blocks that only
+    jump to another label
+    """
+    visited = {label}
+    block = blocks[label_blocks[label]]
+    while len(block.commands) == len(block.labels) + 1 and block.last_command[KEYWORD_POS] == \
+            Parser.GOTO_COMMAND_MARK and block.get_jump_label() not in visited:
+        label = block.get_jump_label()
+        visited.add(label)
+        block = blocks[label_blocks[label]]
+    return label
+
+
+def _thread_jumps(function_lines, blocks, label_blocks):
+    """
+    redirects every jump to a block that only jumps to another label, to the final label
+    :return: True if a jump was changed, False otherwise
+    """
+    changed = False
+    for block in blocks:
+        label = block.get_jump_label()
+        if label is None:
+            continue
+        final_label = _get_final_label(label, blocks, label_blocks)
+        if final_label != label:
+            function_lines[block.commands[-1]] = COMMAND_PARTS_SEPARATOR.join(
+                [block.last_command[KEYWORD_POS], final_label]) + END_OF_LINE_MARK
+            changed = True
+    return changed
+
+
+def _remove_jumps_to_next(function_lines, blocks, label_blocks):
+    """
+    removes every goto to the block that follows it
+    :return: True if a jump was removed, False otherwise
+    """
+    changed = False
+    for block_index, block in enumerate(blocks):
+        if block.last_command and block.last_command[KEYWORD_POS] == Parser.GOTO_COMMAND_MARK and \
+                label_blocks[block.get_jump_label()] == block_index + 1:
+            function_lines[block.commands[-1]] = None
+            changed = True
+    return changed
+
+
+def _remove_unreachable_blocks(function_lines, blocks, label_blocks):
+    """
+    removes the blocks that cannot be reached from the start of the function
+    :return: True if a block was removed, False otherwise
+    """
+    reachable = {0}
+    to_visit = [0]
+    while to_visit:
+        block_index = to_visit.pop()
+        block = blocks[block_index]
+        successors = []
+        if block.get_jump_label() is not None:
+            successors.append(label_blocks[block.get_jump_label()])
+        if block.falls_through() and block_index + 1 < len(blocks):
+            successors.append(block_index + 1)
+        for successor in successors:
+            if successor not in reachable:
+                reachable.add(successor)
+                to_visit.append(successor)
+    changed = False
+    for block_index, block in enumerate(blocks):
+        if block_index not in reachable and block.commands:
+            function_lines[block.start:block.end] = [None] * (block.end - block.start)
+            changed = True
+    return changed
+
+
+def _remove_unused_labels(function_lines, blocks):
+    """
+    removes the labels that no jump refers to, so their blocks are merged with the previous ones
+    :return: True if a label was removed, False otherwise
+    """
+    jump_labels = {block.get_jump_label() for block in blocks}
+    changed = False
+    for block in blocks:
+        for label, position in zip(block.labels, block.commands):
+            if label not in jump_labels:
+                function_lines[position] = None
+                changed = True
+    return changed
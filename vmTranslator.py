@@ -1,53 +1,290 @@
 ###########
 # imports #
 ###########
-import sys
+import argparse
+import multiprocessing
 import os
 
-from Parser import Parser
+import livenessAnalyzer
+import loadStoreOptimizer
+import peepholeOptimizer
+import rangeAnalyzer
+import translatorConfig
+import vmOptimizer
+from labelInterner import LabelInterner
+from Parser import Parser, split_command, CALL_COMMAND_MARK, UNCHECKED_COMPARE_PREFIX
 from translator import Translator
 
 #############
 # constants #
 #############
-PATH_POS = 1  # the arguments position for the file path
 ASM_SUFFIX = "asm"
 VM_SUFFIX = "vm"
+LABELS_TABLE_SUFFIX = "labels"
 WRITING_MODE = "w"
+END_OF_LINE_MARK = "\n"
 FILE_NAME_POSITION = -1
+REMOVED_INSTRUCTIONS_REPORT = "{}: {} redundant instructions removed"
+COMPARE_COMMANDS = ("eq", "gt", "lt")  # the commands that number their labels with the comparison label counter
+CHUNKS_PER_JOB = 4  # more chunks than workers, so a worker with large functions does not hold the others
+KEYWORD_POS = 0
+CALLED_FUNCTION_POS = 1
+A_INSTRUCTION_PREFIX = "@"
+LABEL_PREFIX = "("
+LABEL_SUFFIX = ")"
 
 
-def translate_file(input_file, input_file_name, output_file, write_boot):
+def translate_file(input_file, input_file_name, output_file, write_boot, config=None, label_interner=None, jobs=1,
+                   eliminated=None):
     """
     translates the given input vm file to the given output asm file
     :param input_file: the input vm file
     :param input_file_name: the name of the input file
     :param output_file: the output asm file
     :param write_boot: should the function write the booting lines in the beginning of the translation
+    :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+    :param label_interner: the LabelInterner of the short labels of the output file
+    :param jobs: the number of worker processes. More than 1 splits the file into chunks of whole functions that are
+    translated in parallel (with the same output as a single process)
+    :param eliminated: a dictionary that is updated with the dead stores elimination of every function (see
+    optimize_vm_lines)
+    :return: the number of the redundant instructions the load/store optimizer removed
     """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    if label_interner is None:
+        label_interner = LabelInterner()
     file_name_dirs = input_file_name.split(os.path.sep)  # split the path to its directories and the file name
     file_name = file_name_dirs[FILE_NAME_POSITION][:-len(VM_SUFFIX) - 1]  # gets the file name only
     file_parser = Parser(file_name)
-    file_translator = Translator(file_parser)
+    file_translator = Translator(file_parser, config, label_interner)
+    asm_commands = []
 
     # if needed: puts the booting line at the start of the file
     if write_boot:
-        output_file.write(file_translator.translate_booting())
+        asm_commands.append(file_translator.translate_booting())
 
+    vm_lines = optimize_vm_lines(input_file, config, eliminated)
+    if jobs > 1:
+        removed = write_asm(asm_commands, output_file, config)
+        return removed + translate_in_parallel(list(vm_lines), file_name, output_file, config, label_interner, jobs)
+    return translate_lines(vm_lines, file_translator, file_parser, asm_commands, output_file, config)
+
+
+def translate_lines(vm_lines, file_translator, file_parser, asm_commands, output_file, config):
+    """
+    translates vm lines that the vm level optimizations were already applied to, and writes them to the output file
+    :param vm_lines: the (optimized) vm lines
+    :param file_translator: the Translator of the file
+    :param file_parser: the Parser of the translator
+    :param asm_commands: the asm code pieces that are written before the lines (like the booting lines)
+    :param output_file: the output asm file
+    :param config: the code generation configuration
+    :return: the number of the redundant instructions the load/store optimizer removed
+    """
     # the input file translation
-    for line in input_file:
+    for line in vm_lines:
         file_parser.set_command(line)  # setting the parser to the current line
         file_parser.parse()
-        asm_command = file_translator.translate()
-        output_file.write(asm_command)  # printing the asm code in the output file
+        asm_commands.append(file_translator.translate())
+    asm_commands.append(file_translator.translate_end_of_file())
+
+    return write_asm(asm_commands, output_file, config)
+
+
+def optimize_vm_lines(vm_lines, config, eliminated=None):
+    """
+    runs the vm level optimizations of the configuration
+    :param vm_lines: the vm lines
+    :param config: the code generation configuration
+    :param eliminated: a dictionary that is updated with the dead stores elimination: from a function name to a
+    tuple of the number of its removed commands, the number of its uninitialized local variables and the indices of
+    the local variables whose values may change (see livenessAnalyzer.eliminate_dead_stores)
+    :return: the optimized vm lines
+    """
+    if config.simplify_control_flow:
+        vm_lines = vmOptimizer.optimize_control_flow(list(vm_lines))
+    if config.eliminate_dead_stores:
+        vm_lines, functions_eliminated = livenessAnalyzer.eliminate_dead_stores(list(vm_lines))
+        if eliminated is not None:
+            eliminated.update(functions_eliminated)
+    if config.unchecked_comparisons:
+        vm_lines = rangeAnalyzer.mark_unchecked_comparisons(list(vm_lines))
+    if config.tail_calls:
+        vm_lines = vmOptimizer.mark_tail_calls(list(vm_lines))
+    return vm_lines
+
+
+def optimize_asm_lines(asm_lines, config):
+    """
+    runs the asm level optimizations of the configuration
+    :param asm_lines: the asm lines (without line endings)
+    :param config: the code generation configuration
+    :return: a tuple of the optimized asm lines and the number of the redundant instructions the load/store
+    optimizer removed
+    """
+    if config.peephole:
+        asm_lines = peepholeOptimizer.optimize(asm_lines)
+    removed = 0
+    if config.eliminate_load_store:
+        asm_lines, removed = loadStoreOptimizer.optimize(asm_lines)
+    return asm_lines, removed
+
+
+def translate_in_parallel(vm_lines, file_name, output_file, config, label_interner, jobs):
+    """
+    translates the vm lines of a file in worker processes and writes the results in order. The lines are split into
+    chunks of whole functions, and every chunk continues the comparison label counter and the call numbers of the
+    chunks before it, so the labels are unique and the same as in a single process translation
+    :param vm_lines: the (optimized) vm lines of the file
+    :param file_name: the name of the file (without the suffix)
+    :param output_file: the output asm file
+    :param config: the code generation configuration
+    :param label_interner: the LabelInterner of the short labels of the output file
+    :param jobs: the number of worker processes
+    :return: the number of the redundant instructions the load/store optimizer removed
+    """
+    tasks = []
+    label_number = 0
+    calls_numbers = Parser.get_calls_numbers()
+    for chunk in split_to_chunks(vm_lines, jobs * CHUNKS_PER_JOB):
+        tasks.append((chunk, file_name, config, label_number, dict(calls_numbers)))
+        label_number = _count_numbered_commands(chunk, label_number, calls_numbers)
+    Parser.set_calls_numbers(calls_numbers)  # the next files continue after all the chunks
+
+    removed = 0
+    used_routines = Translator.get_used_routines()
+    with multiprocessing.Pool(jobs) as pool:
+        for asm_lines, chunk_removed, labels_table, chunk_routines in pool.imap(_translate_chunk, tasks):
+            used_routines |= chunk_routines
+            # the short labels of every worker are interned again in order, which gives the single process names
+            short_names = {short_name: label_interner.intern(full_name) for short_name, full_name in labels_table}
+            for asm_line in asm_lines:
+                output_file.write(rename_label(asm_line, short_names) + END_OF_LINE_MARK)
+            removed += chunk_removed
+    Translator.set_used_routines(used_routines)
+    return removed
+
+
+def split_to_chunks(vm_lines, chunks_number):
+    """
+    splits vm lines at function boundaries into chunks of about the same number of lines
+    :param vm_lines: the vm lines
+    :param chunks_number: the wanted number of chunks
+    :return: a list of the lines of every chunk
+    """
+    chunk_size = len(vm_lines) // chunks_number + 1
+    chunks = [[]]
+    for function_lines in vmOptimizer.split_functions(vm_lines):
+        if len(chunks[-1]) >= chunk_size:
+            chunks.append([])
+        chunks[-1].extend(function_lines)
+    return chunks
+
+
+def _count_numbered_commands(chunk, label_number, calls_numbers):
+    """
+    advances the numbering state over the commands of a chunk
+    :param chunk: the vm lines of the chunk
+    :param label_number: the comparison label counter at the start of the chunk
+    :param calls_numbers: the number of the last call of every function at the start of the chunk. Updated to its
+    end
+    :return: the comparison label counter at the end of the chunk
+    """
+    for line in chunk:
+        command_parts = split_command(line)
+        if not command_parts:
+            continue
+        keyword = command_parts[KEYWORD_POS]
+        if keyword in COMPARE_COMMANDS or keyword.startswith(UNCHECKED_COMPARE_PREFIX):
+            label_number += 1
+        elif keyword == CALL_COMMAND_MARK:
+            called_function = command_parts[CALLED_FUNCTION_POS]
+            # the first call of a function is numbered 0
+            calls_numbers[called_function] = calls_numbers.get(called_function, -1) + 1
+    return label_number
+
+
+def _translate_chunk(task):
+    """
+    translates a chunk of vm lines in a worker process
+    :param task: a tuple of the chunk lines, the file name, the configuration, the first comparison label number and
+    the call numbers at the start of the chunk
+    :return: a tuple of the optimized asm lines, the number of the removed redundant instructions, the table of the
+    short labels of the chunk and the shared routines it jumps to
+    """
+    chunk, file_name, config, label_number, calls_numbers = task
+    Parser.set_calls_numbers(calls_numbers)
+    Translator.set_used_routines(())
+    chunk_parser = Parser(file_name)
+    chunk_label_interner = LabelInterner()
+    chunk_translator = Translator(chunk_parser, config, chunk_label_interner, label_number)
+    asm_commands = []
+    for line in chunk:
+        chunk_parser.set_command(line)
+        chunk_parser.parse()
+        asm_commands.append(chunk_translator.translate())
+    asm_commands.append(chunk_translator.translate_end_of_file())
+    asm_lines, removed = optimize_asm_lines("".join(asm_commands).splitlines(), config)
+    return asm_lines, removed, chunk_label_interner.get_table(), Translator.get_used_routines()
+
+
+def rename_label(asm_line, new_names):
+    """
+    :param asm_line: an asm line
+    :param new_names: a dictionary from old label names to new label names (like the short labels of a worker to the
+    short labels of the output)
+    :return: the line, where a label that is used or declared by it is renamed
+    """
+    if asm_line.startswith(A_INSTRUCTION_PREFIX) and asm_line[len(A_INSTRUCTION_PREFIX):] in new_names:
+        return A_INSTRUCTION_PREFIX + new_names[asm_line[len(A_INSTRUCTION_PREFIX):]]
+    if asm_line.startswith(LABEL_PREFIX) and asm_line[len(LABEL_PREFIX):-len(LABEL_SUFFIX)] in new_names:
+        return LABEL_PREFIX + new_names[asm_line[len(LABEL_PREFIX):-len(LABEL_SUFFIX)]] + LABEL_SUFFIX
+    return asm_line
 
 
-def translate_single_file(file_name):
+def write_asm(asm_commands, output_file, config):
+    """
+    writes the translated asm code into the output file, after the asm level optimizations of the configuration
+    :param asm_commands: the list of the translated asm code pieces
+    :param output_file: the output asm file
+    :param config: the code generation configuration
+    :return: the number of the redundant instructions the load/store optimizer removed
+    """
+    if not config.peephole and not config.eliminate_load_store:
+        for asm_command in asm_commands:
+            output_file.write(asm_command)  # printing the asm code in the output file
+        return 0
+    asm_lines, removed = optimize_asm_lines("".join(asm_commands).splitlines(), config)
+    for asm_line in asm_lines:
+        output_file.write(asm_line + END_OF_LINE_MARK)
+    return removed
+
+
+def write_shared_routines(output_file, config=None):
+    """
+    writes the shared routines that the translated code jumps to into the output file. Should be called once, after
+    the translation of the last file of the output
+    :param output_file: the output asm file
+    :param config: the code generation configuration (TranslatorConfig). The original code shape by default
+    :return: the number of the redundant instructions the load/store optimizer removed
+    """
+    if config is None:
+        config = translatorConfig.TranslatorConfig()
+    return write_asm([Translator.translate_shared_routines()], output_file, config)
+
+
+def translate_single_file(file_name, config=None, jobs=1, eliminated=None):
     """
     The function gets a file name from vm type and translates it to asm code. It creates an asm file with he same
     name in the same directory that contains the asm code.
     :param file_name: the name of the vm file to be translated
+    :param config: the code generation configuration (TranslatorConfig)
+    :param jobs: the number of worker processes that translate the file
+    :param eliminated: a dictionary that is updated with the dead stores elimination of every function
+    :return: a dictionary from the vm file name to the number of the redundant instructions removed from its code
     """
+    label_interner = LabelInterner()
     # opening the vm file
     with open(file_name) as input_file:
         # figuring the output file name- replacing vm suffix to asm
@@ -55,36 +292,134 @@ def translate_single_file(file_name):
         # opening the output file in writing mode
         with open(output_file_name, WRITING_MODE) as output_file:
             # translating the file
-            translate_file(input_file, file_name, output_file, True)
+            removed = translate_file(input_file, file_name, output_file, True, config, label_interner, jobs,
+                                     eliminated)
+            removed += write_shared_routines(output_file, config)
+    write_labels_table(output_file_name, config, label_interner)
+    return {file_name: removed}
 
 
-def translate_directory(directory_full_path):
+def translate_directory(directory_full_path, config=None, jobs=1, eliminated=None):
     """
     The function gets a directory name and translates all the vm files in it to one asm file with the name of the
     given directory.
     :param directory_full_path: the name of the given directory
+    :param config: the code generation configuration (TranslatorConfig)
+    :param jobs: the number of worker processes that translate every file
+    :param eliminated: a dictionary that is updated with the dead stores elimination of every function
+    :return: a dictionary from every vm file name to the number of the redundant instructions removed from its code
     """
-    files_list = os.listdir(directory_full_path)  # list of all the files' name in the given directory
     directory_full_dirs = directory_full_path.split(os.path.sep)  # split the path to its directories and the file name
     directory_name = directory_full_dirs[FILE_NAME_POSITION]  # gets the file name only
     output_file_name = os.path.join(directory_full_path, directory_name + "." + ASM_SUFFIX)
+    label_interner = LabelInterner()
     with open(output_file_name, WRITING_MODE) as output_file:
-        file_counter = 0  # counts how many files have been translated in the directory
-        for directory_file in files_list:
-            if VM_SUFFIX == directory_file[-len(VM_SUFFIX):]:  # if the file is a vm file
-                file_counter += 1
-                vm_file_name = os.path.join(directory_full_path, directory_file)  # creates a full path of the file name
-                with open(vm_file_name) as input_file:
-                    translate_file(input_file, vm_file_name, output_file, file_counter == 1)
+        removed = translate_directory_files(directory_full_path, output_file, config, label_interner, jobs,
+                                            eliminated)
+    write_labels_table(output_file_name, config, label_interner)
+    return removed
+
+
+def translate_directory_files(directory_full_path, output_file, config=None, label_interner=None, jobs=1,
+                              eliminated=None):
+    """
+    translates all the vm files in the given directory into the given output asm file
+    :param directory_full_path: the name of the given directory
+    :param output_file: the output asm file
+    :param config: the code generation configuration (TranslatorConfig)
+    :param label_interner: the LabelInterner of the short labels of the output file
+    :param jobs: the number of worker processes that translate every file
+    :param eliminated: a dictionary that is updated with the dead stores elimination of every function
+    :return: a dictionary from every vm file name to the number of the redundant instructions removed from its code
+    """
+    if label_interner is None:
+        label_interner = LabelInterner()
+    removed = {}
+    file_counter = 0  # counts how many files have been translated in the directory
+    for vm_file_name in get_vm_files(directory_full_path):
+        file_counter += 1
+        with open(vm_file_name) as input_file:
+            removed[vm_file_name] = translate_file(input_file, vm_file_name, output_file, file_counter == 1, config,
+                                                   label_interner, jobs, eliminated)
+    # the shared routines are written after the last file, so the instructions removed from them are counted with it
+    routines_removed = write_shared_routines(output_file, config)
+    if removed:
+        removed[vm_file_name] += routines_removed
+    return removed
+
+
+def write_labels_table(output_file_name, config, label_interner):
+    """
+    writes the side table of the short labels next to the output asm file, if the configuration uses short labels
+    :param output_file_name: the name of the output asm file
+    :param config: the code generation configuration (TranslatorConfig)
+    :param label_interner: the LabelInterner of the short labels of the output file
+    """
+    if config is None or not config.short_labels:
+        return
+    with open(output_file_name[:-len(ASM_SUFFIX)] + LABELS_TABLE_SUFFIX, WRITING_MODE) as table_file:
+        label_interner.write_table(table_file)
+
+
+def get_vm_files(directory_full_path):
+    """
+    :param directory_full_path: the name of the given directory
+    :return: a list of the full paths of all the vm files in the given directory
+    """
+    files_list = os.listdir(directory_full_path)  # list of all the files' name in the given directory
+    return [os.path.join(directory_full_path, directory_file) for directory_file in files_list
+            if VM_SUFFIX == directory_file[-len(VM_SUFFIX):]]  # only the vm files
+
+
+def add_optimization_arguments(arguments_parser):
+    """
+    adds the code generation options to the given command line arguments parser
+    :param arguments_parser: an argparse.ArgumentParser
+    """
+    arguments_parser.add_argument("-O", dest="level", default=translatorConfig.DEFAULT_LEVEL,
+                                  choices=translatorConfig.OPTIMIZATION_LEVELS,
+                                  help="optimization level: 0 (none), 1 (peephole), 2 (speed) or s (size)")
+    arguments_parser.add_argument("--short-labels", dest="short_labels", action="store_true", default=None,
+                                  help="interns the internal labels into short names (and writes their side table)")
+    arguments_parser.add_argument("--long-labels", dest="short_labels", action="store_false",
+                                  help="keeps the full names of the internal labels")
+
+
+def get_config(arguments):
+    """
+    :param arguments: the parsed command line arguments
+    :return: the code generation configuration the arguments select
+    """
+    config = translatorConfig.get_level_config(arguments.level)
+    if arguments.short_labels is not None:
+        config.short_labels = arguments.short_labels
+    return config
+
 
 # main part
 if __name__ == '__main__':
-    if len(sys.argv) < PATH_POS + 1:
-        sys.exit()  # There is not an input
+    arguments_parser = argparse.ArgumentParser(description="Translates vm code into hack asm code")
+    arguments_parser.add_argument("path", help="a vm file or a directory of vm files")
+    add_optimization_arguments(arguments_parser)
+    arguments_parser.add_argument("--stats", action="store_true",
+                                  help="prints the number of redundant instructions removed per vm file, and the dead "
+                                       "stores eliminated per function")
+    arguments_parser.add_argument("-j", "--jobs", type=int, default=1,
+                                  help="translates every file in chunks of functions by this number of processes")
+    arguments = arguments_parser.parse_args()
+    translation_config = get_config(arguments)
+    eliminated_stores = {}
 
     # checks if the given path is a directory or a file
-    path = sys.argv[PATH_POS]
-    if os.path.isdir(path):
-        translate_directory(path)  # translates all vm files in the directory
+    if os.path.isdir(arguments.path):
+        # translates all vm files in the directory
+        removed_instructions = translate_directory(arguments.path, translation_config, arguments.jobs,
+                                                   eliminated_stores)
     else:
-        translate_single_file(path)  # translates the given vm file
+        removed_instructions = translate_single_file(arguments.path, translation_config, arguments.jobs,
+                                                     eliminated_stores)
+    if arguments.stats:
+        for vm_file_name, removed_count in removed_instructions.items():
+            print(REMOVED_INSTRUCTIONS_REPORT.format(vm_file_name, removed_count))
+        if translation_config.eliminate_dead_stores:
+            print(livenessAnalyzer.format_text(eliminated_stores))